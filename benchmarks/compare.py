@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+from benchmarks.run import HISTORY
+
+
+# python -m benchmarks.compare                 -> penúltima vs última entrada
+# python -m benchmarks.compare --base abc123   -> última entrada del commit abc123 vs la última
+
+def _load(history: Path) -> list[dict]:
+    with history.open("r", encoding="utf-8") as fp:
+        return [json.loads(line) for line in fp if line.strip()]
+
+
+def _pick(entries: list[dict], commit: str | None, default: int) -> dict:
+    if commit is None:
+        return entries[default]
+    matches = [e for e in entries if (e.get("commit") or "").startswith(commit)]
+    if not matches:
+        raise SystemExit(f"No hay resultados para el commit {commit!r}")
+    return matches[-1]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compara dos ejecuciones de benchmarks.")
+    parser.add_argument("--base", type=str, default=None, help="Commit de referencia (por defecto: penúltima).")
+    parser.add_argument("--head", type=str, default=None, help="Commit a comparar (por defecto: última).")
+    parser.add_argument("--threshold", type=float, default=1.10, help="Ratio a partir del cual se marca regresión.")
+    parser.add_argument("--history", type=str, default=str(HISTORY))
+    args = parser.parse_args()
+
+    entries = _load(Path(args.history))
+    if len(entries) < 2 and args.base is None:
+        raise SystemExit("Se necesitan al menos dos entradas en el histórico.")
+    base = _pick(entries, args.base, -2)
+    head = _pick(entries, args.head, -1)
+
+    print(f"base: {base.get('commit')} ({base['date']}, polars {base['polars']})")
+    print(f"head: {head.get('commit')} ({head['date']}, polars {head['polars']})")
+
+    regressions = 0
+    for rows, results in head["scales"].items():
+        base_results = base["scales"].get(rows, {})
+        for name, r in results.items():
+            if name not in base_results:
+                continue
+            ratio = r["seconds"] / base_results[name]["seconds"]
+            flag = "  <-- REGRESIÓN" if ratio >= args.threshold else ""
+            regressions += bool(flag)
+            print(f"{rows:>10} {name:<42} x{ratio:5.2f}{flag}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
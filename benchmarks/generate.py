@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+
+# =========================================================
+# Generador de datos sintéticos con el esquema Titanic
+# =========================================================
+#
+# Escribe titanic.csv, pasajeros.csv y supervivientes.csv en out_dir con
+# n filas, por bloques (memoria acotada incluso con 1e8 filas). Tasas de
+# nulos parecidas al Titanic real: Age ~20 %, Cabin ~77 %, Embarked ~0.2 %.
+# mismatch_rate: fracción de PassengerId que solo aparece en uno de los
+# dos ficheros de Ejercicio 2 (mitad en cada lado).
+
+CHUNK_ROWS = 1_000_000
+
+AGE_NULL_RATE = 0.20
+CABIN_NULL_RATE = 0.77
+EMBARKED_NULL_RATE = 0.002
+
+
+def _chunk(rng: np.random.Generator, start: int, n: int) -> pl.DataFrame:
+    ids = np.arange(start + 1, start + n + 1, dtype=np.int64)
+    pclass = rng.choice([1, 2, 3], size=n, p=[0.24, 0.21, 0.55])
+    male = rng.random(n) < 0.64
+
+    # Supervivencia dependiente de sexo y clase (como en los datos reales)
+    p_surv = np.where(male, 0.19, 0.74) * np.array([0.0, 1.35, 1.1, 0.7])[pclass]
+    survived = (rng.random(n) < np.clip(p_surv, 0, 1)).astype(np.int64)
+
+    # Edades con decimales ocasionales (bebés: 0.42, 0.83; x.5)
+    age = np.clip(rng.gamma(4.0, 7.5, size=n), 0.42, 80.0)
+    age = np.where(age < 1, np.round(age, 2), np.round(age * 2) / 2)
+    age_null = rng.random(n) < AGE_NULL_RATE
+
+    fare = np.round(rng.gamma(1.2, 30.0, size=n) * np.array([0.0, 2.5, 0.8, 0.5])[pclass], 4)
+    cabin_null = rng.random(n) < CABIN_NULL_RATE
+    embarked = rng.choice(["S", "C", "Q"], size=n, p=[0.72, 0.19, 0.09])
+    embarked_null = rng.random(n) < EMBARKED_NULL_RATE
+
+    return pl.DataFrame(
+        {
+            "PassengerId": ids,
+            "Survived": survived,
+            "Pclass": pclass,
+            "Name": [f"Passenger, Mx. {i}" for i in ids],
+            "Sex": np.where(male, "male", "female"),
+            "Age": pl.Series(age).set(pl.Series(age_null), None),
+            "SibSp": rng.poisson(0.5, size=n),
+            "Parch": rng.poisson(0.4, size=n),
+            "Ticket": [f"T {i % 100_000}" for i in ids],
+            "Fare": fare,
+            "Cabin": pl.Series([f"C{i % 150}" for i in ids]).set(pl.Series(cabin_null), None),
+            "Embarked": pl.Series(embarked).set(pl.Series(embarked_null), None),
+        }
+    )
+
+
+def generate(out_dir: Path, n: int, mismatch_rate: float = 0.01, seed: int = 42) -> Path:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    with (
+        (out_dir / "titanic.csv").open("wb") as f_t,
+        (out_dir / "pasajeros.csv").open("wb") as f_p,
+        (out_dir / "supervivientes.csv").open("wb") as f_s,
+    ):
+        for start in range(0, n, CHUNK_ROWS):
+            df = _chunk(rng, start, min(CHUNK_ROWS, n - start))
+            header = start == 0
+
+            # Filas que solo van a pasajeros (side 1) o solo a supervivientes (side 2)
+            side = np.where(rng.random(df.height) < mismatch_rate, rng.integers(1, 3, df.height), 0)
+
+            df.write_csv(f_t, include_header=header)
+            df.filter(pl.Series(side != 2)).drop("Survived").write_csv(f_p, include_header=header)
+            df.filter(pl.Series(side != 1)).select(["PassengerId", "Survived"]).write_csv(
+                f_s, include_header=header
+            )
+    return out_dir
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Genera CSV sintéticos con el esquema Titanic.")
+    parser.add_argument("--rows", type=float, default=1e5, help="Nº de filas (1e4 a 1e8).")
+    parser.add_argument("--mismatch-rate", type=float, default=0.01, help="Fracción de PassengerId sin pareja.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out-dir", type=str, default="benchmarks/.data/synthetic")
+    args = parser.parse_args()
+
+    out = generate(Path(args.out_dir), int(args.rows), args.mismatch_rate, args.seed)
+    print(f"OK: {int(args.rows)} filas en {out.as_posix()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
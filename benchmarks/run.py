@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+import polars as pl
+
+from benchmarks.generate import generate
+from src import ejercicio1 as e1
+from src import ejercicio2 as e2
+from src import plots
+from src.dataprofile import profile_scan
+from src.density import age_bins
+from src.profiling import PeakRss
+
+
+# =========================================================
+# Suite de benchmarks
+# =========================================================
+#
+# python -m benchmarks.run --rows 1e4 1e5 1e6
+# Para cada escala genera (una vez) datos sintéticos en benchmarks/.data,
+# mide cada función e1_*, de ejercicio2, build_df y cada plot, y añade
+# una entrada al histórico benchmarks/results/history.jsonl (una línea
+# JSON por ejecución, con commit, versión de Polars y resultados).
+# python -m benchmarks.compare compara dos entradas del histórico.
+
+BENCH_DIR = Path(__file__).resolve().parent
+DATA_DIR = BENCH_DIR / ".data"
+HISTORY = BENCH_DIR / "results" / "history.jsonl"
+
+
+def _cases(data_dir: Path, fig_dir: Path) -> dict[str, Callable[[], object]]:
+    # Entradas preparadas fuera del cronómetro; cada caso mide una sola función
+    df = e1.load_titanic(data_dir)
+    df_p = e2.load_pasajeros(data_dir)
+    df_s = e2.load_supervivientes(data_dir)
+    df_joined = e2.build_df(data_dir)
+    df2 = e2.add_puerto(df_joined)
+    by_class = e1.e1_passengers_by_class(df)
+    sex_by_class = e1.e1_sex_by_class(df)
+    survived = e1.e1_survived_counts(df)
+    ages = age_bins(df)
+
+    cases: dict[str, Callable[[], object]] = {
+        "e1.load_titanic": lambda: e1.load_titanic(data_dir),
+        "e1.e1_head": lambda: e1.e1_head(df),
+        "e1.e1_columns": lambda: e1.e1_columns(df),
+        "e1.e1_profile": lambda: e1.e1_profile(df),
+        "e1.e1_info": lambda: e1.e1_info(df),
+        "e1.e1_passengers_by_class": lambda: e1.e1_passengers_by_class(df),
+        "e1.e1_passengers_by_sex": lambda: e1.e1_passengers_by_sex(df),
+        "e1.e1_sex_by_class": lambda: e1.e1_sex_by_class(df),
+        "e1.e1_survived_pivot_by_class_sex": lambda: e1.e1_survived_pivot_by_class_sex(df),
+        "e1.e1_survived_counts": lambda: e1.e1_survived_counts(df),
+        "e1.e1_total_not_survived": lambda: e1.e1_total_not_survived(df),
+        "e1.e1_not_survived_by_class_sex": lambda: e1.e1_not_survived_by_class_sex(df),
+        "e1.e1_survived_not_pivot_by_class_sex": lambda: e1.e1_survived_not_pivot_by_class_sex(df),
+        "e1.e1_dropna_age": lambda: e1.e1_dropna_age(df),
+        "e1.e1_dropna_age_summary": lambda: e1.e1_dropna_age_summary(df),
+        "e1.e1_add_is_minor": lambda: e1.e1_add_is_minor(df),
+        "e1.e1_minor16_counts": lambda: e1.e1_minor16_counts(df),
+        "e1.e1_compute_all": lambda: e1.e1_compute_all(df),
+        "e1.e1_collect_all": lambda: e1.e1_collect_all(e1.scan_titanic(data_dir)),
+        "e2.load_pasajeros": lambda: e2.load_pasajeros(data_dir),
+        "e2.load_supervivientes": lambda: e2.load_supervivientes(data_dir),
+        "e2.build_df": lambda: e2.build_df(data_dir),
+        "e2.add_puerto": lambda: e2.add_puerto(df_joined),
+        "e2.passengers_by_puerto": lambda: e2.passengers_by_puerto(df2),
+        "e2.passengers_by_sex": lambda: e2.passengers_by_sex(df2),
+        "e2.mean_age_by_sex_survived": lambda: e2.mean_age_by_sex_survived(df2),
+        "e2.add_age_range": lambda: e2.add_age_range(df2),
+        "e2.deaths_by_age_range": lambda: e2.deaths_by_age_range(df2),
+        "e2.deaths_by_class_gender": lambda: e2.deaths_by_class_gender(df2),
+        "e2.survived_and_deaths_by_puerto": lambda: e2.survived_and_deaths_by_puerto(df2),
+        "e2.join_quality": lambda: e2.join_quality(df_p, df_s, df_joined),
+        "dataprofile.profile_scan": lambda: profile_scan(e1.scan_titanic(data_dir)),
+        "e2.e2_compute_all": lambda: e2.e2_compute_all(data_dir),
+        "e2.e2_collect_all[streaming]": lambda: e2.e2_collect_all(data_dir, engine="streaming"),
+        "plots.bar_counts": lambda: plots.bar_counts(
+            by_class, x_col="Pclass", y_col="count", title="bench", figpath=fig_dir / "bar.png"
+        ),
+        "plots.bar_counts_hue": lambda: plots.bar_counts_hue(
+            sex_by_class, x_col="Pclass", hue_col="Sex", y_col="count", title="bench", figpath=fig_dir / "hue.png"
+        ),
+        "plots.survived_vs_not": lambda: plots.survived_vs_not(survived, fig_dir / "surv.png"),
+        "plots.age_hist_alt": lambda: plots.age_hist_alt(ages, fig_dir / "alt.png"),
+        "plots.age_hist_with_kde_binned": lambda: plots.age_hist_with_kde_binned(ages, fig_dir / "kdeb.png"),
+        "plots.age_hist_with_kde": lambda: plots.age_hist_with_kde(ages, fig_dir / "kde.png"),
+    }
+    return cases
+
+
+def _measure(fn: Callable[[], object], repeat: int) -> dict[str, float | None]:
+    times: list[float] = []
+    peaks: list[float] = []
+    for _ in range(repeat):
+        with PeakRss() as mem:
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+        if mem.peak_mb is not None:
+            peaks.append(mem.peak_mb)
+    return {
+        "seconds": statistics.median(times),
+        "seconds_min": min(times),
+        "peak_rss_mb": max(peaks) if peaks else None,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCH_DIR.parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(rows_list: list[int], repeat: int, mismatch_rate: float, only: str | None) -> dict:
+    entry: dict = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "polars": pl.__version__,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scales": {},
+    }
+    for rows in rows_list:
+        data_dir = DATA_DIR / f"rows_{rows}_mm_{mismatch_rate}"
+        if not (data_dir / "titanic.csv").exists():
+            print(f"Generando {rows} filas en {data_dir.as_posix()} ...")
+            generate(data_dir, rows, mismatch_rate)
+
+        results: dict[str, dict] = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, fn in _cases(data_dir, Path(tmp)).items():
+                if only and only not in name:
+                    continue
+                r = _measure(fn, repeat)
+                r["rows_per_s"] = rows / r["seconds"] if r["seconds"] > 0 else None
+                results[name] = r
+                peak = "-" if r["peak_rss_mb"] is None else f"{r['peak_rss_mb']:.1f} MB"
+                print(f"{rows:>10} {name:<42} {r['seconds'] * 1e3:10.2f} ms  {peak}")
+        entry["scales"][str(rows)] = results
+    return entry
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de la práctica Titanic.")
+    parser.add_argument("--rows", type=float, nargs="+", default=[1e4, 1e5], help="Escalas (1e4 a 1e8).")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por función (se guarda la mediana).")
+    parser.add_argument("--mismatch-rate", type=float, default=0.01)
+    parser.add_argument("--only", type=str, default=None, help="Solo funciones cuyo nombre contenga este texto.")
+    parser.add_argument("--history", type=str, default=str(HISTORY), help="Fichero JSONL del histórico.")
+    args = parser.parse_args()
+
+    entry = run([int(r) for r in args.rows], args.repeat, args.mismatch_rate, args.only)
+
+    history = Path(args.history)
+    history.parent.mkdir(parents=True, exist_ok=True)
+    with history.open("a", encoding="utf-8") as fp:
+        fp.write(json.dumps(entry) + "\n")
+    print(f"OK: resultados añadidos a {history.as_posix()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+# =========================================================
+# Arranque en frío de src.main
+# =========================================================
+#
+# python -m benchmarks.startup --budget-ms 500
+# Lanza intérpretes nuevos con -X importtime, mide el tiempo acumulado
+# de "import src.main" (mediana de --repeat ejecuciones) y el tiempo
+# real de "python -m src.main --help". Termina con error si la
+# importación supera el presupuesto o si arrastra el stack de gráficos
+# (matplotlib / scipy), que solo debe cargarse al dibujar una figura.
+
+ROOT = Path(__file__).resolve().parents[1]
+FORBIDDEN = ("matplotlib", "scipy")
+
+
+def import_times(module: str) -> dict[str, int]:
+    # {módulo: µs acumulados} de un intérprete nuevo que solo importa module
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def help_wall_s() -> float:
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "src.main", "--help"], cwd=ROOT, capture_output=True, check=True)
+    return time.perf_counter() - t0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Tiempo de arranque en frío de src.main.")
+    parser.add_argument("--budget-ms", type=float, default=500.0, help="Máximo para 'import src.main' (ms).")
+    parser.add_argument("--repeat", type=int, default=5, help="Intérpretes lanzados (se usa la mediana).")
+    parser.add_argument("--module", type=str, default="src.main")
+    parser.add_argument("--top", type=int, default=10, help="Módulos más lentos a mostrar.")
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.repeat)]
+    import_ms = statistics.median(r[args.module] for r in runs) / 1e3
+    wall_ms = statistics.median(help_wall_s() for _ in range(args.repeat)) * 1e3
+
+    print(f"import {args.module}: {import_ms:.1f} ms (presupuesto {args.budget_ms:.0f} ms)")
+    print(f"python -m src.main --help: {wall_ms:.1f} ms")
+    last = runs[-1]
+    tops = sorted((t, name) for name, t in last.items() if "." not in name and name != args.module)
+    for t, name in tops[::-1][: args.top]:
+        print(f"  {name:<24} {t / 1e3:8.1f} ms")
+
+    failed = False
+    heavy = sorted({name.split(".")[0] for name in last} & set(FORBIDDEN))
+    if heavy:
+        print(f"ERROR: import {args.module} carga {', '.join(heavy)}")
+        failed = True
+    if import_ms > args.budget_ms:
+        print(f"ERROR: import {args.module} supera el presupuesto ({import_ms:.1f} > {args.budget_ms:.0f} ms)")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,391 @@
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+
+import polars as pl
+
+from src.ejercicio1 import E1_CUBE_DIMS, e1_cube, e1_from_cube, load_titanic
+from src.ejercicio2 import (
+    E2_CUBE_DIMS,
+    add_age_range,
+    add_puerto,
+    build_df,
+    e2_cube,
+    e2_from_cube,
+    join_by_id,
+    mean_age_by_sex_survived,
+)
+from src.keyindex import KEY
+from src.readers import is_tolerant, scan_input
+from src.store import is_fresh, write_meta
+
+
+# =========================================================
+# Modo aproximado: muestra estratificada con intervalos de confianza
+# =========================================================
+#
+# De cada CSV se guarda una vez en data/.sample/ una muestra de
+# Bernoulli de ~SAMPLE_ROWS filas elegidas por hash de PassengerId,
+# junto con el nº exacto de filas por estrato (Pclass, Sex). Como la
+# decisión depende solo del id, la muestra de pasajeros.csv y la de
+# supervivientes.csv contienen los mismos ids: su join es una muestra
+# del join completo. Las siguientes ejecuciones solo leen la muestra
+# (tiempo constante, sea cual sea el tamaño de los CSV); se rehace si
+# cambia el CSV, como el almacén Arrow.
+#
+# Recuentos: estimador post-estratificado sum_h N_h / n_h * sum y_i.
+# Medias: estimador de razón. Varianza por linealización con corrección
+# por población finita; intervalo normal al 95%. Con datos pequeños
+# (N <= SAMPLE_ROWS) la muestra es el CSV entero y el resultado es
+# exacto, con intervalos de ancho cero.
+#
+# Cota del error: un recuento de N_g filas estimado con una fracción
+# muestreada f tiene un error relativo por debajo de
+# relative_error_bound(N_g, f) = 3 sqrt((1 - f) / (f N_g)) (tres
+# desviaciones típicas del muestreo de Bernoulli; la post-estratificación
+# solo la reduce). Con f = 0.1: 1 % para 800 000 filas, 10 % para 8 000.
+
+SAMPLE_DIR = ".sample"
+SAMPLE_VERSION = "hash-bernoulli:v1"
+SAMPLE_ROWS = 100_000
+STRATA = ["Pclass", "Sex"]
+SEED = 0
+Z = 1.959964  # normal, 95%
+UNIT = "_unit"
+APPROX_SCHEMA = {
+    "table": pl.String,
+    "group": pl.String,
+    "estimate": pl.Float64,
+    "ci_low": pl.Float64,
+    "ci_high": pl.Float64,
+}
+
+# Qué estima cada fila de la tabla de intervalos: rollups de los cubos (by, where)
+E1_APPROX = {
+    "by_class": (["Pclass"], {}),
+    "by_sex": (["Sex"], {}),
+    "sex_by_class": (["Pclass", "Sex"], {}),
+    "survived": (["Survived"], {}),
+    "total_not_survived": ([], {"Survived": 0}),
+    "survived_by_class_sex": (["Pclass", "Sex"], {"Survived": 1}),
+    "not_survived_by_class_sex": (["Pclass", "Sex"], {"Survived": 0}),
+}
+E2_APPROX = {
+    "joined_rows": ([], {}),
+    "by_puerto": (["puerto"], {}),
+    "by_sex": (["Sex"], {}),
+    "deaths_by_age_range": (["rango_edad"], {"Survived": 0}),
+    "deaths_by_class_gender": (["Pclass", "Sex"], {"Survived": 0}),
+    "by_puerto_survived": (["puerto", "Survived"], {}),
+}
+
+
+# =========================================================
+# Muestra y estratos (cacheados en data/.sample)
+# =========================================================
+
+def sample_threshold(rows: int, target: int = SAMPLE_ROWS) -> int | None:
+    # Umbral sobre el hash (UInt64) para quedarse con ~target de rows filas; None = todas
+    if rows <= target:
+        return None
+    return int(target / rows * 2**64)
+
+
+def relative_error_bound(count: float, fraction: float) -> float:
+    # Error relativo máximo (3 sigma) de un recuento de count filas con una fracción muestreada fraction
+    if fraction >= 1 or count <= 0:
+        return 0.0 if fraction >= 1 else float("inf")
+    return 3 * ((1 - fraction) / (fraction * count)) ** 0.5
+
+
+def in_sample(threshold: int | None) -> pl.Expr:
+    if threshold is None:
+        return pl.lit(True)
+    return pl.col(KEY).cast(pl.Int64).hash(seed=SEED) < pl.lit(threshold, dtype=pl.UInt64)
+
+
+def _cached(data_dir: Path, name: str, suffix: str, version: str, build) -> pl.DataFrame:
+    # Como key_index: se lee de data/.sample si está al día con el CSV; si no, se construye
+    csv_path = data_dir / name
+    stem = Path(name).stem + suffix
+    arrow_path = data_dir / SAMPLE_DIR / f"{stem}.arrow"
+    meta_path = arrow_path.with_suffix(".json")
+    version = f"{version}|tolerant={is_tolerant()}"
+    if is_fresh(csv_path, arrow_path, meta_path, version):
+        return pl.read_ipc(arrow_path)
+
+    df = build()
+    arrow_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = arrow_path.with_suffix(".arrow.tmp")
+    df.write_ipc(tmp)
+    os.replace(tmp, arrow_path)
+    write_meta(csv_path, meta_path, version)
+    return df
+
+
+def load_strata(data_dir: Path, name: str) -> pl.DataFrame:
+    # Nº exacto de filas por estrato (N_h): una pasada streaming, guardada
+    def build() -> pl.DataFrame:
+        lf = scan_input(data_dir, name)
+        return lf.group_by(STRATA).agg(pl.len().cast(pl.Int64).alias("N_h")).collect(engine="streaming")
+
+    return _cached(data_dir, name, "_strata", f"{STRATA}", build)
+
+
+def load_sample(data_dir: Path, name: str, threshold: int | None) -> pl.DataFrame:
+    def build() -> pl.DataFrame:
+        return scan_input(data_dir, name).filter(in_sample(threshold)).collect(engine="streaming")
+
+    return _cached(data_dir, name, "", f"{SAMPLE_VERSION}|{SEED}|{threshold}", build)
+
+
+def units_and_strata(data_dir: Path, name: str, rows: int = SAMPLE_ROWS) -> tuple[pl.DataFrame, pl.DataFrame, int | None]:
+    # Muestra de la población (una fila por unidad, con su id UNIT), estratos y umbral usado
+    strata = load_strata(data_dir, name)
+    threshold = sample_threshold(int(strata["N_h"].sum()), rows)
+    units = load_sample(data_dir, name, threshold).with_row_index(UNIT)
+    return units, strata, threshold
+
+
+# =========================================================
+# Estimadores
+# =========================================================
+
+def _weights(units: pl.DataFrame, strata: pl.DataFrame) -> pl.DataFrame:
+    """
+    Por estrato: N_h, n_h (unidades en la muestra), peso N_h / n_h y
+    factor de varianza N_h^2 (1 - n_h/N_h) / (n_h (n_h - 1)).
+    Un estrato sin muestra no aporta (con SAMPLE_ROWS no ocurre salvo
+    en estratos diminutos).
+    """
+    n = units.group_by(STRATA).agg(pl.len().cast(pl.Int64).alias("n_h"))
+    fpc = 1 - pl.col("n_h") / pl.col("N_h")
+    return (
+        strata.join(n, on=STRATA, nulls_equal=True)
+        .with_columns(
+            (pl.col("N_h") / pl.col("n_h")).alias("w_h"),
+            pl.when(pl.col("n_h") > 1)
+            .then(pl.col("N_h") ** 2 * fpc / (pl.col("n_h") * (pl.col("n_h") - 1)))
+            .otherwise(0.0)
+            .alias("v_h"),
+        )
+    )
+
+
+def _grouped(rows: pl.DataFrame, by: list[str], where: dict[str, object]) -> tuple[pl.DataFrame, list[str]]:
+    # Filtro por igualdad (como CountCube.rollup) y grupo ficticio para el total (by = [])
+    for col, value in where.items():
+        rows = rows.filter(pl.col(col) == value)
+    if not by:
+        return rows.with_columns(pl.lit("").alias("_all")), ["_all"]
+    return rows, by
+
+
+def _cell(keys: list[str]) -> list[str]:
+    # Celda (estrato, grupo): by puede repetir columnas de STRATA
+    return list(dict.fromkeys([*STRATA, *keys]))
+
+
+def _interval(est: pl.Expr, var: pl.Expr) -> list[pl.Expr]:
+    half = Z * var.clip(lower_bound=0).sqrt()
+    return [est.alias("estimate"), (est - half).alias("ci_low"), (est + half).alias("ci_high")]
+
+
+def estimate_counts(
+    units: pl.DataFrame, rows: pl.DataFrame, strata: pl.DataFrame, by: list[str], **where: object
+) -> pl.DataFrame:
+    """
+    Recuento estimado de rows agrupado por `by` (filtrando por where),
+    con estimate, ci_low, ci_high. units: muestra de la población
+    (una fila por unidad); rows: filas a contar, con la columna UNIT de
+    su unidad (en Ejercicio 2, el join de la muestra).
+    """
+    rows, keys = _grouped(rows, by, where)
+    y = rows.group_by(UNIT, *_cell(keys)).agg(pl.len().cast(pl.Float64).alias("y"))
+    cells = (
+        y.group_by(_cell(keys))
+        .agg(pl.col("y").sum().alias("sy"), (pl.col("y") ** 2).sum().alias("syy"))
+        .join(_weights(units, strata), on=STRATA, nulls_equal=True)
+    )
+    var = pl.col("v_h") * (pl.col("syy") - pl.col("sy") ** 2 / pl.col("n_h"))
+    out = (
+        cells.group_by(keys)
+        .agg((pl.col("w_h") * pl.col("sy")).sum().alias("est"), var.sum().alias("var"))
+        .select(*keys, *_interval(pl.col("est"), pl.col("var")))
+        .with_columns(pl.col("ci_low").clip(lower_bound=0))  # un recuento no baja de 0
+        .sort(keys)
+    )
+    return out.drop("_all") if not by else out
+
+
+def estimate_mean(
+    units: pl.DataFrame, rows: pl.DataFrame, strata: pl.DataFrame, by: list[str], value: str
+) -> pl.DataFrame:
+    """
+    Media estimada de `value` por grupo (estimador de razón: total
+    estimado de value / nº estimado de valores no nulos), con su
+    intervalo. Varianza de z = (y - R x) / T_x por estrato.
+    """
+    rows, keys = _grouped(rows, by, {})
+    per_unit = rows.group_by(UNIT, *_cell(keys)).agg(
+        pl.col(value).sum().alias("y"), pl.col(value).count().cast(pl.Float64).alias("x")
+    )
+    sums = [
+        pl.col("y").sum().alias("sy"),
+        pl.col("x").sum().alias("sx"),
+        (pl.col("y") ** 2).sum().alias("syy"),
+        (pl.col("x") * pl.col("y")).sum().alias("sxy"),
+        (pl.col("x") ** 2).sum().alias("sxx"),
+    ]
+    cells = per_unit.group_by(_cell(keys)).agg(sums).join(_weights(units, strata), on=STRATA, nulls_equal=True)
+    totals = cells.group_by(keys).agg(
+        (pl.col("w_h") * pl.col("sy")).sum().alias("ty"), (pl.col("w_h") * pl.col("sx")).sum().alias("tx")
+    )
+    r = pl.col("ty") / pl.col("tx")
+    sz = (pl.col("sy") - r * pl.col("sx")) / pl.col("tx")
+    szz = (pl.col("syy") - 2 * r * pl.col("sxy") + r**2 * pl.col("sxx")) / pl.col("tx") ** 2
+    var = pl.col("v_h") * (szz - sz**2 / pl.col("n_h"))
+    out = (
+        cells.join(totals, on=keys, nulls_equal=True)
+        .group_by(keys)
+        .agg(r.first().alias("est"), var.sum().alias("var"))
+        .with_columns(pl.when(pl.col("est").is_finite()).then(pl.col("est")).alias("est"))
+        .select(*keys, *_interval(pl.col("est"), pl.col("var")))
+        .sort(keys)
+    )
+    return out.drop("_all") if not by else out
+
+
+def estimated_cube(units: pl.DataFrame, rows: pl.DataFrame, strata: pl.DataFrame, dims: list[str]) -> pl.DataFrame:
+    # Cubo de recuentos con las celdas estimadas sin redondear (float): entrada de e1_from_cube / e2_from_cube
+    cells = estimate_counts(units, rows, strata, dims)
+    return cells.select(*dims, pl.col("estimate").alias("count"))
+
+
+def rounded_counts(tables: dict[str, pl.DataFrame]) -> dict[str, pl.DataFrame]:
+    # Rollups del cubo estimado: se redondea una sola vez, al final, para que los totales
+    # de grupo coincidan con los "estimate" de las filas approx
+    return {name: df.with_columns(pl.col(pl.Float64).round().cast(pl.get_index_type())) for name, df in tables.items()}
+
+
+def interval_table(estimates: dict[str, pl.DataFrame]) -> pl.DataFrame:
+    # Una fila por valor estimado: table, group ("Pclass=1, Sex=male"), estimate, ci_low, ci_high
+    frames = []
+    for table, df in estimates.items():
+        keys = [c for c in df.columns if c not in ("estimate", "ci_low", "ci_high")]
+        parts = [pl.format(f"{c}={{}}", pl.col(c).cast(pl.String).fill_null("null")) for c in keys]
+        group = pl.concat_str(parts, separator=", ") if parts else pl.lit("")
+        frames.append(df.select(pl.lit(table).alias("table"), group.alias("group"), "estimate", "ci_low", "ci_high"))
+    if not frames:
+        return pl.DataFrame(schema=APPROX_SCHEMA)
+    return pl.concat(frames).with_columns(pl.col("estimate", "ci_low", "ci_high").round(2))
+
+
+# =========================================================
+# Ejercicios 1 y 2 en modo aproximado
+# =========================================================
+
+def e1_approx(data_dir: Path, rows: int = SAMPLE_ROWS) -> dict[str, pl.DataFrame]:
+    """
+    Tablas (4)-(14) de Ejercicio 1 a partir de la muestra de titanic.csv
+    (mismas tablas, recuentos estimados) y "approx": sus intervalos.
+    head y columns son exactos (primeras filas y esquema del CSV).
+    """
+    units, strata, _ = units_and_strata(data_dir, "titanic.csv", rows)
+    estimates = {name: estimate_counts(units, units, strata, by, **where) for name, (by, where) in E1_APPROX.items()}
+    lf = scan_input(data_dir, "titanic.csv")
+    return rounded_counts(e1_from_cube(estimated_cube(units, units, strata, E1_CUBE_DIMS))) | {
+        "head": lf.head(5).collect(),
+        "columns": lf.collect_schema().names(),
+        "approx": interval_table(estimates),
+    }
+
+
+def e2_approx(data_dir: Path, rows: int = SAMPLE_ROWS) -> dict[str, pl.DataFrame]:
+    """
+    Ejercicio 2 sobre el join de las muestras de pasajeros.csv y
+    supervivientes.csv (mismo umbral: mismos ids). La población son
+    las filas de pasajeros.csv, estratificadas por (Pclass, Sex).
+    """
+    units, strata, threshold = units_and_strata(data_dir, "pasajeros.csv", rows)
+    sample_s = load_sample(data_dir, "supervivientes.csv", threshold)
+    joined = add_age_range(add_puerto(join_by_id(units, sample_s)))
+
+    estimates = {name: estimate_counts(units, joined, strata, by, **where) for name, (by, where) in E2_APPROX.items()}
+    mean_age = estimate_mean(units, joined, strata, ["Sex", "Survived"], "Age")
+    estimates["mean_age"] = mean_age
+    return rounded_counts(e2_from_cube(estimated_cube(units, joined, strata, E2_CUBE_DIMS))) | {
+        "mean_age": mean_age.select("Sex", "Survived", pl.col("estimate").alias("mean_age")),
+        "approx": interval_table(estimates),
+    }
+
+
+# =========================================================
+# Comprobación contra las funciones exactas
+# =========================================================
+
+def exact_values(data_dir: Path) -> pl.DataFrame:
+    # Mismas filas que las tablas "approx", calculadas con los cubos y funciones exactos
+    cube1 = e1_cube(load_titanic(data_dir))
+    df = add_puerto(build_df(data_dir))
+    cube2 = e2_cube(df)
+
+    def as_estimate(frame: pl.DataFrame, col: str) -> pl.DataFrame:
+        return frame.with_columns(
+            pl.col(col).cast(pl.Float64).alias("estimate"), ci_low=pl.lit(0.0), ci_high=pl.lit(0.0)
+        ).drop(col)
+
+    rows = {f"e1:{n}": as_estimate(cube1.rollup(by, **w), "count") for n, (by, w) in E1_APPROX.items()}
+    rows |= {f"e2:{n}": as_estimate(cube2.rollup(by, **w), "count") for n, (by, w) in E2_APPROX.items()}
+    rows["e2:mean_age"] = as_estimate(mean_age_by_sex_survived(df), "mean_age")
+    return interval_table(rows).select("table", "group", pl.col("estimate").alias("exact"))
+
+
+def check_intervals(approx: pl.DataFrame, exact: pl.DataFrame) -> pl.DataFrame:
+    # approx con el valor exacto al lado, su error relativo y si cae dentro del intervalo
+    return approx.join(exact, on=["table", "group"], how="full", coalesce=True).with_columns(
+        ((pl.col("estimate") - pl.col("exact")).abs() / pl.col("exact").abs()).round(4).alias("rel_error"),
+        pl.col("exact").is_between(pl.col("ci_low") - 0.01, pl.col("ci_high") + 0.01).alias("covered"),
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Recuentos y medias aproximados (muestra estratificada de data/.sample) con IC al 95%."
+    )
+    parser.add_argument("--data-dir", type=str, default="data")
+    parser.add_argument("--rows", type=int, default=SAMPLE_ROWS, help="Tamaño aproximado de la muestra por CSV.")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Comparar con las funciones exactas (lee los CSV completos) y fallar si la cobertura es baja.",
+    )
+    parser.add_argument("--min-coverage", type=float, default=0.9, help="Fracción mínima de intervalos que contienen el valor exacto.")
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    approx = pl.concat(
+        [
+            e1_approx(data_dir, args.rows)["approx"].with_columns(pl.format("e1:{}", "table").alias("table")),
+            e2_approx(data_dir, args.rows)["approx"].with_columns(pl.format("e2:{}", "table").alias("table")),
+        ]
+    )
+    if not args.check:
+        with pl.Config(tbl_rows=-1, tbl_width_chars=200):
+            print(approx)
+        return 0
+
+    checked = check_intervals(approx, exact_values(data_dir))
+    with pl.Config(tbl_rows=-1, tbl_width_chars=200):
+        print(checked)
+    # Un grupo solo en una de las dos tablas (p.ej. sin filas en la muestra)
+    missing = checked.filter(pl.col("estimate").is_null() != pl.col("exact").is_null()).height
+    coverage = checked["covered"].mean()
+    print(f"cobertura: {coverage:.3f} ({checked['covered'].sum()}/{checked.height}); grupos sin pareja: {missing}")
+    return 0 if coverage is not None and coverage >= args.min_coverage and not missing else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
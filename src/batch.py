@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import polars as pl
+
+from src.cube import merge_counts
+from src.io_utils import TABLE_FORMATS, ArtifactCache, artifact_key, save_table, table_path
+from src.main import cache_section, ensure_dirs, validation_section, write_report_stub
+from src.partition import EXECUTORS
+from src.pipeline import Pipeline, RunOptions, Step, report_sections, select_steps
+from src.readers import set_tolerant
+from src.steps import DATASETS, GROUPS, STEPS
+
+
+# =========================================================
+# Modo batch: varios conjuntos de datos en paralelo
+# =========================================================
+#
+# python -m src.batch "viajes/*" --out batch --workers 4
+# Cada carpeta de datos (con titanic.csv, pasajeros.csv y
+# supervivientes.csv) se procesa en su propio worker con el mismo
+# pipeline que src.main y escribe en <out>/<nombre>/ (outputs/,
+# INFORME_FINAL.md y su propia caché). Después, <out>/summary.csv
+# resume cada conjunto y el total, calculado sumando los agregados de
+# cada uno (recuentos por clase, sexo y supervivencia, calidad del
+# join), sin volver a leer las filas. Esos agregados se guardan en
+# <out>/<nombre>/outputs/aggregates/ y pasan por la caché como el resto
+# de artefactos: con aciertos de caché el resumen no reconstruye nada.
+
+# Claves de los agregados de cada dataset que entran en el resumen
+SUMMARY_KEYS = {"e1_counts": ("by_class", "by_sex", "survived"), "df_joined": ("join_quality",)}
+TOTAL = "TOTAL"
+
+
+@dataclass(frozen=True)
+class BatchTask:
+    name: str
+    data_dir: Path
+    out_dir: Path
+    opts: RunOptions
+    figures: bool = True
+    cache: bool = True
+    threads: int = 1
+
+
+def find_data_dirs(patterns: list[str], manifest: Path | None = None) -> list[Path]:
+    """
+    Carpetas de datos: globs de la línea de comandos y/o un manifiesto
+    (una carpeta o glob por línea; '#' comenta). Rutas relativas del
+    manifiesto: respecto al propio manifiesto.
+    """
+    entries = [(p, Path.cwd()) for p in patterns]
+    if manifest is not None:
+        for line in manifest.read_text(encoding="utf-8").splitlines():
+            line = line.split("#", 1)[0].strip()
+            if line:
+                entries.append((line, manifest.parent))
+
+    dirs: list[Path] = []
+    for pattern, root in entries:
+        full = pattern if Path(pattern).is_absolute() else str(root / pattern)
+        for match in sorted(glob.glob(full)):
+            path = Path(match).resolve()
+            if path.is_dir() and path not in dirs:
+                dirs.append(path)
+    return dirs
+
+
+def dataset_names(dirs: list[Path]) -> list[str]:
+    # Nombre de la carpeta; si se repite, la ruta completa con '_' en lugar de '/'
+    names = [d.name for d in dirs]
+    return [
+        name if names.count(name) == 1 else "_".join(d.parts[1:])
+        for name, d in zip(names, dirs)
+    ]
+
+
+def summary_aggregates(
+    pipeline: Pipeline, steps: list[Step], data: dict[str, dict], out_dir: Path, threads: int = 1
+) -> dict[str, pl.DataFrame]:
+    """
+    Agregados del resumen como artefactos (Parquet) de out_dir: se
+    restauran de la caché si la hay y solo los que faltan se calculan,
+    con los nodos ya construidos por el pipeline o, si no, con los
+    mínimos necesarios (pipeline.build).
+    Solo entran las claves que lee algún paso activo (--approx no
+    calcula join_quality: ese dataset queda sin columnas e2_*).
+    """
+    cache = pipeline.cache
+    active = {(s.source, s.key) for s in steps}
+    artifacts: dict[str, tuple[str, str, Path]] = {}
+    for source, keys in SUMMARY_KEYS.items():
+        ds = pipeline.datasets[source]
+        inputs = [pipeline.data_dir / f for f in ds.files]
+        for key in keys:
+            if (source, key) in active:
+                path = out_dir / f"{key}.parquet"
+                cache_key = artifact_key(inputs, (save_table,), extra=f"aggregates/{key}|{ds.variant(pipeline.opts)}")
+                artifacts[key] = (source, cache_key, path)
+
+    missing = {
+        key: a for key, a in artifacts.items() if cache is None or not cache.restore(a[1], a[2])
+    }
+    sources = {source for source, _, _ in missing.values()} - set(data)
+    if sources:
+        data = data | pipeline.build(sources, threads=threads)
+    for key, (source, cache_key, path) in missing.items():
+        save_table(data[source][key], path, fmt="parquet")
+        if cache is not None:
+            cache.store(cache_key, path)
+    return {key: pl.read_parquet(path) for key, (_, _, path) in artifacts.items()}
+
+
+def run_dataset(task: BatchTask) -> dict[str, pl.DataFrame]:
+    # Worker: el pipeline de src.main sobre un dataset; devuelve sus agregados para el resumen
+    dirs = ensure_dirs(task.out_dir)
+    cache = ArtifactCache(task.out_dir / ".cache" / "artifacts") if task.cache else None
+    steps = select_steps(STEPS, task.opts, figures=task.figures)
+    set_tolerant(task.opts.validate)
+    checks = validation_section(task.data_dir, dirs) if task.opts.validate else []
+
+    pipeline = Pipeline(DATASETS, task.data_dir, dirs, task.opts, cache)
+    data = pipeline.run(steps, threads=task.threads)
+    aggs = summary_aggregates(
+        pipeline, select_steps(STEPS, task.opts), data, dirs["outputs"] / "aggregates", task.threads
+    )
+
+    sections = report_sections(steps, GROUPS, task.opts.figure_format)
+    sections.extend(checks)
+    sections.extend(cache_section(cache))
+    if cache is not None:
+        cache.flush()
+    write_report_stub(task.out_dir, dirs, sections)
+    return aggs
+
+
+def summary_row(name: str, aggs: dict[str, pl.DataFrame]) -> pl.DataFrame:
+    """
+    Una fila por dataset a partir de sus agregados: pasajeros,
+    supervivientes, recuentos por clase y sexo y calidad del join.
+    """
+    survived = aggs["survived"]
+    row: dict[str, object] = {
+        "dataset": name,
+        "pasajeros": survived["count"].sum(),
+        "supervivientes": survived.filter(pl.col("Survived") == 1)["count"].sum(),
+    }
+    for pclass, n in aggs["by_class"].iter_rows():
+        row[f"clase_{pclass}"] = n
+    for sex, n in aggs["by_sex"].iter_rows():
+        row[sex if sex is not None else "sexo_nulo"] = n
+    quality = aggs.get("join_quality")
+    for col, n in (quality.row(0, named=True).items() if quality is not None else ()):
+        row[f"e2_{col}"] = n
+    return pl.DataFrame([row]).with_columns(pl.exclude("dataset").cast(pl.Int64))
+
+
+def combine_summaries(rows: list[pl.DataFrame]) -> pl.DataFrame:
+    # Filas de cada dataset + TOTAL (suma de sus agregados) y tasa de supervivencia
+    table = pl.concat(rows, how="diagonal").with_columns(pl.exclude("dataset").fill_null(0))
+    total = merge_counts([table.drop("dataset")], []).select(pl.lit(TOTAL).alias("dataset"), pl.all())
+    rate = (pl.col("supervivientes") / pl.col("pasajeros")).round(4).alias("tasa_supervivencia")
+    first = ["dataset", "pasajeros", "supervivientes", "tasa_supervivencia"]
+    return pl.concat([table, total]).with_columns(rate).select(*first, pl.exclude(first))
+
+
+def run_batch(
+    data_dirs: list[Path],
+    out: Path,
+    opts: RunOptions,
+    workers: int = 1,
+    executor: str = "local",
+    figures: bool = True,
+    cache: bool = True,
+    threads: int = 1,
+) -> pl.DataFrame:
+    names = dataset_names(data_dirs)
+    tasks = [BatchTask(n, d, out / n, opts, figures, cache, threads) for n, d in zip(names, data_dirs)]
+    results = EXECUTORS[executor](workers).map(run_dataset, tasks)
+
+    summary = combine_summaries([summary_row(t.name, aggs) for t, aggs in zip(tasks, results)])
+    for fmt in opts.formats:
+        save_table(summary, table_path(out / "summary.csv", fmt), fmt=fmt, compression=opts.compression)
+    return summary
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Pipeline Titanic sobre varias carpetas de datos en paralelo.")
+    parser.add_argument("data_dirs", nargs="*", help="Carpetas de datos o globs (p.ej. 'viajes/*').")
+    parser.add_argument("--manifest", type=str, default=None, help="Fichero con una carpeta (o glob) por línea.")
+    parser.add_argument("--out", type=str, default="batch", help="Carpeta de salida: <out>/<dataset>/ y summary.csv.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Datasets procesados a la vez.")
+    parser.add_argument("--executor", choices=sorted(EXECUTORS), default="local")
+    parser.add_argument("--threads", type=int, default=1, help="Hilos del planificador dentro de cada worker.")
+    parser.add_argument("--lazy", action="store_true", help="Ejercicio 1 con scan_csv + collect_all.")
+    parser.add_argument("--engine", choices=["in-memory", "streaming"], default="in-memory")
+    parser.add_argument("--store", action="store_true", help="Leer los datos de <data_dir>/.store (Arrow IPC).")
+    parser.add_argument("--no-figures", dest="figures", action="store_false", help="Solo tablas.")
+    parser.add_argument("--no-cache", action="store_true", help="Sin caché de artefactos.")
+    parser.add_argument("--validate", action="store_true", help="Validar los CSV sin abortar (ver src.main).")
+    parser.add_argument("--approx", action="store_true", help="Recuentos estimados sobre la muestra de cada dataset (ver src.main).")
+    parser.add_argument("--approx-rows", type=int, default=100_000, help="Tamaño aproximado de la muestra por CSV.")
+    parser.add_argument(
+        "--output-format",
+        nargs="+",
+        choices=sorted(TABLE_FORMATS),
+        default=["csv"],
+        help="Formato(s) de las tablas.",
+    )
+    args = parser.parse_args()
+
+    manifest = Path(args.manifest) if args.manifest else None
+    data_dirs = find_data_dirs(args.data_dirs, manifest)
+    if not data_dirs:
+        parser.error("ninguna carpeta de datos (argumentos o --manifest)")
+
+    opts = RunOptions(
+        lazy=args.lazy,
+        engine=args.engine,
+        formats=tuple(dict.fromkeys(args.output_format)),
+        store=args.store,
+        validate=args.validate,
+        approx=args.approx,
+        approx_rows=args.approx_rows,
+    )
+    out = Path(args.out)
+    summary = run_batch(
+        data_dirs,
+        out,
+        opts,
+        workers=args.workers,
+        executor=args.executor,
+        figures=args.figures,
+        cache=not args.no_cache,
+        threads=args.threads,
+    )
+    with pl.Config(tbl_rows=-1, tbl_cols=-1, tbl_width_chars=400):
+        print(summary)
+    print(f"OK: {len(data_dirs)} datasets; resultados en {out}/ y {out}/summary.csv")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
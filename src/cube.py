@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import polars as pl
+
+
+# =========================================================
+# Cubo de recuentos
+# =========================================================
+
+class CountCube:
+    """
+    Recuentos al grano más fino de unas dimensiones (p.ej. Pclass, Sex,
+    Survived): un único group_by sobre los datos completos. Las tablas
+    por clase, por sexo, supervivientes por clase/sexo... se obtienen
+    agregando (rollup) este cubo, que tiene muy pocas filas.
+    """
+
+    def __init__(self, frame: pl.DataFrame | pl.LazyFrame, dims: list[str]) -> None:
+        self.frame = frame
+        self.dims = dims
+
+    @classmethod
+    def build(cls, df: pl.DataFrame | pl.LazyFrame, dims: list[str]) -> CountCube:
+        return cls(df.group_by(dims).agg(pl.len().alias("count")), dims)
+
+    def rollup(self, by: list[str], **where: object) -> pl.DataFrame | pl.LazyFrame:
+        """
+        Suma de count agrupada por `by` (subconjunto de dims), opcionalmente
+        filtrando antes por igualdad, p.ej. rollup(["Pclass", "Sex"], Survived=0).
+        Mismo resultado que filter + group_by + len + sort sobre los datos.
+        """
+        frame = self.frame
+        for col, value in where.items():
+            frame = frame.filter(pl.col(col) == value)
+
+        # Recuentos enteros al tipo de índice; los estimados (float, src.approx) se suman sin redondear
+        total = pl.col("count").sum()
+        if not frame.collect_schema()["count"].is_float():
+            total = total.cast(pl.get_index_type())
+        total = total.alias("count")
+        if not by:
+            return frame.select(total)
+        return frame.group_by(by).agg(total).sort(by)
+
+
+def as_cube(df: pl.DataFrame | pl.LazyFrame | CountCube, dims: list[str]) -> CountCube:
+    # Las funciones e1_* / ejercicio2 aceptan los datos o un cubo ya calculado
+    if isinstance(df, CountCube):
+        return df
+    return CountCube.build(df, dims)
+
+
+def merge_counts(frames: list[pl.DataFrame], keys: list[str]) -> pl.DataFrame:
+    # Suma de parciales (cubos, recuentos) calculados por separado: mismo tipo que el original
+    first = frames[0]
+    sums = [pl.col(c).sum().cast(first.schema[c]) for c in first.columns if c not in keys]
+    stacked = pl.concat(frames)
+    if not keys:
+        return stacked.select(sums)
+    return stacked.group_by(keys).agg(sums)
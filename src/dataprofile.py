@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import argparse
+import math
+from pathlib import Path
+
+import polars as pl
+
+from src.keyindex import KEY
+from src.profiling import profiled
+
+
+# =========================================================
+# Perfil de calidad de datos (una pasada, memoria acotada)
+# =========================================================
+#
+# profile_queries(lf) devuelve cuatro consultas lazy que se ejecutan
+# juntas (pl.collect_all, motor streaming si se pide) sobre el mismo
+# escaneo. Cada resultado es pequeño e independiente del nº de filas:
+#   - profile_stats: 1 fila con filas totales y, por columna, nulos,
+#     mínimo y máximo; para PassengerId, nº de pasos no crecientes
+#     (0 = clave estrictamente creciente: sin duplicados, exacto)
+#   - profile_hll: registros HyperLogLog de cada columna (valores distintos)
+#   - profile_quantiles: histograma logarítmico de cada columna numérica
+#     (error relativo <= QUANTILE_ALPHA en los cuantiles)
+#   - profile_top: recuento por valor de Pclass / Sex / Embarked
+# Todos se fusionan sumando / con max (merge_profiles): un shard, un lote
+# incremental o un fichero entero dan el mismo perfil.
+# profile_table los resume en una tabla (columna, tipo, nulos, distintos,
+# min, max, cuartiles, top-k).
+#
+# El perfil completo es opcional (main --data-profile): HLL, cuartiles y
+# orden de cada columna cuestan tanto como el resto del pipeline. Sin él,
+# e1_info sale del esquema + null_count() y join_quality de key_queries
+# (filas, nulos y orden de PassengerId), dentro del mismo collect_all.
+#
+# Con datos en memoria (o en el collect_all del modo lazy) las consultas
+# comparten el escaneo. Con el motor streaming, varias ramas sobre el
+# mismo escaneo se esperan unas a otras y acumulan lotes, así que
+# profile_scan recorre el fichero por lotes (collect_batches) y va
+# fusionando el perfil de cada lote: memoria = un lote + los resúmenes.
+
+HLL_P = 14  # 2^14 registros: error típico ~0.8 % en los distintos
+QUANTILE_ALPHA = 0.01
+QUANTILES = (0.25, 0.5, 0.75)
+TOP_COLUMNS = ("Pclass", "Sex", "Embarked")
+TOP_K = 5
+
+PROFILE_BATCH_ROWS = 500_000
+
+PROFILE_KEYS = ("profile_stats", "profile_hll", "profile_quantiles", "profile_top")
+_ORDER = "profile_order"  # consulta aparte: diff() junto a las agregaciones saca la consulta del streaming
+
+_GAMMA = (1 + QUANTILE_ALPHA) / (1 - QUANTILE_ALPHA)
+_RANK_BITS = 64  # código HLL = registro * 64 + rango
+
+
+def _hll_codes(col: str) -> pl.Expr:
+    # Registro: los HLL_P bits altos del hash; rango: posición del primer 1 en el resto
+    h = pl.col(col).hash(seed=0)
+    register = (h // (1 << (64 - HLL_P))).cast(pl.UInt32)
+    rank = ((h % (1 << (64 - HLL_P))).bitwise_leading_zeros() - (HLL_P - 1)).cast(pl.UInt32)
+    return (register * _RANK_BITS + rank).alias("code")
+
+
+def _bucket(col: str) -> pl.Expr:
+    # Cubeta logarítmica con signo (0 = el valor 0): |x| en (gamma^(k-1), gamma^k] -> ±(k+1)
+    x = pl.col(col)
+    k_pos = (x.log() / math.log(_GAMMA)).ceil() + 1
+    k_neg = -((-x).log() / math.log(_GAMMA)).ceil() - 1
+    return pl.when(x > 0).then(k_pos).when(x < 0).then(k_neg).otherwise(0).cast(pl.Int32).alias("bucket")
+
+
+def profile_queries(lf: pl.LazyFrame, prefix: str = "", key: str = KEY) -> dict[str, pl.LazyFrame]:
+    """
+    Consultas del perfil de lf (ver arriba), para un único collect_all.
+    prefix: distingue las claves si van varios ficheros en el mismo collect_all.
+    """
+    schema = lf.collect_schema()
+    cols = schema.names()
+
+    stats = [pl.len().cast(pl.Int64).alias("rows")]
+    for c in cols:
+        stats += [
+            pl.col(c).null_count().cast(pl.Int64).alias(f"{c}|nulls"),
+            pl.col(c).min().alias(f"{c}|min"),
+            pl.col(c).max().alias(f"{c}|max"),
+        ]
+    order = [(pl.col(key).drop_nulls().diff() <= 0).sum().cast(pl.Int64).alias(f"{key}|unsorted")] if key in schema else []
+
+    # Una rama por columna; select(drop_nulls) y no filter: con filter el streaming no acota la memoria
+    def values(c: str) -> pl.LazyFrame:
+        return lf.select(pl.col(c).drop_nulls())
+
+    hll = [values(c).select(pl.lit(c).alias("column"), _hll_codes(c)).unique() for c in cols]
+    quantiles = [
+        values(c)
+        .select(pl.col(c).cast(pl.Float64))
+        .group_by(_bucket(c))
+        .agg(pl.len().cast(pl.Int64).alias("count"), pl.col(c).min().alias("lo"), pl.col(c).max().alias("hi"))
+        .select(pl.lit(c).alias("column"), "bucket", "count", "lo", "hi")
+        for c, dt in schema.items()
+        if dt.is_numeric()
+    ]
+    top = [
+        values(c)
+        .group_by(c)
+        .agg(pl.len().cast(pl.Int64).alias("count"))
+        .select(pl.lit(c).alias("column"), pl.col(c).cast(pl.String).alias("value"), "count")
+        for c in TOP_COLUMNS
+        if c in schema
+    ]
+    queries = {
+        "profile_stats": lf.select(stats),
+        _ORDER: lf.select(order),
+        "profile_hll": _concat(hll, {"column": pl.String, "code": pl.UInt32}),
+        "profile_quantiles": _concat(
+            quantiles, {"column": pl.String, "bucket": pl.Int32, "count": pl.Int64, "lo": pl.Float64, "hi": pl.Float64}
+        ),
+        "profile_top": _concat(top, {"column": pl.String, "value": pl.String, "count": pl.Int64}),
+    }
+    return {f"{prefix}{k}": q for k, q in queries.items()}
+
+
+def key_queries(lf: pl.LazyFrame, prefix: str = "", key: str = KEY) -> dict[str, pl.LazyFrame]:
+    """
+    Solo lo que necesita join_quality (filas, nulos y orden de la clave):
+    dos agregados baratos que van en el collect_all de los datos, sin
+    HLL ni cuantiles. pop_key_stats los deja con la forma de un perfil.
+    """
+    stats = [pl.len().cast(pl.Int64).alias("rows"), pl.col(key).null_count().cast(pl.Int64).alias(f"{key}|nulls")]
+    order = [(pl.col(key).drop_nulls().diff() <= 0).sum().cast(pl.Int64).alias(f"{key}|unsorted")]
+    return {f"{prefix}key_stats": lf.select(stats), f"{prefix}key_order": lf.select(order)}
+
+
+def pop_key_stats(res: dict, prefix: str = "") -> dict[str, pl.DataFrame]:
+    # Como pop_profile, para las consultas de key_queries (solo profile_stats)
+    return {"profile_stats": res.pop(f"{prefix}key_stats").hstack(res.pop(f"{prefix}key_order"))}
+
+
+def _concat(frames: list[pl.LazyFrame], schema: dict[str, pl.DataType]) -> pl.LazyFrame:
+    return pl.concat(frames) if frames else pl.LazyFrame(schema=schema)
+
+
+def pop_profile(res: dict, prefix: str = "") -> dict[str, pl.DataFrame]:
+    # Saca del dict de resultados de un collect_all las piezas del perfil
+    profile = {k: res.pop(f"{prefix}{k}") for k in PROFILE_KEYS}
+    profile["profile_stats"] = profile["profile_stats"].hstack(res.pop(f"{prefix}{_ORDER}"))
+    return profile
+
+
+def _collect(lf: pl.LazyFrame) -> dict[str, pl.DataFrame]:
+    queries = profile_queries(lf)
+    return pop_profile(dict(zip(queries, pl.collect_all(list(queries.values())))))
+
+
+@profiled
+def profile_data(df: pl.DataFrame | pl.LazyFrame) -> dict[str, pl.DataFrame]:
+    # Datos ya en memoria (o ficheros pequeños): un collect_all
+    return _collect(df.lazy())
+
+
+@profiled
+def profile_scan(lf: pl.LazyFrame, batch_rows: int = PROFILE_BATCH_ROWS) -> dict[str, pl.DataFrame]:
+    # Memoria acotada: perfil de cada lote de batch_rows filas, fusionado en orden
+    profile = None
+    for batch in lf.collect_batches(chunk_size=batch_rows):
+        part = _collect(batch.lazy())
+        profile = part if profile is None else merge_profiles([profile, part], ordered=True)
+    return profile if profile is not None else _collect(lf.clear())
+
+
+def merge_profiles(parts: list[dict[str, pl.DataFrame]], ordered: bool = False, key: str = KEY) -> dict[str, pl.DataFrame]:
+    """
+    Perfil de la unión de varios perfiles parciales.
+    ordered=False: partes disjuntas por clave (shards por hash o rango de
+    PassengerId): un duplicado cae siempre en el mismo shard.
+    ordered=True: trozos consecutivos de un mismo fichero (modo
+    incremental): la clave además debe crecer de un trozo al siguiente.
+    """
+    stats = pl.concat([p["profile_stats"] for p in parts], how="vertical_relaxed")
+    aggs = []
+    for c in stats.columns:
+        if c.endswith("|min"):
+            aggs.append(pl.col(c).min())
+        elif c.endswith("|max"):
+            aggs.append(pl.col(c).max())
+        else:
+            aggs.append(pl.col(c).sum())
+    merged = stats.select(aggs)
+
+    unsorted = f"{key}|unsorted"
+    if ordered and unsorted in stats.columns:
+        # Frontera entre trozos: el primer id del siguiente debe superar al último del anterior
+        bounds = stats.filter(pl.col(f"{key}|min").is_not_null())
+        steps = (bounds[f"{key}|min"].shift(-1) <= bounds[f"{key}|max"]).sum()
+        merged = merged.with_columns(pl.col(unsorted) + steps)
+
+    return {
+        "profile_stats": merged,
+        "profile_hll": pl.concat([p["profile_hll"] for p in parts]).unique(),
+        "profile_quantiles": pl.concat([p["profile_quantiles"] for p in parts])
+        .group_by("column", "bucket")
+        .agg(pl.col("count").sum(), pl.col("lo").min(), pl.col("hi").max()),
+        "profile_top": pl.concat([p["profile_top"] for p in parts])
+        .group_by("column", "value")
+        .agg(pl.col("count").sum()),
+    }
+
+
+# =========================================================
+# Resumen: tabla de perfil
+# =========================================================
+
+def key_is_unique(profile: dict[str, pl.DataFrame], key: str = KEY) -> bool:
+    """True si la clave es estrictamente creciente (sin duplicados, sin más de un nulo)."""
+    stats = profile["profile_stats"]
+    if f"{key}|unsorted" not in stats.columns:
+        return False
+    return stats[f"{key}|unsorted"].item() == 0 and stats[f"{key}|nulls"].item() <= 1
+
+
+def estimate_distinct(hll: pl.DataFrame) -> dict[str, int]:
+    # Estimador HyperLogLog con la corrección de rango bajo (linear counting)
+    m = 1 << HLL_P
+    alpha = 0.7213 / (1 + 1.079 / m)
+    registers = hll.group_by("column", pl.col("code") // _RANK_BITS).agg(
+        (pl.col("code") % _RANK_BITS).max().alias("rank")
+    )
+    out: dict[str, int] = {}
+    for col, used, z in registers.group_by("column").agg(pl.len(), (0.5 ** pl.col("rank")).sum()).iter_rows():
+        empty = m - used
+        estimate = alpha * m * m / (z + empty)
+        if estimate <= 2.5 * m and empty:
+            estimate = m * math.log(m / empty)
+        out[col] = round(estimate)
+    return out
+
+
+def estimate_quantiles(buckets: pl.DataFrame, qs: tuple[float, ...] = QUANTILES) -> dict[str, list[float]]:
+    """
+    Cuantiles (rango más cercano) a partir del histograma logarítmico.
+    Si la cubeta solo tiene un valor (lo == hi) el resultado es exacto;
+    si no, el centro de la cubeta, con error relativo <= QUANTILE_ALPHA.
+    """
+    out: dict[str, list[float]] = {}
+    for (col,), part in buckets.sort("bucket").group_by("column", maintain_order=True):
+        part = part.with_columns(pl.col("count").cum_sum().alias("cum"))
+        n = part["cum"][-1]
+        values = []
+        for q in qs:
+            row = part.filter(pl.col("cum") >= max(1, math.ceil(q * n))).row(0, named=True)
+            b, lo, hi = row["bucket"], row["lo"], row["hi"]
+            mid = 0.0 if b == 0 else math.copysign(2 * _GAMMA ** (abs(b) - 1) / (_GAMMA + 1), b)
+            values.append(lo if lo == hi else min(max(mid, lo), hi))
+        out[col] = values
+    return out
+
+
+def profile_table(profile: dict[str, pl.DataFrame], schema: pl.Schema, key: str = KEY) -> pl.DataFrame:
+    """
+    Una fila por columna: dtype, filas, nulos, distintos (estimación
+    HLL), min, max, cuartiles (columnas numéricas), top-k (Pclass, Sex,
+    Embarked) y, para PassengerId, claves duplicadas: 0 exacto si la
+    clave es estrictamente creciente; si no, filas - distintos (estimación;
+    el recuento exacto está en join_quality).
+    """
+    stats = profile["profile_stats"].row(0, named=True)
+    distinct = estimate_distinct(profile["profile_hll"])
+    quantiles = estimate_quantiles(profile["profile_quantiles"])
+    top = {}
+    for (col,), part in profile["profile_top"].group_by("column"):
+        best = part.sort(["count", "value"], descending=[True, False]).head(TOP_K)
+        top[col] = ", ".join(f"{v} ({n})" for v, n in best.select("value", "count").iter_rows())
+
+    rows = []
+    for c, dt in schema.items():
+        count = stats["rows"] - stats[f"{c}|nulls"]
+        q = quantiles.get(c, [None] * len(QUANTILES))
+        dups = None
+        if c == key:
+            dups = 0 if key_is_unique(profile, key) else max(0, count - distinct.get(c, 0))
+        rows.append(
+            {
+                "column": c,
+                "dtype": str(dt),
+                "count": count,
+                "nulls": stats[f"{c}|nulls"],
+                "distinct_est": min(distinct.get(c, 0), count),
+                "min": None if stats[f"{c}|min"] is None else str(stats[f"{c}|min"]),
+                "max": None if stats[f"{c}|max"] is None else str(stats[f"{c}|max"]),
+                **{f"p{round(p * 100)}": v for p, v in zip(QUANTILES, q)},
+                "top": top.get(c),
+                "dup_keys_est": dups,
+            }
+        )
+    return pl.DataFrame(
+        rows,
+        schema={
+            "column": pl.String,
+            "dtype": pl.String,
+            "count": pl.Int64,
+            "nulls": pl.get_index_type(),
+            "distinct_est": pl.Int64,
+            "min": pl.String,
+            "max": pl.String,
+            **{f"p{round(p * 100)}": pl.Float64 for p in QUANTILES},
+            "top": pl.String,
+            "dup_keys_est": pl.Int64,
+        },
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Perfil de calidad de un CSV (una pasada por lotes).")
+    parser.add_argument("csv", type=str, help="Fichero CSV.")
+    parser.add_argument("--batch-rows", type=int, default=PROFILE_BATCH_ROWS, help="Filas por lote.")
+    parser.add_argument("--out", type=str, default=None, help="Guardar la tabla en este CSV.")
+    args = parser.parse_args()
+
+    lf = pl.scan_csv(args.csv)
+    table = profile_table(profile_scan(lf, args.batch_rows), lf.collect_schema())
+    if args.out:
+        table.write_csv(Path(args.out))
+    with pl.Config(tbl_rows=-1, tbl_cols=-1, tbl_width_chars=250, fmt_str_lengths=60):
+        print(table)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
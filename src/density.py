@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import polars as pl
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+# =========================================================
+# Edades en una rejilla fija (una sola pasada, memoria acotada)
+# =========================================================
+#
+# Cada edad cae en la celda floor((Age - AGE_GRID_LO) / AGE_GRID_STEP) de
+# una rejilla fija (las de fuera del rango, en la primera / última); por
+# celda: recuento y edad mínima y máxima. Son AGE_GRID_CELLS filas como
+# mucho, sea cual sea el nº de filas o de edades distintas, y se fusionan
+# entre shards con suma / min / max. Histograma y densidad salen de las
+# celdas: con un único valor por celda (edades enteras, x.5, 0.42, 0.83...)
+# el resultado es el mismo que con la columna completa; si no, cada celda
+# cuenta como su centro (error <= AGE_GRID_STEP / 2 en la edad).
+
+AGE_GRID_LO = 0.0
+AGE_GRID_STEP = 1.0 / 32
+AGE_GRID_CELLS = 120 * 32  # [0, 120) años
+
+
+def age_bins_query(df: pl.DataFrame | pl.LazyFrame) -> pl.LazyFrame:
+    # Consulta lazy de age_bins (para combinarla en un collect_all)
+    age = pl.col("Age")
+    cell = ((age - AGE_GRID_LO) / AGE_GRID_STEP).floor().clip(0, AGE_GRID_CELLS - 1).cast(pl.Int32)
+    return (
+        df.lazy()
+        .select(age.cast(pl.Float64))
+        .filter(age.is_not_null() & age.is_not_nan())
+        .group_by(cell.alias("cell"))
+        .agg(pl.len().cast(pl.Int64).alias("count"), age.min().alias("lo"), age.max().alias("hi"))
+        .sort("cell")
+    )
+
+
+def age_bins(df: pl.DataFrame | pl.LazyFrame, engine: str = "streaming") -> pl.DataFrame:
+    """
+    Edades (sin nulos) en la rejilla fija: columnas cell, count, lo, hi.
+    Con un LazyFrame (scan_csv) se calcula en una pasada del motor
+    streaming, por lotes, sin cargar la columna Age completa.
+    """
+    return age_bins_query(df).collect(engine=engine)
+
+
+def merge_age_bins(frames: list[pl.DataFrame]) -> pl.DataFrame:
+    # age_bins de varios shards: mismas celdas, recuentos sumados (exacto, sin depender del orden)
+    return (
+        pl.concat(frames)
+        .group_by("cell")
+        .agg(pl.col("count").sum(), pl.col("lo").min(), pl.col("hi").max())
+        .sort("cell")
+    )
+
+
+def age_bin_values(bins: pl.DataFrame) -> pl.Series:
+    # Edad que representa a cada celda: su único valor o, si hay varios, el centro (dentro de [lo, hi])
+    mid = AGE_GRID_LO + (pl.col("cell") + 0.5) * AGE_GRID_STEP
+    return bins.select(
+        pl.when(pl.col("lo") == pl.col("hi"))
+        .then(pl.col("lo"))
+        .otherwise(pl.min_horizontal(pl.max_horizontal(mid, pl.col("lo")), pl.col("hi")))
+        .alias("Age")
+    ).to_series()
+
+
+def age_histogram(bins: pl.DataFrame, n_bins: int) -> pl.DataFrame:
+    """
+    Histograma de n_bins intervalos iguales entre la edad mínima y la
+    máxima (mismos cortes que np.histogram) a partir de age_bins:
+    columnas edge (borde izquierdo) y count, más una última fila con el
+    borde derecho y count 0. Se calcula en Polars sobre las celdas
+    (como mucho AGE_GRID_CELLS filas), sin materializar la columna Age.
+    """
+    if bins.height == 0:
+        return pl.DataFrame(schema={"edge": pl.Float64, "count": pl.Int64})
+    lo, hi = bins["lo"].min(), bins["hi"].max()
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+    width = (hi - lo) / n_bins
+
+    # Intervalos [a, b); el último incluye el máximo
+    idx = ((pl.col("Age") - lo) / width).floor().cast(pl.Int64).clip(0, n_bins - 1).alias("bin")
+    counts = (
+        bins.select(age_bin_values(bins), "count")
+        .group_by(idx)
+        .agg(pl.col("count").sum().cast(pl.Int64))
+    )
+    return (
+        pl.DataFrame({"bin": pl.int_range(0, n_bins + 1, eager=True)})
+        .join(counts, on="bin", how="left")
+        .select(
+            (lo + pl.col("bin") * width).alias("edge"),
+            pl.when(pl.col("bin") < n_bins).then(pl.col("count").fill_null(0)).otherwise(0).alias("count"),
+        )
+    )
+
+
+# =========================================================
+# KDE a partir de los recuentos: exacta o por binning lineal + FFT
+# =========================================================
+
+def scott_bandwidth(values: np.ndarray, weights: np.ndarray) -> float:
+    # Mismo criterio que gaussian_kde (Scott) para una muestra de n = sum(weights) puntos
+    import numpy as np
+
+    n = weights.sum()
+    mean = np.average(values, weights=weights)
+    var = np.sum(weights * (values - mean) ** 2) / (n - 1)
+    return float(np.sqrt(var) * n ** (-1.0 / 5.0))
+
+
+def weighted_kde(values: np.ndarray, weights: np.ndarray, xs: np.ndarray, chunk: int = 4096) -> np.ndarray:
+    """
+    Densidad gaussiana exacta en xs a partir de (valor, recuento), p.ej.
+    las celdas de age_bins: la misma curva que gaussian_kde sobre la
+    columna completa (ancho de Scott con n = sum(weights)) si cada celda
+    tiene un solo valor. Coste O(celdas · len(xs)), acotado por la
+    rejilla; los valores se recorren por bloques de chunk.
+    """
+    import numpy as np
+
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    bw = scott_bandwidth(values, weights)
+    dens = np.zeros(len(xs))
+    for start in range(0, len(values), chunk):
+        z = (xs[:, None] - values[None, start:start + chunk]) / bw
+        dens += np.exp(-0.5 * z**2) @ weights[start:start + chunk]
+    return dens / (weights.sum() * bw * np.sqrt(2.0 * np.pi))
+
+
+def binned_kde(
+    values: np.ndarray,
+    weights: np.ndarray,
+    xs: np.ndarray,
+    grid_size: int = 512,
+) -> np.ndarray:
+    """
+    Densidad gaussiana evaluada en xs a partir de (valor, recuento).
+    Cada valor se reparte linealmente entre los dos nodos vecinos de una
+    rejilla regular y la rejilla se convoluciona con el kernel por FFT:
+    coste O(m log m) en vez de O(n·m) de gaussian_kde. La rejilla solo
+    cubre [min(values), max(values)]: fuera de ese rango np.interp
+    devuelve el valor del borde (no la cola de la densidad), así que xs
+    debe quedar dentro, como la rejilla de la figura.
+    """
+    import numpy as np
+
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    n = weights.sum()
+    bw = scott_bandwidth(values, weights)
+
+    lo, hi = values.min(), values.max()
+    grid = np.linspace(lo, hi, grid_size)
+    delta = grid[1] - grid[0]
+
+    # binning lineal
+    pos = (values - lo) / delta
+    left = np.clip(np.floor(pos).astype(int), 0, grid_size - 2)
+    frac = pos - left
+    binned = np.zeros(grid_size)
+    np.add.at(binned, left, weights * (1.0 - frac))
+    np.add.at(binned, left + 1, weights * frac)
+
+    # kernel truncado a ±4 bandwidths; relleno con ceros para no envolver
+    half = min(grid_size - 1, int(np.ceil(4.0 * bw / delta)))
+    kernel = np.exp(-0.5 * (np.arange(-half, half + 1) * delta / bw) ** 2)
+    kernel /= bw * np.sqrt(2.0 * np.pi)
+
+    size = 1 << int(np.ceil(np.log2(grid_size + 2 * half + 1)))
+    conv = np.fft.irfft(np.fft.rfft(binned, size) * np.fft.rfft(kernel, size), size)
+    dens = conv[half:half + grid_size] / n
+
+    return np.interp(xs, grid, dens)
@@ -3,83 +3,125 @@ from __future__ import annotations
 import polars as pl
 from pathlib import Path
 
+from src.cube import CountCube, as_cube, merge_counts
+from src.dataprofile import merge_profiles, pop_profile, profile_data, profile_queries, profile_scan, profile_table
+from src.density import age_bins, age_bins_query, merge_age_bins
+from src.profiling import profiled
+from src.readers import read_input, scan_input
+from src.store import load_store, scan_store
+
 
 # =========================================================
 # Carga de datos
 # =========================================================
 
-def load_titanic(data_dir: Path) -> pl.DataFrame:
-    return pl.read_csv(data_dir / "titanic.csv")
+@profiled
+def load_titanic(data_dir: Path, store: bool = False) -> pl.DataFrame:
+    # store: Arrow IPC convertido una vez y mapeado en memoria (src/store.py)
+    if store:
+        return load_store(data_dir, "titanic.csv")
+    return read_input(data_dir, "titanic.csv")
+
+
+def scan_titanic(data_dir: Path, store: bool = False) -> pl.LazyFrame:
+    # Modo lazy: el CSV se lee una sola vez dentro de e1_collect_all
+    if store:
+        return scan_store(data_dir, "titanic.csv")
+    return scan_input(data_dir, "titanic.csv")
 
 
 # =========================================================
 # Análisis exploratorio básico
 # =========================================================
 
+# Dimensiones del cubo de recuentos compartido por (4)-(14)
+E1_CUBE_DIMS = ["Pclass", "Sex", "Survived"]
+
+
+def e1_cube(df: pl.DataFrame | pl.LazyFrame) -> CountCube:
+    return CountCube.build(df, E1_CUBE_DIMS)
+
+
+@profiled
 def e1_head(df: pl.DataFrame, n: int = 5) -> pl.DataFrame:
     return df.head(n)
 
 
-def e1_columns(df: pl.DataFrame) -> list[str]:
-    return df.columns
+@profiled
+def e1_columns(df: pl.DataFrame | pl.LazyFrame) -> list[str]:
+    return df.collect_schema().names()
+
+
+@profiled
+def e1_profile(df: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame:
+    # (0) Perfil de calidad (src.dataprofile): nulos, distintos, min/max, cuartiles, top-k
+    return profile_table(profile_data(df), df.collect_schema())
 
 
-def e1_info(df: pl.DataFrame) -> pl.DataFrame:
-    schema = pl.DataFrame(
+@profiled
+def e1_info(df: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame:
+    return info_from_nulls(df.collect_schema(), e1_null_counts(df))
+
+
+def e1_null_counts(df: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame | pl.LazyFrame:
+    # 1 fila con los nulos de cada columna (sumable entre shards); va en el collect_all
+    return df.select(pl.all().null_count())
+
+
+def info_from_nulls(schema: pl.Schema, nulls: pl.DataFrame) -> pl.DataFrame:
+    # (3) dtype (del esquema, sin leer datos) + nulos
+    return pl.DataFrame(
         {
-            "column": df.columns,
-            "dtype": [str(df.schema[c]) for c in df.columns],
-        }
-    )
-    nulls = (
-        df.null_count()
-        .transpose(include_header=True, header_name="column", column_names=["nulls"])
+            "column": schema.names(),
+            "dtype": [str(dt) for dt in schema.dtypes()],
+            "nulls": list(nulls.row(0)),
+        },
+        schema={"column": pl.String, "dtype": pl.String, "nulls": pl.get_index_type()},
     )
-    return schema.join(nulls, on="column", how="left")
 
 
-def e1_passengers_by_class(df: pl.DataFrame) -> pl.DataFrame:
-    return (
-        df.group_by("Pclass")
-        .agg(pl.len().alias("count"))
-        .sort("Pclass")
-    )
+# Las funciones de recuento aceptan los datos o un CountCube ya calculado
+# (e1_cube): con el cubo, cada tabla es un rollup de unas pocas filas.
 
+@profiled
+def e1_passengers_by_class(df: pl.DataFrame | CountCube) -> pl.DataFrame:
+    return as_cube(df, E1_CUBE_DIMS).rollup(["Pclass"])
 
-def e1_passengers_by_sex(df: pl.DataFrame) -> pl.DataFrame:
-    return (
-        df.group_by("Sex")
-        .agg(pl.len().alias("count"))
-        .sort("Sex")
-    )
 
+@profiled
+def e1_passengers_by_sex(df: pl.DataFrame | CountCube) -> pl.DataFrame:
+    return as_cube(df, E1_CUBE_DIMS).rollup(["Sex"])
 
-def e1_sex_by_class(df: pl.DataFrame) -> pl.DataFrame:
-    return (
-        df.group_by(["Pclass", "Sex"])
-        .agg(pl.len().alias("count"))
-        .sort(["Pclass", "Sex"])
-    )
+
+@profiled
+def e1_sex_by_class(df: pl.DataFrame | CountCube) -> pl.DataFrame:
+    return as_cube(df, E1_CUBE_DIMS).rollup(["Pclass", "Sex"])
 
 
 # =========================================================
 # Punto 10 — SOLO supervivientes (pivot)
 # =========================================================
 
-def e1_survived_pivot_by_class_sex(df: pl.DataFrame) -> pl.DataFrame:
+@profiled
+def e1_survived_pivot_by_class_sex(df: pl.DataFrame | CountCube) -> pl.DataFrame:
     """
     (10) Número de pasajeros que sobrevivieron en cada clase,
     agrupados por sexo, SOLO supervivientes.
     Incluye total por clase.
     """
-    surv = df.filter(pl.col("Survived") == 1)
+    return _survived_pivot(_survived_counts_by_class_sex(df))
+
 
+def _survived_counts_by_class_sex(df: pl.DataFrame | pl.LazyFrame | CountCube) -> pl.DataFrame | pl.LazyFrame:
+    return as_cube(df, E1_CUBE_DIMS).rollup(["Pclass", "Sex"], Survived=1)
+
+
+def _survived_pivot(counts: pl.DataFrame) -> pl.DataFrame:
+    # pivot en eager (pivot no existe en LazyFrame); counts es pequeño
     pivot = (
-        surv.group_by(["Pclass", "Sex"])
-        .agg(pl.len().alias("count"))
-        .pivot(
+        counts.pivot(
             index="Pclass",
-            columns="Sex",
+            on="Sex",
             values="count",
             aggregate_function="first",
         )
@@ -99,13 +141,26 @@ def e1_survived_pivot_by_class_sex(df: pl.DataFrame) -> pl.DataFrame:
     return pivot.select(["Pclass", "female", "male", "TotalSurvived"])
 
 
+# =========================================================
+# Punto 11 — Supervivientes sí/no (datos del plot)
+# =========================================================
+
+@profiled
+def e1_survived_counts(df: pl.DataFrame | CountCube) -> pl.DataFrame:
+    # Recuento por Survived: la figura (11) recibe estas 2 filas, no el df completo
+    return as_cube(df, E1_CUBE_DIMS).rollup(["Survived"])
+
+
 # =========================================================
 # Punto 12 — Total NO supervivientes
 # =========================================================
 
-def e1_total_not_survived(df: pl.DataFrame) -> pl.DataFrame:
-    return df.filter(pl.col("Survived") == 0).select(
-        pl.len().alias("not_survived_total")
+@profiled
+def e1_total_not_survived(df: pl.DataFrame | CountCube) -> pl.DataFrame:
+    return (
+        as_cube(df, E1_CUBE_DIMS)
+        .rollup([], Survived=0)
+        .rename({"count": "not_survived_total"})
     )
 
 
@@ -113,35 +168,37 @@ def e1_total_not_survived(df: pl.DataFrame) -> pl.DataFrame:
 # Punto 13 — NO supervivientes por clase y sexo
 # =========================================================
 
-def e1_not_survived_by_class_sex(df: pl.DataFrame) -> pl.DataFrame:
-    return (
-        df.filter(pl.col("Survived") == 0)
-        .group_by(["Pclass", "Sex"])
-        .agg(pl.len().alias("count"))
-        .sort(["Pclass", "Sex"])
-    )
+@profiled
+def e1_not_survived_by_class_sex(df: pl.DataFrame | CountCube) -> pl.DataFrame:
+    return as_cube(df, E1_CUBE_DIMS).rollup(["Pclass", "Sex"], Survived=0)
 
 
 # =========================================================
 # Punto 14 — Supervivieron y NO (pivot)
 # =========================================================
 
-def e1_survived_not_pivot_by_class_sex(df: pl.DataFrame) -> pl.DataFrame:
+@profiled
+def e1_survived_not_pivot_by_class_sex(df: pl.DataFrame | CountCube) -> pl.DataFrame:
     """
     (14) Número de pasajeros que sobrevivieron y que no sobrevivieron,
     agrupados por clase y sexo (pivot).
     """
-    base = (
-        df.group_by(["Pclass", "Sex", "Survived"])
-        .agg(pl.len().alias("count"))
-        .sort(["Pclass", "Sex", "Survived"])
+    return _survived_not_pivot(_counts_by_class_sex_survived(df))
+
+
+def _counts_by_class_sex_survived(df: pl.DataFrame | pl.LazyFrame | CountCube) -> pl.DataFrame | pl.LazyFrame:
+    return (
+        as_cube(df, E1_CUBE_DIMS)
+        .rollup(["Pclass", "Sex", "Survived"])
         .with_columns(pl.col("Survived").cast(pl.Utf8))  # <-- clave: columnas del pivot como strings "0"/"1"
     )
 
+
+def _survived_not_pivot(base: pl.DataFrame) -> pl.DataFrame:
     pivot = (
         base.pivot(
             index=["Pclass", "Sex"],
-            columns="Survived",   # ahora serán "0" y "1"
+            on="Survived",   # ahora serán "0" y "1"
             values="count",
             aggregate_function="first",
         )
@@ -168,6 +225,7 @@ def e1_survived_not_pivot_by_class_sex(df: pl.DataFrame) -> pl.DataFrame:
 # Punto 15 — Eliminar edades nulas
 # =========================================================
 
+@profiled
 def e1_dropna_age(df: pl.DataFrame) -> pl.DataFrame:
     return df.filter(pl.col("Age").is_not_null())
 
@@ -176,6 +234,7 @@ def e1_dropna_age(df: pl.DataFrame) -> pl.DataFrame:
 # Punto 18 — Menores de 16
 # =========================================================
 
+@profiled
 def e1_add_is_minor(df: pl.DataFrame) -> pl.DataFrame:
     return df.with_columns(
         pl.when(pl.col("Age").is_null())
@@ -183,3 +242,140 @@ def e1_add_is_minor(df: pl.DataFrame) -> pl.DataFrame:
         .otherwise(pl.col("Age") < 16)
         .alias("IsMinor16")
     )
+
+
+@profiled
+def e1_minor16_counts(df: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame | pl.LazyFrame:
+    # (18) recuento de IsMinor16 (True / False / null)
+    return (
+        e1_add_is_minor(df)
+        .group_by("IsMinor16")
+        .agg(pl.len().alias("count"))
+        .sort("IsMinor16")
+    )
+
+
+@profiled
+def e1_dropna_age_summary(df: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame | pl.LazyFrame:
+    # (15) filas antes/después de eliminar Age nula, sin materializar el filtro
+    return df.select(
+        pl.len().cast(pl.Int64).alias("rows_before"),
+        pl.col("Age").is_not_null().sum().cast(pl.Int64).alias("rows_after"),
+    )
+
+
+# =========================================================
+# Todos los pasos (1)-(18) de una vez
+# =========================================================
+
+@profiled
+def e1_compute_all(df: pl.DataFrame, profile: bool = False) -> dict[str, pl.DataFrame | list[str]]:
+    """
+    Resultados de los pasos (1)-(18) en modo eager.
+    Cada agregado se calcula una sola vez (tabla y plot lo comparten) y
+    los recuentos (4)-(14) salen del mismo cubo Pclass x Sex x Survived.
+    profile: añadir el perfil completo (0), opcional por su coste.
+    """
+    return e1_from_cube(e1_cube(df).frame) | ({"profile": e1_profile(df)} if profile else {}) | {
+        "head": e1_head(df),
+        "columns": e1_columns(df),
+        "info": e1_info(df),
+        "dropna_summary": e1_dropna_age_summary(df),
+        "age_bins": age_bins(df, engine="in-memory"),
+        "minor16_counts": e1_minor16_counts(df),
+    }
+
+
+@profiled
+def e1_collect_all(
+    lf: pl.LazyFrame, engine: str = "in-memory", profile: bool = False
+) -> dict[str, pl.DataFrame | list[str]]:
+    """
+    Mismos resultados que e1_compute_all, pero todos los pasos se
+    construyen como consultas lazy y se ejecutan en un único
+    pl.collect_all: Polars comparte el escaneo del CSV y los subplanes
+    comunes (p.ej. el filtro Survived == 0 de los pasos 12 y 13).
+    Con profile y engine="streaming" el perfil se calcula aparte, por
+    lotes (profile_scan), para no acumular el CSV en memoria.
+    """
+    streaming = engine == "streaming"
+    queries: dict[str, pl.LazyFrame] = {
+        "head": e1_head(lf),
+        "cube": e1_cube(lf).frame,
+        "nulls": e1_null_counts(lf),
+        "dropna_summary": e1_dropna_age_summary(lf),
+        "age_bins": age_bins_query(lf),
+        "minor16_counts": e1_minor16_counts(lf),
+    }
+    if profile and not streaming:
+        queries |= profile_queries(lf)
+    frames = pl.collect_all(list(queries.values()), engine=engine)
+    res: dict[str, pl.DataFrame | list[str]] = dict(zip(queries, frames))
+
+    schema = lf.collect_schema()
+    res["columns"] = schema.names()
+    res["info"] = info_from_nulls(schema, res.pop("nulls"))
+    if profile:
+        res["profile"] = profile_table(profile_scan(lf) if streaming else pop_profile(res), schema)
+    res.update(e1_from_cube(res.pop("cube")))
+    return res
+
+
+def e1_from_cube(cube_frame: pl.DataFrame) -> dict[str, pl.DataFrame]:
+    # Tablas (4)-(14): rollups del cubo ya materializado (pocas filas)
+    cube = CountCube(cube_frame, E1_CUBE_DIMS)
+    return {
+        "by_class": e1_passengers_by_class(cube),
+        "by_sex": e1_passengers_by_sex(cube),
+        "sex_by_class": e1_sex_by_class(cube),
+        "survived_pivot": e1_survived_pivot_by_class_sex(cube),
+        "survived": e1_survived_counts(cube),
+        "total_not_survived": e1_total_not_survived(cube),
+        "not_survived_by_class_sex": e1_not_survived_by_class_sex(cube),
+        "survived_not_pivot": e1_survived_not_pivot_by_class_sex(cube),
+    }
+
+
+# =========================================================
+# Ejecución particionada: parciales por shard + fusión exacta
+# =========================================================
+
+def e1_partial(lf: pl.LazyFrame, engine: str = "in-memory", profile: bool = False) -> dict[str, pl.DataFrame]:
+    """
+    Agregados sumables de un shard de titanic.csv (lf con la columna
+    _row: nº de fila en el fichero completo). Los fusiona e1_merge.
+    """
+    queries: dict[str, pl.LazyFrame] = {
+        "head": e1_head(lf),
+        "cube": e1_cube(lf).frame,
+        "nulls": e1_null_counts(lf.drop("_row")),
+        "dropna_summary": e1_dropna_age_summary(lf),
+        "age_bins": age_bins_query(lf),
+        "minor16_counts": e1_minor16_counts(lf),
+    }
+    if profile:
+        queries |= profile_queries(lf.drop("_row"))
+    return dict(zip(queries, pl.collect_all(list(queries.values()), engine=engine)))
+
+
+def e1_merge(partials: list[dict[str, pl.DataFrame]], schema: pl.Schema) -> dict[str, pl.DataFrame | list[str]]:
+    """
+    Mismos resultados que e1_compute_all a partir de los parciales de
+    cada shard: recuentos sumados y head por nº de fila original.
+    """
+    def parts(key: str) -> list[pl.DataFrame]:
+        return [p[key] for p in partials]
+
+    cube = merge_counts(parts("cube"), E1_CUBE_DIMS)
+    res = e1_from_cube(cube)
+    if "profile_stats" in partials[0]:
+        res["profile"] = profile_table(merge_profiles([pop_profile(dict(p)) for p in partials]), schema)
+
+    return res | {
+        "head": pl.concat(parts("head")).sort("_row").head(5).drop("_row"),
+        "columns": schema.names(),
+        "info": info_from_nulls(schema, merge_counts(parts("nulls"), [])),
+        "dropna_summary": merge_counts(parts("dropna_summary"), []),
+        "age_bins": merge_age_bins(parts("age_bins")),
+        "minor16_counts": merge_counts(parts("minor16_counts"), ["IsMinor16"]).sort("IsMinor16"),
+    }
@@ -1,8 +1,32 @@
 from __future__ import annotations
 
+import math
+import tempfile
+import warnings
+from collections.abc import Iterable, Iterator
+from fractions import Fraction
+from itertools import chain
 from pathlib import Path
 import polars as pl
 
+from src.cube import CountCube, merge_counts
+from src.dataprofile import (
+    key_is_unique,
+    key_queries,
+    merge_profiles,
+    pop_key_stats,
+    pop_profile,
+    profile_data,
+    profile_queries,
+    profile_scan,
+    profile_table,
+)
+from src.keyindex import KEY, key_index, merge_keys
+from src.profiling import profiled
+from src.readers import read_input, scan_input
+from src.schemas import PUERTO, RANGO_EDAD
+from src.store import load_store, scan_store
+
 
 PORT_MAP = {
     "C": "Cherbourg",
@@ -10,116 +34,603 @@ PORT_MAP = {
     "S": "Southampton",
 }
 
+# (5) <18 joven, 18-65 adulto, >65 anciano: intervalos [.., 18), [18, 65], (65, ..)
+AGE_BREAKS = [18.0, math.nextafter(65.0, math.inf)]
+AGE_LABELS = ["joven", "adulto", "anciano"]
 
-def load_pasajeros(data_dir: Path) -> pl.DataFrame:
-    return pl.read_csv(data_dir / "pasajeros.csv")
 
+@profiled
+def load_pasajeros(data_dir: Path, store: bool = False) -> pl.DataFrame:
+    if store:
+        return load_store(data_dir, "pasajeros.csv")
+    return read_input(data_dir, "pasajeros.csv")
 
-def load_supervivientes(data_dir: Path) -> pl.DataFrame:
-    return pl.read_csv(data_dir / "supervivientes.csv")
 
+@profiled
+def load_supervivientes(data_dir: Path, store: bool = False) -> pl.DataFrame:
+    if store:
+        return load_store(data_dir, "supervivientes.csv")
+    return read_input(data_dir, "supervivientes.csv")
+
+
+def scan_pasajeros(data_dir: Path, store: bool = False) -> pl.LazyFrame:
+    if store:
+        return scan_store(data_dir, "pasajeros.csv")
+    return scan_input(data_dir, "pasajeros.csv")
 
-def build_df(data_dir: Path) -> pl.DataFrame:
-    # Enunciado: inner join por PassengerId
-    df_p = load_pasajeros(data_dir)
-    df_s = load_supervivientes(data_dir)
 
+def scan_supervivientes(data_dir: Path, store: bool = False) -> pl.LazyFrame:
+    if store:
+        return scan_store(data_dir, "supervivientes.csv")
+    return scan_input(data_dir, "supervivientes.csv")
+
+
+def join_by_id(
+    df_p: pl.DataFrame | pl.LazyFrame, df_s: pl.DataFrame | pl.LazyFrame
+) -> pl.DataFrame | pl.LazyFrame:
     # Normalizar tipo PassengerId por si acaso
     df_p = df_p.with_columns(pl.col("PassengerId").cast(pl.Int64))
     df_s = df_s.with_columns(pl.col("PassengerId").cast(pl.Int64))
+    # maintain_order: el motor streaming no garantiza el orden del join
+    return df_p.join(df_s, on="PassengerId", how="inner", maintain_order="left")
+
+
+@profiled
+def join_indexed(data_dir: Path, df_p: pl.DataFrame, df_s: pl.DataFrame) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """
+    Mismo resultado que join_by_id, como merge join sobre los índices
+    ordenados de PassengerId (src.keyindex, guardados en data/.index).
+    Devuelve (df_joined, join_quality): la tabla de calidad sale de la
+    misma pasada del merge. Con claves duplicadas se usa el hash join
+    (que multiplica las filas) y la tabla informa de cuántas hay.
+    """
+    idx_p = key_index(data_dir, "pasajeros.csv", df_p)
+    idx_s = key_index(data_dir, "supervivientes.csv", df_s)
+    pairs = merge_keys(idx_p, idx_s)
+
+    quality = pl.DataFrame(
+        {
+            "pasajeros_rows": [df_p.height],
+            "supervivientes_rows": [df_s.height],
+            "joined_rows": [int((pairs["n_left"].cast(pl.Int64) * pairs["n_right"]).sum())],
+            "pasajeros_only_ids": [idx_p.height - pairs.height],
+            "supervivientes_only_ids": [idx_s.height - pairs.height],
+            "pasajeros_dup_ids": [idx_p.filter(pl.col("n") > 1).height],
+            "supervivientes_dup_ids": [idx_s.filter(pl.col("n") > 1).height],
+        }
+    )
+    if (idx_p["n"] > 1).any() or (idx_s["n"] > 1).any():
+        return join_by_id(df_p, df_s), quality
+
+    # Sin duplicados: filas emparejadas en el orden de pasajeros (como maintain_order="left")
+    pairs = pairs.sort("row_left")
+    left = df_p.with_columns(pl.col("PassengerId").cast(pl.Int64)).select(pl.all().gather(pairs["row_left"]))
+    right = df_s.drop("PassengerId").select(pl.all().gather(pairs["row_right"]))
+    # hstack de las columnas (misma altura: pairs.height); sin columnas en right, left tal cual
+    return left.hstack(right.get_columns()), quality
 
-    df = df_p.join(df_s, on="PassengerId", how="inner")
+
+@profiled
+def build_df(data_dir: Path, store: bool = False) -> pl.DataFrame:
+    # Enunciado: inner join por PassengerId
+    df_p = load_pasajeros(data_dir, store)
+    df_s = load_supervivientes(data_dir, store)
+
+    df, _ = join_indexed(data_dir, df_p, df_s)
     return df
 
 
+def build_lf(data_dir: Path, store: bool = False) -> pl.LazyFrame:
+    # Igual que build_df pero lazy: el join se ejecuta al hacer collect
+    return join_by_id(scan_pasajeros(data_dir, store), scan_supervivientes(data_dir, store))
+
+
+@profiled
 def add_puerto(df: pl.DataFrame) -> pl.DataFrame:
-    # (1) nueva columna puerto con nombre
+    # (1) nueva columna puerto con nombre (Enum: un código por fila, no una cadena)
     return df.with_columns(
         pl.col("Embarked")
-        .replace(PORT_MAP, default=None)
+        .replace_strict(PORT_MAP, default=None, return_dtype=PUERTO)
         .alias("puerto")
     )
 
 
-def passengers_by_puerto(df: pl.DataFrame) -> pl.DataFrame:
+# Dimensiones del cubo de recuentos compartido por (2), (3), (5), (6) y (7)
+E2_CUBE_DIMS = ["Pclass", "Sex", "Survived", "puerto", "rango_edad"]
+
+
+def e2_cube(df: pl.DataFrame | pl.LazyFrame) -> CountCube:
+    # df: salida de add_puerto (el rango de edad se añade aquí)
+    return CountCube.build(add_age_range(df), E2_CUBE_DIMS)
+
+
+def as_e2_cube(df: pl.DataFrame | pl.LazyFrame | CountCube) -> CountCube:
+    # Las funciones de recuento aceptan los datos o un cubo ya calculado
+    return df if isinstance(df, CountCube) else e2_cube(df)
+
+
+@profiled
+def passengers_by_puerto(df: pl.DataFrame | CountCube) -> pl.DataFrame:
     # (2) nº pasajeros por puerto
-    return df.group_by("puerto").agg(pl.len().alias("count")).sort("puerto")
+    return as_e2_cube(df).rollup(["puerto"])
 
 
-def passengers_by_sex(df: pl.DataFrame) -> pl.DataFrame:
+@profiled
+def passengers_by_sex(df: pl.DataFrame | CountCube) -> pl.DataFrame:
     # (3) cuántos hombres y mujeres embarcaron
-    return df.group_by("Sex").agg(pl.len().alias("count")).sort("Sex")
+    return as_e2_cube(df).rollup(["Sex"])
 
 
+@profiled
 def mean_age_by_sex_survived(df: pl.DataFrame) -> pl.DataFrame:
     # (4) edad media H/M que sobrevivieron y murieron
-    return (
-        df.group_by(["Sex", "Survived"])
-        .agg(pl.col("Age").mean().alias("mean_age"))
-        .sort(["Sex", "Survived"])
-    )
+    return mean_age_from_counts(age_counts_by_sex_survived(df))
+
+
+def age_counts_by_sex_survived(df: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame | pl.LazyFrame:
+    # Parcial de (4): recuento por (Sex, Survived, Age); se suma entre particiones / ejecuciones
+    return df.group_by(["Sex", "Survived", "Age"]).agg(pl.len().cast(pl.Int64).alias("count"))
+
 
+def mean_age_from_counts(counts: pl.DataFrame) -> pl.DataFrame:
+    """
+    Edad media por (Sex, Survived) a partir de age_counts_by_sex_survived:
+    suma exacta (racional) de Age * count y un único redondeo al dividir.
+    El resultado no depende del orden de las filas ni de cómo se hayan
+    repartido, así que coincide bit a bit en los modos completo,
+    incremental y particionado. Coste: una iteración por edad distinta.
+    """
+    sums: dict[tuple, list] = {}
+    for sex, survived, age, n in counts.select("Sex", "Survived", "Age", "count").iter_rows():
+        acc = sums.setdefault((sex, survived), [Fraction(0), 0])
+        if age is not None:
+            acc[0] += Fraction(age) * n
+            acc[1] += n
 
+    groups = counts.select("Sex", "Survived").unique().sort(["Sex", "Survived"])
+    means = [float(total / n) if n else None for total, n in (sums[key] for key in groups.iter_rows())]
+    return groups.with_columns(pl.Series("mean_age", means, dtype=pl.Float64))
+
+
+@profiled
 def add_age_range(df: pl.DataFrame) -> pl.DataFrame:
-    # (5) rango edad: <18 joven, 18-65 adulto, >65 anciano
-    return df.with_columns(
-        pl.when(pl.col("Age").is_null())
-        .then(None)
-        .when(pl.col("Age") < 18)
-        .then(pl.lit("joven"))
-        .when(pl.col("Age") <= 65)
-        .then(pl.lit("adulto"))
-        .otherwise(pl.lit("anciano"))
-        .alias("rango_edad")
-    )
+    # (5) rango edad: <18 joven, 18-65 adulto, >65 anciano (Age nula -> null)
+    # Intervalos cerrados por la izquierda, [b_i, b_i+1): cadena when/then en vez de cut (obsoleto)
+    age = pl.col("Age")
+    rango = pl.when(age < AGE_BREAKS[0]).then(pl.lit(AGE_LABELS[0]))
+    for brk, label in zip(AGE_BREAKS[1:], AGE_LABELS[1:]):
+        rango = rango.when(age < brk).then(pl.lit(label))
+    rango = rango.when(age.is_not_null()).then(pl.lit(AGE_LABELS[-1]))
+    return df.with_columns(rango.cast(RANGO_EDAD).alias("rango_edad"))
 
 
-def deaths_by_age_range(df: pl.DataFrame) -> pl.DataFrame:
+@profiled
+def deaths_by_age_range(df: pl.DataFrame | CountCube) -> pl.DataFrame:
     # (5) muertos por rango edad
-    dfr = add_age_range(df)
-    return (
-        dfr.filter(pl.col("Survived") == 0)
-        .group_by("rango_edad")
-        .agg(pl.len().alias("count"))
-        .sort("rango_edad")
-    )
+    return as_e2_cube(df).rollup(["rango_edad"], Survived=0)
 
 
-def deaths_by_class_gender(df: pl.DataFrame) -> pl.DataFrame:
+@profiled
+def deaths_by_class_gender(df: pl.DataFrame | CountCube) -> pl.DataFrame:
     # (6) muertos por clase y genero
-    return (
-        df.filter(pl.col("Survived") == 0)
-        .group_by(["Pclass", "Sex"])
-        .agg(pl.len().alias("count"))
-        .sort(["Pclass", "Sex"])
-    )
+    return as_e2_cube(df).rollup(["Pclass", "Sex"], Survived=0)
 
 
-def survived_and_deaths_by_puerto(df: pl.DataFrame) -> pl.DataFrame:
+@profiled
+def survived_and_deaths_by_puerto(df: pl.DataFrame | CountCube) -> pl.DataFrame:
     # (7) muertos y supervivientes por ciudad/puerto de origen
     # (lo interpretamos como puerto de embarque: 'puerto')
-    return (
-        df.group_by(["puerto", "Survived"])
-        .agg(pl.len().alias("count"))
-        .sort(["puerto", "Survived"])
-    )
+    return as_e2_cube(df).rollup(["puerto", "Survived"])
 
 
+@profiled
 def join_quality(df_p: pl.DataFrame, df_s: pl.DataFrame, df_joined: pl.DataFrame) -> pl.DataFrame:
-    # Tabla de diagnóstico: tamaños y PassengerId no emparejados
-    p_ids = df_p.select("PassengerId").unique()
-    s_ids = df_s.select("PassengerId").unique()
-    j_ids = df_joined.select("PassengerId").unique()
+    # Tabla de diagnóstico: tamaños, PassengerId no emparejados y PassengerId repetidos
+    quality = join_quality_from_profiles(key_stats(df_p), key_stats(df_s), df_joined.height)
+    if quality is not None:
+        return quality
+    return join_quality_lazy(df_p.lazy(), df_s.lazy(), df_joined.lazy()).collect()
+
+
+def key_stats(df: pl.DataFrame | pl.LazyFrame) -> dict[str, pl.DataFrame]:
+    # Filas, nulos y orden de PassengerId (key_queries): la parte del perfil que usa join_quality
+    queries = key_queries(df.lazy())
+    return pop_key_stats(dict(zip(queries, pl.collect_all(list(queries.values())))))
 
-    only_p = p_ids.join(s_ids, on="PassengerId", how="anti")
-    only_s = s_ids.join(p_ids, on="PassengerId", how="anti")
+
+def join_quality_from_profiles(prof_p: dict, prof_s: dict, joined_rows: int) -> pl.DataFrame | None:
+    """
+    join_quality a partir del perfil (o solo key_stats) de los dos ficheros, sin unique()
+    ni anti-joins: si PassengerId es estrictamente creciente en ambos (sin
+    duplicados), cada id emparejado aporta una sola fila al join, así que
+    ids sin pareja = ids distintos - filas del join (un id nulo cuenta
+    como id y no empareja). None si no se puede asegurar: cálculo exacto.
+    """
+    if not (key_is_unique(prof_p) and key_is_unique(prof_s)):
+        return None
+
+    def rows_and_nulls(profile: dict) -> tuple[int, int]:
+        stats = profile["profile_stats"]
+        return stats["rows"].item(), stats[f"{KEY}|nulls"].item()
+
+    return quality_from_counts(*rows_and_nulls(prof_p), *rows_and_nulls(prof_s), joined_rows)
+
+
+def quality_from_counts(rows_p: int, nulls_p: int, rows_s: int, nulls_s: int, joined_rows: int) -> pl.DataFrame:
+    # join_quality con los ids no nulos sin repetir: el id nulo cuenta como un id que no empareja
+    # y, si aparece varias veces, como id repetido (igual que unique() / group_by en join_quality_lazy)
+    def ids(rows: int, nulls: int) -> int:
+        return rows - nulls + (1 if nulls else 0)
 
     return pl.DataFrame(
         {
-            "pasajeros_rows": [df_p.height],
-            "supervivientes_rows": [df_s.height],
-            "joined_rows": [df_joined.height],
-            "pasajeros_only_ids": [only_p.height],
-            "supervivientes_only_ids": [only_s.height],
+            "pasajeros_rows": [rows_p],
+            "supervivientes_rows": [rows_s],
+            "joined_rows": [joined_rows],
+            "pasajeros_only_ids": [ids(rows_p, nulls_p) - joined_rows],
+            "supervivientes_only_ids": [ids(rows_s, nulls_s) - joined_rows],
+            "pasajeros_dup_ids": [int(nulls_p > 1)],
+            "supervivientes_dup_ids": [int(nulls_s > 1)],
         }
     )
+
+
+def e2_profile(prof_p: dict, prof_s: dict, schema_p: pl.Schema, schema_s: pl.Schema) -> pl.DataFrame:
+    # Perfil de calidad de los dos CSV en una tabla (columna file)
+    return pl.concat(
+        [
+            profile_table(profile, schema).select(pl.lit(name).alias("file"), pl.all())
+            for name, profile, schema in (
+                ("pasajeros.csv", prof_p, schema_p),
+                ("supervivientes.csv", prof_s, schema_s),
+            )
+        ]
+    )
+
+
+def join_quality_lazy(lf_p: pl.LazyFrame, lf_s: pl.LazyFrame, lf_joined: pl.LazyFrame) -> pl.LazyFrame:
+    # Misma tabla que join_quality, como consulta lazy (apta para streaming)
+    p_ids = lf_p.select("PassengerId").unique()
+    s_ids = lf_s.select("PassengerId").unique()
+
+    def _count(lf: pl.LazyFrame, name: str) -> pl.LazyFrame:
+        # Siempre una fila: el concat horizontal no rellena con nulos
+        return lf.select(pl.len().cast(pl.Int64).alias(name))
+
+    def _dups(lf: pl.LazyFrame) -> pl.LazyFrame:
+        return lf.group_by("PassengerId").len().filter(pl.col("len") > 1)
+
+    return pl.concat(
+        [
+            _count(lf_p, "pasajeros_rows"),
+            _count(lf_s, "supervivientes_rows"),
+            _count(lf_joined, "joined_rows"),
+            _count(p_ids.join(s_ids, on="PassengerId", how="anti"), "pasajeros_only_ids"),
+            _count(s_ids.join(p_ids, on="PassengerId", how="anti"), "supervivientes_only_ids"),
+            _count(_dups(lf_p), "pasajeros_dup_ids"),
+            _count(_dups(lf_s), "supervivientes_dup_ids"),
+        ],
+        how="horizontal",
+    )
+
+
+# =========================================================
+# Todos los pasos de una vez
+# =========================================================
+
+@profiled
+def e2_compute_all(data_dir: Path, store: bool = False, profile: bool = False) -> dict[str, pl.DataFrame]:
+    # Modo eager (en memoria); cada CSV se lee una sola vez
+    df_p = load_pasajeros(data_dir, store)
+    df_s = load_supervivientes(data_dir, store)
+
+    # merge join con los índices de data/.index; la calidad del join sale del mismo merge
+    df_joined, quality = join_indexed(data_dir, df_p, df_s)
+    df = add_puerto(df_joined)
+    res = e2_from_cube(e2_cube(df).frame)
+    if profile:
+        res["profile"] = e2_profile(profile_data(df_p), profile_data(df_s), df_p.schema, df_s.schema)
+
+    return res | {
+        "join_quality": quality,
+        "puerto_sample": df.select(["PassengerId", "Embarked", "puerto"]).head(20),
+        "mean_age": mean_age_by_sex_survived(df),
+    }
+
+
+@profiled
+def e2_collect_all(
+    data_dir: Path, engine: str = "streaming", store: bool = False, profile: bool = False
+) -> dict[str, pl.DataFrame]:
+    """
+    Mismos resultados que e2_compute_all, pero el join, add_puerto,
+    add_age_range y todas las agregaciones se ejecutan como consultas
+    lazy en un único collect_all. Con engine="streaming" Polars procesa
+    los CSV por lotes, pero su join hash guarda en memoria un lado entero;
+    por eso, con PassengerId estrictamente creciente en los dos ficheros
+    (lo normal), se usa antes e2_merge_join: memoria acotada por el
+    tamaño del lote, sea cual sea el de los ficheros. Con las claves
+    desordenadas se ordenan antes en disco (misma memoria acotada); solo
+    con claves repetidas se recurre al join hash, con un aviso.
+    """
+    lf_p = scan_pasajeros(data_dir, store)
+    lf_s = scan_supervivientes(data_dir, store)
+
+    if engine == "streaming":
+        try:
+            return e2_merge_join(lf_p, lf_s, profile=profile)
+        except UnsortedKeys:
+            pass
+        # Claves desordenadas: los dos ficheros se ordenan en disco y se repite el merge join
+        try:
+            with tempfile.TemporaryDirectory(prefix="e2_spill_") as tmp:
+                return e2_merge_join(lf_p, lf_s, profile=profile, spill_dir=Path(tmp))
+        except UnsortedKeys:
+            warnings.warn(
+                f"{KEY} repetido: join hash en memoria (la memoria ya no está acotada por el lote)",
+                stacklevel=2,
+            )
+
+    lf_joined = join_by_id(lf_p, lf_s)
+    lf = add_puerto(lf_joined)
+
+    streaming = engine == "streaming"
+    queries: dict[str, pl.LazyFrame] = {
+        "puerto_sample": lf.select(["PassengerId", "Embarked", "puerto"]).head(20),
+        "mean_age": age_counts_by_sex_survived(lf),
+        "cube": e2_cube(lf).frame,
+    } | _quality_queries(lf_p, lf_s, lf_joined, profiles=profile and not streaming)
+    frames = pl.collect_all(list(queries.values()), engine=engine)
+    res = dict(zip(queries, frames))
+    res["join_quality"] = _join_quality(res, (lf_p, lf_s, lf_joined), engine)
+    if profile:
+        prof_p = profile_scan(lf_p) if streaming else pop_profile(res, "p:")
+        prof_s = profile_scan(lf_s) if streaming else pop_profile(res, "s:")
+        res["profile"] = e2_profile(prof_p, prof_s, lf_p.collect_schema(), lf_s.collect_schema())
+    res["mean_age"] = mean_age_from_counts(res["mean_age"])
+    res.update(e2_from_cube(res.pop("cube")))
+    return res
+
+
+def _quality_queries(
+    lf_p: pl.LazyFrame, lf_s: pl.LazyFrame, lf_joined: pl.LazyFrame, profiles: bool = False
+) -> dict[str, pl.LazyFrame]:
+    # Filas del join + key_queries de cada CSV (claves p:/s:) en el mismo collect_all
+    # y, con profiles, el perfil completo (claves p:profile_* / s:profile_*)
+    queries = {"joined_rows": lf_joined.select(pl.len().cast(pl.Int64))}
+    queries |= key_queries(lf_p, prefix="p:") | key_queries(lf_s, prefix="s:")
+    if profiles:
+        queries |= profile_queries(lf_p, prefix="p:") | profile_queries(lf_s, prefix="s:")
+    return queries
+
+
+def _join_quality(res: dict, lazy: tuple[pl.LazyFrame, ...], engine: str) -> pl.DataFrame:
+    # A partir de key_queries; solo con claves desordenadas o repetidas, la consulta exacta
+    quality = join_quality_from_profiles(
+        pop_key_stats(res, "p:"), pop_key_stats(res, "s:"), res.pop("joined_rows").item()
+    )
+    if quality is None:
+        quality = join_quality_lazy(*lazy).collect(engine=engine)
+    return quality
+
+
+def e2_from_cube(cube_frame: pl.DataFrame) -> dict[str, pl.DataFrame]:
+    # Tablas (2), (3), (5), (6), (7): rollups del cubo ya materializado
+    cube = CountCube(cube_frame, E2_CUBE_DIMS)
+    return {
+        "by_puerto": passengers_by_puerto(cube),
+        "by_sex": passengers_by_sex(cube),
+        "deaths_by_age_range": deaths_by_age_range(cube),
+        "deaths_by_class_gender": deaths_by_class_gender(cube),
+        "by_puerto_survived": survived_and_deaths_by_puerto(cube),
+    }
+
+
+# =========================================================
+# Ejecución particionada: parciales por shard + fusión exacta
+# =========================================================
+
+def e2_partial(lf_p: pl.LazyFrame, lf_s: pl.LazyFrame, engine: str = "in-memory", profile: bool = False) -> dict:
+    """
+    Agregados sumables de un shard (mismo rango / hash de PassengerId
+    en los dos CSV, así que el join es local al shard). lf_p lleva _row:
+    nº de fila en pasajeros.csv completo. Los fusiona e2_merge.
+    """
+    lf_joined = join_by_id(lf_p, lf_s)
+    lf = add_puerto(lf_joined)
+    queries: dict[str, pl.LazyFrame] = {
+        "puerto_sample": lf.select(["_row", "PassengerId", "Embarked", "puerto"]).sort("_row").head(20),
+        "age_counts": age_counts_by_sex_survived(lf),
+        "cube": e2_cube(lf).frame,
+    } | _quality_queries(lf_p.drop("_row"), lf_s, lf_joined, profiles=profile)
+    res: dict = dict(zip(queries, pl.collect_all(list(queries.values()), engine=engine)))
+    res["join_quality"] = _join_quality(res, (lf_p, lf_s, lf_joined), engine)
+    if profile:
+        res["profile_p"], res["profile_s"] = pop_profile(res, "p:"), pop_profile(res, "s:")
+    return res
+
+
+def e2_fold(partials: list[dict]) -> dict:
+    # Varios parciales en uno solo (mismo formato que e2_partial): la fusión es asociativa,
+    # así que se puede ir plegando sin guardar todos los parciales
+    def parts(key: str) -> list:
+        return [p[key] for p in partials]
+
+    folded = {
+        "cube": merge_counts(parts("cube"), E2_CUBE_DIMS),
+        "age_counts": merge_counts(parts("age_counts"), ["Sex", "Survived", "Age"]),
+        "join_quality": merge_counts(parts("join_quality"), []),
+        "puerto_sample": pl.concat(parts("puerto_sample")).sort("_row").head(20),
+    }
+    if "profile_p" in partials[0]:
+        folded["profile_p"], folded["profile_s"] = merge_profiles(parts("profile_p")), merge_profiles(parts("profile_s"))
+    return folded
+
+
+def e2_merge(partials: list[dict], schema_p: pl.Schema, schema_s: pl.Schema) -> dict[str, pl.DataFrame]:
+    # Mismos resultados que e2_compute_all: cada PassengerId está en un solo shard,
+    # así que recuentos, ids sin pareja y duplicados se suman sin más
+    folded = e2_fold(partials)
+    res = e2_from_cube(folded["cube"])
+    if "profile_p" in folded:
+        res["profile"] = e2_profile(folded["profile_p"], folded["profile_s"], schema_p, schema_s)
+    return res | {
+        "join_quality": folded["join_quality"],
+        "puerto_sample": folded["puerto_sample"].drop("_row"),
+        "mean_age": mean_age_from_counts(folded["age_counts"]),
+    }
+
+
+# =========================================================
+# Merge join por lotes (streaming con claves ordenadas)
+# =========================================================
+
+STREAM_BATCH_ROWS = 200_000
+# Parciales acumulados antes de plegarlos en uno (e2_fold): memoria independiente del nº de lotes
+FOLD_EVERY = 32
+# Filas por record batch de los runs de _spill_sorted: granularidad de sus lecturas parciales
+SPILL_RECORD_ROWS = 4_096
+
+
+class UnsortedKeys(ValueError):
+    """PassengerId no es estrictamente creciente: el merge join por lotes no sirve."""
+
+
+def _batches(lf: pl.LazyFrame, batch_rows: int) -> Iterator[pl.DataFrame]:
+    return lf.with_columns(pl.col(KEY).cast(pl.Int64)).collect_batches(chunk_size=batch_rows)
+
+
+def _numbered(batches: Iterable[pl.DataFrame]) -> Iterator[pl.DataFrame]:
+    # Nº de fila original (_row) de cada fila: el orden de puerto_sample
+    offset = 0
+    for batch in batches:
+        yield batch.with_row_index("_row", offset=offset)
+        offset += batch.height
+
+
+def _sorted_batches(batches: Iterable[pl.DataFrame], counts: list[int]) -> Iterator[pl.DataFrame]:
+    # Comprueba que la clave no nula crece estrictamente y acumula en counts [filas, nulos de la clave]
+    last = None
+    for batch in batches:
+        keys = batch[KEY].drop_nulls()
+        if keys.len():
+            if (last is not None and keys[0] <= last) or (keys.diff() <= 0).any():
+                raise UnsortedKeys(KEY)
+            last = keys[-1]
+        counts[0] += batch.height
+        counts[1] += batch.height - keys.len()
+        yield batch
+
+
+def _spill_sorted(batches: Iterable[pl.DataFrame], tmp: Path, batch_rows: int) -> Iterator[pl.DataFrame]:
+    """
+    Ordenación externa por PassengerId con memoria acotada: cada lote se
+    ordena y se escribe como un run Arrow IPC en tmp; después los runs se
+    mezclan leyendo de cada uno trozos de batch_rows / nº de runs filas
+    (scan_ipc + slice: solo esos record batches) y se devuelven en lotes
+    de al menos batch_rows filas. Las claves nulas van al final, en su
+    orden original.
+    """
+    runs: list[Path] = []
+    nulls: list[Path] = []
+    for i, batch in enumerate(batches):
+        null_key = pl.col(KEY).is_null()
+        runs.append(tmp / f"run{i:06d}.arrow")
+        batch.filter(~null_key).sort(KEY).write_ipc(runs[-1], record_batch_size=SPILL_RECORD_ROWS)
+        if batch[KEY].null_count():
+            nulls.append(tmp / f"null{i:06d}.arrow")
+            batch.filter(null_key).write_ipc(nulls[-1])
+
+    step = max(1, batch_rows // max(1, len(runs)))
+    pos = [0] * len(runs)
+    buffers = [pl.DataFrame()] * len(runs)
+    out: list[pl.DataFrame] = []
+    out_rows = 0
+    while True:
+        # Cada run con al menos step filas en su trozo (salvo que se acabe): así cada vuelta
+        # avanza ~step filas por run y no solo las del run más retrasado
+        for i, run in enumerate(runs):
+            if buffers[i].height < step and pos[i] >= 0:
+                chunk = pl.scan_ipc(run).slice(pos[i], step).collect()
+                pos[i] = pos[i] + step if chunk.height == step else -1
+                buffers[i] = pl.concat([buffers[i], chunk]) if buffers[i].height else chunk
+        edges = {i: (chunk[KEY][0], chunk[KEY][-1]) for i, chunk in enumerate(buffers) if chunk.height}
+        if not edges:
+            break
+        # Lo que no pasa de la menor última clave de los trozos no puede estar en otro sitio;
+        # los runs que empiezan después no aportan nada en esta vuelta
+        bound = min(last for _, last in edges.values())
+        for i, (first, _) in edges.items():
+            if first <= bound:
+                n = buffers[i][KEY].search_sorted(bound, side="right")
+                out.append(buffers[i].head(n))
+                out_rows += n
+                buffers[i] = buffers[i].slice(n)
+        if out_rows >= batch_rows:
+            yield pl.concat(out).sort(KEY)
+            out, out_rows = [], 0
+    if out:
+        yield pl.concat(out).sort(KEY)
+    yield from map(pl.read_ipc, nulls)
+
+
+@profiled
+def e2_merge_join(
+    lf_p: pl.LazyFrame,
+    lf_s: pl.LazyFrame,
+    batch_rows: int = STREAM_BATCH_ROWS,
+    profile: bool = False,
+    spill_dir: Path | None = None,
+) -> dict[str, pl.DataFrame]:
+    """
+    Mismos resultados que e2_collect_all como merge join de los dos CSV
+    ordenados por PassengerId: cada lote de pasajeros se une (e2_partial)
+    con las filas de supervivientes hasta su último id, y los parciales se
+    fusionan como en la ejecución particionada (e2_merge), plegándolos
+    cada FOLD_EVERY lotes. Una pasada por fichero y un lote de cada lado
+    en memoria. UnsortedKeys si alguna clave no es estrictamente
+    creciente. Con spill_dir los dos ficheros se ordenan antes en disco
+    (_spill_sorted): claves desordenadas con la misma memoria acotada;
+    solo las claves repetidas siguen dando UnsortedKeys.
+    """
+    left_batches = _numbered(_batches(lf_p, batch_rows))
+    right_batches = _batches(lf_s, batch_rows)
+    if spill_dir is not None:
+        (spill_dir / "p").mkdir(parents=True, exist_ok=True)
+        (spill_dir / "s").mkdir(parents=True, exist_ok=True)
+        left_batches = _spill_sorted(left_batches, spill_dir / "p", batch_rows)
+        right_batches = _spill_sorted(right_batches, spill_dir / "s", batch_rows)
+
+    counts_p, counts_s = [0, 0], [0, 0]
+    right = _sorted_batches(right_batches, counts_s)
+    schema_p = lf_p.with_row_index("_row").with_columns(pl.col(KEY).cast(pl.Int64)).collect_schema()
+    pending = pl.DataFrame(schema=lf_s.with_columns(pl.col(KEY).cast(pl.Int64)).collect_schema())
+
+    partials: list[dict] = []
+
+    def add(partial: dict) -> None:
+        partials.append(partial)
+        if len(partials) >= FOLD_EVERY:
+            partials[:] = [e2_fold(partials)]
+
+    for left in _sorted_batches(left_batches, counts_p):
+        hi = left[KEY].max()
+        # Leer supervivientes hasta pasar el último id del lote (o acabar el fichero)
+        while hi is not None and (pending[KEY].max() is None or pending[KEY].max() < hi):
+            batch = next(right, None)
+            if batch is None:
+                break
+            pending = pl.concat([pending, batch])
+        upto = pl.col(KEY) <= hi if hi is not None else pl.lit(False)
+        take = pending.filter(upto | pl.col(KEY).is_null())
+        pending = pending.filter(pl.col(KEY) > hi) if hi is not None else pending.filter(pl.col(KEY).is_not_null())
+        add(e2_partial(left.lazy(), take.lazy(), profile=profile))
+
+    # Supervivientes con ids mayores que el último de pasajeros: sin pareja
+    empty = pl.DataFrame(schema=schema_p)
+    for rest in chain([pending], right):
+        add(e2_partial(empty.lazy(), rest.lazy(), profile=profile))
+
+    res = e2_merge(partials, lf_p.collect_schema(), lf_s.collect_schema())
+    res["join_quality"] = quality_from_counts(*counts_p, *counts_s, res["join_quality"]["joined_rows"].item())
+    return res
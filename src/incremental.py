@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import polars as pl
+
+from src.dataprofile import PROFILE_KEYS, merge_profiles, profile_data
+from src.ejercicio2 import (
+    E2_CUBE_DIMS,
+    add_puerto,
+    age_counts_by_sex_survived,
+    e2_cube,
+    e2_from_cube,
+    e2_profile,
+    join_by_id,
+    mean_age_from_counts,
+)
+from src.keyindex import KEY
+from src.profiling import profiled
+from src.readers import read_input, scan_input
+from src.schemas import CSV_SCHEMAS
+
+
+# =========================================================
+# Modo incremental (append-only) del Ejercicio 2
+# =========================================================
+#
+# El estado se guarda en data/.state/ entre ejecuciones:
+#   - state.json: filas leídas y tamaño de cada CSV, contadores del join y
+#     qué ficheros .arrow forman el estado (la única fuente de verdad)
+#   - cube: cubo de recuentos (E2_CUBE_DIMS)
+#   - age: recuento por (Sex, Survived, Age) (edad media exacta)
+#   - pending_p / pending_s: filas aún sin pareja en el otro CSV
+#   - sample: primeras 20 filas del join (tabla puerto_sample)
+#   - ids_<csv>_<n>: runs ordenadas de PassengerId (id, apariciones), una
+#     por ejecución, que se fusionan en una sola cada MAX_ID_RUNS runs
+#   - profile_<csv>_*: perfil de calidad de cada CSV (src.dataprofile),
+#     fusionado con el de las filas nuevas en el orden del fichero; solo
+#     con --data-profile
+# En cada ejecución solo se parsean las filas añadidas al final de los CSV.
+# Supone PassengerId único (los duplicados se cuentan en join_quality,
+# pero no se cruzan con filas ya emparejadas en ejecuciones anteriores).
+# Si un CSV no es append-only respecto al estado (se ha reescrito o
+# truncado) o el estado es de otra versión, se reconstruye desde cero.
+#
+# Escritura atómica: cada ejecución escribe ficheros nuevos (sufijo de
+# generación; las runs de ids no se reescriben nunca) y al final sustituye
+# state.json con os.replace. Si se interrumpe antes, state.json sigue
+# apuntando al estado anterior, intacto, y el delta se vuelve a procesar
+# una sola vez; los ficheros que no referencia state.json se borran.
+
+STATE_DIR = ".state"
+STATE_VERSION = 6
+SAMPLE_ROWS = 20
+MAX_ID_RUNS = 8
+_TAIL_BYTES = 64 * 1024
+
+_FILES = {
+    "pasajeros": "pasajeros.csv",
+    "supervivientes": "supervivientes.csv",
+}
+
+
+def _tail_digest(path: Path, end: int) -> str:
+    # Hash de los últimos bytes leídos: detecta si el fichero se ha reescrito
+    with path.open("rb") as fp:
+        start = max(0, end - _TAIL_BYTES)
+        fp.seek(start)
+        return hashlib.sha256(fp.read(end - start)).hexdigest()
+
+
+def _is_append_only(path: Path, meta: dict) -> bool:
+    size = path.stat().st_size
+    return size >= meta["size"] and _tail_digest(path, meta["size"]) == meta["tail"]
+
+
+def _empty_state() -> dict:
+    return {
+        "version": STATE_VERSION,
+        "generation": 0,
+        "files": {},
+        "frames": {},
+        "id_runs": {key: [] for key in _FILES},
+        "id_nulls": {key: 0 for key in _FILES},
+        "dup_ids": {key: 0 for key in _FILES},
+        "pasajeros_rows": 0,
+        "supervivientes_rows": 0,
+        "joined_rows": 0,
+    }
+
+
+def _load_state(state_dir: Path) -> dict:
+    state_path = state_dir / "state.json"
+    return json.loads(state_path.read_text(encoding="utf-8")) if state_path.exists() else _empty_state()
+
+
+def _read(state_dir: Path, state: dict, name: str) -> pl.DataFrame | None:
+    fname = state["frames"].get(name)
+    return pl.read_ipc(state_dir / fname) if fname is not None else None
+
+
+def _write(state_dir: Path, fname: str, frame: pl.DataFrame) -> str:
+    tmp = state_dir / f"{fname}.tmp"
+    frame.write_ipc(tmp)
+    os.replace(tmp, state_dir / fname)
+    return fname
+
+
+def _commit(state_dir: Path, state: dict) -> None:
+    # state.json se sustituye de una vez; después sobran los ficheros que no referencia
+    tmp = state_dir / "state.json.tmp"
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, state_dir / "state.json")
+    live = set(state["frames"].values()) | {f for runs in state["id_runs"].values() for f in runs}
+    for path in state_dir.glob("*.arrow*"):
+        if path.name not in live:
+            path.unlink()
+
+
+def _merge_sum(old: pl.DataFrame | None, new: pl.DataFrame, keys: list[str]) -> pl.DataFrame:
+    if old is None:
+        return new
+    sums = [pl.col(c).sum().cast(new.schema[c]) for c in new.columns if c not in keys]
+    return pl.concat([old, new]).group_by(keys).agg(sums)
+
+
+def _concat(old: pl.DataFrame | None, new: pl.DataFrame) -> pl.DataFrame:
+    return new if old is None else pl.concat([old, new])
+
+
+def _read_profile(state_dir: Path, state: dict, key: str) -> dict[str, pl.DataFrame] | None:
+    parts = {piece: _read(state_dir, state, f"profile_{key}_{piece}") for piece in PROFILE_KEYS}
+    return None if any(v is None for v in parts.values()) else parts
+
+
+def _seen_before(runs: list[pl.DataFrame], ids: pl.Series) -> pl.Series:
+    # Apariciones anteriores de cada id (ids ordenados): búsqueda binaria en cada run,
+    # que está mapeada en memoria, así que solo se leen las páginas que se tocan
+    seen = pl.zeros(ids.len(), pl.Int64, eager=True)
+    for run in runs:
+        pos = run[KEY].search_sorted(ids).clip(upper_bound=run.height - 1)
+        hit = run.select(pl.all().gather(pos))
+        seen += pl.select(pl.when(hit[KEY] == ids).then(hit["n"]).otherwise(0)).to_series()
+    return seen
+
+
+def _update_ids(state_dir: Path, state: dict, key: str, delta: pl.DataFrame) -> None:
+    # Duplicados de PassengerId sin reescribir el histórico: run ordenada con los ids
+    # del delta y recuento de ids que pasan a tener más de una aparición
+    ids = (
+        delta.select(pl.col(KEY).cast(pl.Int64))
+        .drop_nulls()
+        .group_by(KEY)
+        .agg(pl.len().cast(pl.Int64).alias("n"))
+        .sort(KEY)
+    )
+    nulls = delta[KEY].null_count()
+    runs = [pl.read_ipc(state_dir / fname) for fname in state["id_runs"][key]]
+    seen = _seen_before(runs, ids[KEY])
+    # Un id nulo cuenta como un id (igual que group_by): duplicado si aparece más de una vez
+    old_nulls = state["id_nulls"][key]
+    state["dup_ids"][key] += int(((seen <= 1) & (seen + ids["n"] > 1)).sum())
+    state["dup_ids"][key] += int(old_nulls <= 1 < old_nulls + nulls)
+    state["id_nulls"][key] = old_nulls + nulls
+    if ids.height == 0:
+        return
+
+    gen = state["generation"]
+    run_name = f"ids_{key}_{gen}.arrow"
+    if len(runs) + 1 > MAX_ID_RUNS:
+        # Fusión periódica: una sola run con todos los ids (coste amortizado entre MAX_ID_RUNS ejecuciones)
+        ids = pl.concat([*runs, ids]).group_by(KEY).agg(pl.col("n").sum()).sort(KEY)
+        state["id_runs"][key] = []
+    state["id_runs"][key] = [*state["id_runs"][key], _write(state_dir, run_name, ids)]
+
+
+@profiled
+def update_state(data_dir: Path, profile: bool = False) -> Path:
+    """
+    Procesa solo las filas nuevas de pasajeros.csv / supervivientes.csv
+    y las fusiona con el estado guardado. Devuelve la carpeta del estado.
+    profile: mantener también el perfil de calidad de cada CSV.
+    """
+    state_dir = data_dir / STATE_DIR
+    state_dir.mkdir(parents=True, exist_ok=True)
+    state = _load_state(state_dir)
+
+    # Si algún CSV no es append-only respecto al estado (o cambia el formato): reconstruir
+    stale = state.get("version") != STATE_VERSION
+    for key, fname in _FILES.items():
+        meta = state["files"].get(key)
+        if stale or (meta is not None and not _is_append_only(data_dir / fname, meta)):
+            state = _empty_state() | {"generation": state.get("generation", 0)}
+            break
+    state["generation"] += 1
+    gen = state["generation"]
+    frames: dict[str, pl.DataFrame] = {}
+
+    # Delta: filas posteriores a las ya leídas
+    delta: dict[str, pl.DataFrame] = {}
+    for key, fname in _FILES.items():
+        path = data_dir / fname
+        meta = state["files"].get(key, {"rows": 0})
+        delta[key] = read_input(data_dir, fname, skip_rows=meta["rows"])
+        if profile:
+            old_profile = _read_profile(state_dir, state, key)
+            if old_profile is None and meta["rows"]:
+                # Estado creado sin --data-profile: perfil de las filas ya leídas, una vez
+                old_profile = profile_data(scan_input(data_dir, fname).head(meta["rows"]))
+            new_profile = profile_data(delta[key])
+            if old_profile is not None:
+                new_profile = merge_profiles([old_profile, new_profile], ordered=True)
+            frames |= {f"profile_{key}_{piece}": frame for piece, frame in new_profile.items()}
+        _update_ids(state_dir, state, key, delta[key])
+        if key == "pasajeros":
+            # nº de fila global: la muestra conserva el orden de pasajeros.csv
+            delta[key] = delta[key].with_row_index("_row", offset=meta["rows"])
+        size = path.stat().st_size
+        state["files"][key] = {
+            "rows": meta["rows"] + delta[key].height,
+            "size": size,
+            "tail": _tail_digest(path, size),
+        }
+
+    # Candidatos al join: pendientes de ejecuciones anteriores + filas nuevas
+    df_p = _concat(_read(state_dir, state, "pending_p"), delta["pasajeros"])
+    df_s = _concat(_read(state_dir, state, "pending_s"), delta["supervivientes"])
+
+    df = add_puerto(join_by_id(df_p, df_s))
+
+    frames["cube"] = _merge_sum(_read(state_dir, state, "cube"), e2_cube(df).frame, E2_CUBE_DIMS)
+    frames["age"] = _merge_sum(
+        _read(state_dir, state, "age"), age_counts_by_sex_survived(df), ["Sex", "Survived", "Age"]
+    )
+    frames["sample"] = (
+        _concat(_read(state_dir, state, "sample"), df.select(["_row", "PassengerId", "Embarked", "puerto"]))
+        .sort("_row")
+        .head(SAMPLE_ROWS)
+    )
+    frames["pending_p"] = df_p.join(df_s, on="PassengerId", how="anti")
+    frames["pending_s"] = df_s.join(df_p, on="PassengerId", how="anti")
+
+    state["pasajeros_rows"] += delta["pasajeros"].height
+    state["supervivientes_rows"] += delta["supervivientes"].height
+    state["joined_rows"] += df.height
+
+    # Sin --data-profile el perfil guardado dejaría de cubrir el fichero: fuera del estado
+    state["frames"] = {name: _write(state_dir, f"{name}.{gen}.arrow", frame) for name, frame in frames.items()}
+    _commit(state_dir, state)
+    return state_dir
+
+
+@profiled
+def e2_incremental(data_dir: Path, profile: bool = False) -> dict[str, pl.DataFrame]:
+    """
+    Mismas tablas que e2_compute_all, calculadas a partir del estado
+    incremental (coste proporcional a las filas nuevas, no al histórico).
+    """
+    state_dir = update_state(data_dir, profile)
+    state = _load_state(state_dir)
+    pending_p = _read(state_dir, state, "pending_p")
+    pending_s = _read(state_dir, state, "pending_s")
+
+    join_quality = pl.DataFrame(
+        {
+            "pasajeros_rows": [state["pasajeros_rows"]],
+            "supervivientes_rows": [state["supervivientes_rows"]],
+            "joined_rows": [state["joined_rows"]],
+            "pasajeros_only_ids": [pending_p["PassengerId"].n_unique()],
+            "supervivientes_only_ids": [pending_s["PassengerId"].n_unique()],
+            "pasajeros_dup_ids": [state["dup_ids"]["pasajeros"]],
+            "supervivientes_dup_ids": [state["dup_ids"]["supervivientes"]],
+        }
+    )
+
+    res = e2_from_cube(_read(state_dir, state, "cube")) | {
+        "join_quality": join_quality,
+        "puerto_sample": _read(state_dir, state, "sample").drop("_row"),
+        "mean_age": mean_age_from_counts(_read(state_dir, state, "age")),
+    }
+    if profile:
+        res["profile"] = e2_profile(
+            _read_profile(state_dir, state, "pasajeros"),
+            _read_profile(state_dir, state, "supervivientes"),
+            pl.Schema(CSV_SCHEMAS[_FILES["pasajeros"]]),
+            pl.Schema(CSV_SCHEMAS[_FILES["supervivientes"]]),
+        )
+    return res
@@ -1,14 +1,207 @@
 from __future__ import annotations
 
+import hashlib
+import inspect
+import json
+from importlib import metadata
+import shutil
+import time
 from pathlib import Path
+from typing import Callable, Iterable
+
 import polars as pl
 
 
-def save_table(df: pl.DataFrame, path: Path) -> None:
+TABLE_FORMATS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "arrow-ipc": ".arrow",
+}
+
+
+def table_path(path: Path, fmt: str) -> Path:
+    # e1_04_by_class.csv -> e1_04_by_class.parquet / .arrow
+    return path.with_suffix(TABLE_FORMATS[fmt])
+
+
+def save_table(df: pl.DataFrame, path: Path, fmt: str = "csv", compression: str = "zstd") -> None:
+    """
+    Guarda una tabla en CSV (para personas) o en formato columnar
+    (Parquet / Arrow IPC) para consumidores que no deben re-parsear texto.
+    compression: códec Parquet (zstd, snappy, lz4, gzip, uncompressed...).
+    """
     path.parent.mkdir(parents=True, exist_ok=True)
-    df.write_csv(path)
+    if fmt == "csv":
+        df.write_csv(path)
+    elif fmt == "parquet":
+        df.write_parquet(path, compression=compression)
+    elif fmt == "arrow-ipc":
+        df.write_ipc(path)
+    else:
+        raise ValueError(f"Formato de tabla no soportado: {fmt!r}")
 
 
 def save_text(lines: list[str], path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+# =========================================================
+# Caché de artefactos (direccionada por contenido)
+# =========================================================
+
+_DIGESTS: dict[tuple[str, int, int], str] = {}
+_CODE_FINGERPRINT: str | None = None
+
+SRC_DIR = Path(__file__).resolve().parent
+# Librerías cuyo resultado entra en las tablas y figuras
+LIBRARIES = ("polars", "numpy", "matplotlib", "scipy")
+
+
+def file_digest(path: Path) -> str:
+    # sha256 del fichero; memorizado por (ruta, mtime, tamaño) dentro del proceso
+    st = path.stat()
+    memo = (str(path.resolve()), st.st_mtime_ns, st.st_size)
+    if memo not in _DIGESTS:
+        h = hashlib.sha256()
+        with path.open("rb") as fp:
+            for chunk in iter(lambda: fp.read(1 << 20), b""):
+                h.update(chunk)
+        _DIGESTS[memo] = h.hexdigest()
+    return _DIGESTS[memo]
+
+
+def _code_names(code) -> set[str]:
+    # Nombres globales usados por una función (incluidas funciones anidadas)
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _code_names(const)
+    return names
+
+
+def function_sources(fn: Callable, seen: set[Callable] | None = None) -> list[str]:
+    """
+    Código fuente de fn y de las funciones de su mismo módulo a las
+    que llama (p.ej. e1_survived_pivot_by_class_sex -> _survived_pivot),
+    para que cambiar un helper también invalide la caché.
+    """
+    fn = inspect.unwrap(fn)  # funciones decoradas (@profiled): el código original
+    seen = set() if seen is None else seen
+    if fn in seen:
+        return []
+    seen.add(fn)
+    sources = [inspect.getsource(fn)]
+    for name in sorted(_code_names(fn.__code__)):
+        dep = fn.__globals__.get(name)
+        if inspect.isfunction(dep) and dep.__module__ == fn.__module__:
+            sources.extend(function_sources(dep, seen))
+    return sources
+
+
+def code_fingerprint() -> str:
+    """
+    Hash de todo el código de src/ (cualquier .py, también cube.py,
+    schemas.py, readers.py...) y de las versiones de las librerías:
+    un cambio en un helper de otro módulo, en una constante o en
+    Polars invalida todos los artefactos. Se calcula una vez por proceso.
+    """
+    global _CODE_FINGERPRINT
+    if _CODE_FINGERPRINT is None:
+        h = hashlib.sha256()
+        for lib in LIBRARIES:
+            try:
+                version = metadata.version(lib)
+            except metadata.PackageNotFoundError:
+                version = "-"
+            h.update(f"{lib}=={version}\n".encode())
+        for path in sorted(SRC_DIR.rglob("*.py")):
+            h.update(path.relative_to(SRC_DIR).as_posix().encode())
+            h.update(path.read_bytes())
+        _CODE_FINGERPRINT = h.hexdigest()
+    return _CODE_FINGERPRINT
+
+
+def artifact_key(inputs: Iterable[Path], producers: Iterable[Callable], extra: str = "") -> str:
+    """
+    Clave de un artefacto: hash de los ficheros de entrada + código
+    de src/ y versiones de las librerías (code_fingerprint) + código
+    fuente de las funciones que lo producen (+ parámetros en extra).
+    Si cambian los datos, el código o Polars, cambia la clave.
+    """
+    h = hashlib.sha256()
+    h.update(code_fingerprint().encode())
+    for p in inputs:
+        h.update(file_digest(p).encode())
+    for fn in producers:
+        for src in function_sources(fn):
+            h.update(src.encode())
+    h.update(extra.encode())
+    return h.hexdigest()
+
+
+class ArtifactCache:
+    """
+    Almacén de artefactos (tablas, figuras) indexado por artifact_key.
+    Los ficheros se guardan en root/objects/<clave> y el índice
+    (tamaño + último uso) en root/index.json. Si el total supera
+    max_bytes se eliminan los menos usados recientemente (LRU).
+    """
+
+    def __init__(self, root: Path, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.root = root
+        self.objects = root / "objects"
+        self.index_path = root / "index.json"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.objects.mkdir(parents=True, exist_ok=True)
+        try:
+            self.index: dict[str, dict] = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.index = {}
+
+    def restore(self, key: str, path: Path) -> bool:
+        # Acierto: el artefacto ya existe (o se copia desde la caché) y no se regenera
+        blob = self.objects / key
+        entry = self.index.get(key)
+        if entry is None or not blob.exists():
+            self.misses += 1
+            return False
+        if not path.exists() or file_digest(path) != entry["sha256"]:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(blob, path)
+        entry["last_used"] = time.time()
+        self.hits += 1
+        return True
+
+    def store(self, key: str, path: Path) -> None:
+        shutil.copyfile(path, self.objects / key)
+        self.index[key] = {
+            "name": path.name,
+            "size": path.stat().st_size,
+            "sha256": file_digest(path),
+            "last_used": time.time(),
+        }
+        self._evict()
+
+    def _evict(self) -> None:
+        total = sum(e["size"] for e in self.index.values())
+        for key, entry in sorted(self.index.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            (self.objects / key).unlink(missing_ok=True)
+            del self.index[key]
+            total -= entry["size"]
+
+    def flush(self) -> None:
+        self.index_path.write_text(json.dumps(self.index, indent=2), encoding="utf-8")
+
+
+def cached(cache: ArtifactCache | None, key: str, path: Path, write: Callable[[], None]) -> None:
+    # write() solo se ejecuta si el artefacto no está en caché
+    if cache is not None and cache.restore(key, path):
+        return
+    write()
+    if cache is not None:
+        cache.store(key, path)
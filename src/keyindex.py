@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import polars as pl
+
+from src.readers import scan_input
+from src.store import is_fresh, write_meta
+
+
+# =========================================================
+# Índice ordenado de PassengerId
+# =========================================================
+#
+# Para cada CSV de entrada se guarda en data/.index/<nombre>.arrow una
+# tabla con un PassengerId por fila, ordenada y sin repetidos:
+#   PassengerId (Int64), row (primera fila del CSV con ese id), n (apariciones)
+# Como el índice ya está ordenado, el join es un merge (una pasada lineal
+# de merge_sorted) y de esa misma pasada salen los ids sin pareja; n > 1
+# delata claves duplicadas. Se reconstruye solo si cambia el CSV.
+
+INDEX_DIR = ".index"
+INDEX_VERSION = "PassengerId,row,n:v1"
+KEY = "PassengerId"
+
+
+def index_paths(data_dir: Path, name: str) -> tuple[Path, Path]:
+    stem = Path(name).stem
+    index = data_dir / INDEX_DIR
+    return index / f"{stem}.arrow", index / f"{stem}.json"
+
+
+def build_key_index(df: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame:
+    return (
+        df.lazy()
+        .select(pl.col(KEY).cast(pl.Int64))
+        .with_row_index("row")
+        .group_by(KEY)
+        .agg(pl.col("row").min(), pl.len().alias("n"))
+        .sort(KEY)
+        .collect()
+    )
+
+
+def key_index(data_dir: Path, name: str, df: pl.DataFrame | pl.LazyFrame | None = None) -> pl.DataFrame:
+    """
+    Índice de data_dir/name, leído de data/.index si está al día o
+    construido (a partir de df si ya está cargado, si no del CSV) y guardado.
+    """
+    csv_path = data_dir / name
+    arrow_path, meta_path = index_paths(data_dir, name)
+    if is_fresh(csv_path, arrow_path, meta_path, INDEX_VERSION):
+        return pl.read_ipc(arrow_path)
+
+    idx = build_key_index(df if df is not None else scan_input(data_dir, name))
+    arrow_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = arrow_path.with_suffix(".arrow.tmp")
+    idx.write_ipc(tmp)
+    os.replace(tmp, arrow_path)
+    write_meta(csv_path, meta_path, INDEX_VERSION)
+    return idx
+
+
+def merge_keys(left: pl.DataFrame, right: pl.DataFrame) -> pl.DataFrame:
+    """
+    Merge de dos índices ordenados: una fila por PassengerId presente en
+    ambos, con su fila y nº de apariciones a cada lado
+    (row_left, n_left, row_right, n_right). Los null no emparejan.
+    """
+    both = left.with_columns(side=pl.lit(0, pl.Int8)).merge_sorted(
+        right.with_columns(side=pl.lit(1, pl.Int8)), key=KEY
+    )
+    # Cada id es único en su índice: una coincidencia son dos filas seguidas con el mismo id
+    is_left = pl.col("side") == 0
+    return (
+        both.with_columns(pl.col(KEY, "row", "n").shift(-1).name.prefix("next_"))
+        .filter(pl.col(KEY) == pl.col(f"next_{KEY}"))
+        .select(
+            KEY,
+            pl.when(is_left).then("row").otherwise("next_row").alias("row_left"),
+            pl.when(is_left).then("n").otherwise("next_n").alias("n_left"),
+            pl.when(is_left).then("next_row").otherwise("row").alias("row_right"),
+            pl.when(is_left).then("next_n").otherwise("n").alias("n_right"),
+        )
+    )
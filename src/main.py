@@ -1,50 +1,17 @@
 from __future__ import annotations
 
 import argparse
+import cProfile
+import os
 from pathlib import Path
 from datetime import datetime
 
-import polars as pl
-
-from src.ejercicio1 import (
-    load_titanic,
-    e1_head,
-    e1_columns,
-    e1_info,
-    e1_passengers_by_class,
-    e1_passengers_by_sex,
-    e1_sex_by_class,
-    e1_survived_pivot_by_class_sex,        # (10) solo supervivientes pivot
-    e1_total_not_survived,                 # (12)
-    e1_not_survived_by_class_sex,          # (13)
-    e1_survived_not_pivot_by_class_sex,    # (14) surv/no pivot
-    e1_add_is_minor,                       # (18)
-    e1_dropna_age,                         # (15)
-)
-
-from src.ejercicio2 import (
-    load_pasajeros,
-    load_supervivientes,
-    build_df,
-    add_puerto,
-    passengers_by_puerto,
-    passengers_by_sex as e2_passengers_by_sex,
-    mean_age_by_sex_survived,
-    deaths_by_age_range,
-    deaths_by_class_gender,
-    survived_and_deaths_by_puerto,
-    join_quality,
-)
-
-from src.io_utils import save_table, save_text
-
-from src.plots import (
-    bar_counts,
-    bar_counts_hue,
-    survived_vs_not,
-    age_hist_with_kde,
-    age_hist_alt,
-)
+from src.io_utils import TABLE_FORMATS, ArtifactCache, save_table
+from src.partition import EXECUTORS
+from src.pipeline import Pipeline, RunOptions, report_sections, select_steps
+from src.profiling import Profiler, set_profiler, stage
+from src.readers import MAX_REPORTED, set_tolerant, validate_inputs
+from src.steps import DATASETS, GROUPS, STEPS
 
 
 def ensure_dirs(base: Path) -> dict[str, Path]:
@@ -57,9 +24,39 @@ def ensure_dirs(base: Path) -> dict[str, Path]:
     return {"outputs": outputs, "report": report, "figures": figures, "tables": tables}
 
 
-def write_report_stub(base: Path, dirs: dict[str, Path], sections: list[str]) -> None:
+def cache_section(cache: ArtifactCache | None) -> list[str]:
+    if cache is None:
+        return ["\n## Caché de artefactos\n", "- Desactivada (`--no-cache`)"]
+    return [
+        "\n## Caché de artefactos\n",
+        f"- Aciertos (artefactos reutilizados): {cache.hits}",
+        f"- Fallos (artefactos regenerados): {cache.misses}",
+    ]
+
+
+def validation_section(data_dir: Path, dirs: dict[str, Path]) -> list[str]:
+    # --validate: valores que no encajan con el registro de esquemas (src.schemas.CSV_SCHEMAS)
+    with stage("validate"):
+        summary, errors = validate_inputs(data_dir)
+    save_table(summary, dirs["tables"] / "validation_summary.csv")
+    save_table(errors, dirs["tables"] / "validation_errors.csv")
+    lines = ["\n## Validación de los CSV\n"]
+    for name, bad_rows, bad_values in summary.iter_rows():
+        lines.append(f"- `{name}`: {bad_rows} filas con {bad_values} valores erróneos (leídos como nulos)")
+    lines.append(f"- Detalle (máx. {MAX_REPORTED} por fichero): `outputs/tables/validation_errors.csv`")
+    return lines
+
+
+def write_report_stub(
+    base: Path,
+    dirs: dict[str, Path],
+    sections: list[str],
+    profiler: Profiler | None = None,
+) -> None:
     md_path = base / "INFORME_FINAL.md"
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if profiler is not None:
+        sections = sections + profiler.markdown()
     body = "\n".join(sections)
     md = f"""# Práctica Titanic (Polars) — Informe automático
 
@@ -74,177 +71,218 @@ Generado automáticamente: **{now}**
     md_path.write_text(md, encoding="utf-8")
 
 
-def run_ejercicio1(data_dir: Path, dirs: dict[str, Path]) -> list[str]:
-    sections: list[str] = []
-    sections.append("## Ejercicio 1 — Titanic\n")
-
-    df = load_titanic(data_dir)
-
-    # 1) head
-    save_table(e1_head(df), dirs["tables"] / "e1_01_head.csv")
-    sections.append("- (1) Primeras 5 filas: `outputs/tables/e1_01_head.csv`")
-
-    # 2) columnas
-    cols = e1_columns(df)
-    save_text(cols, dirs["tables"] / "e1_02_columns.txt")
-    sections.append("- (2) Columnas: `outputs/tables/e1_02_columns.txt`")
-
-    # 3) info (dtype + nulos)
-    save_table(e1_info(df), dirs["tables"] / "e1_03_info.csv")
-    sections.append("- (3) Info (dtype + nulos): `outputs/tables/e1_03_info.csv`")
-
-    # 4) pasajeros por clase
-    save_table(e1_passengers_by_class(df), dirs["tables"] / "e1_04_by_class.csv")
-    sections.append("- (4) Nº pasajeros por clase: `outputs/tables/e1_04_by_class.csv`")
-
-    # 5) plot pasajeros por clase
-    bar_counts(
-        e1_passengers_by_class(df),
-        x_col="Pclass",
-        y_col="count",
-        title="Recuento de pasajeros por clase",
-        figpath=dirs["figures"] / "e1_05_passengers_by_class.png",
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Práctica Titanic sin pandas (Polars).")
+    parser.add_argument("--data-dir", type=str, default="data", help="Carpeta donde están los CSV.")
+    parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="Ejercicio 1 con scan_csv + un único collect_all (un solo escaneo del CSV).",
     )
-    sections.append("- (5) Plot pasajeros por clase: `outputs/figures/e1_05_passengers_by_class.png`")
-
-    # 6) por sexo
-    save_table(e1_passengers_by_sex(df), dirs["tables"] / "e1_06_by_sex.csv")
-    sections.append("- (6) Nº pasajeros por sexo: `outputs/tables/e1_06_by_sex.csv`")
-
-    # 7) plot hombres vs mujeres
-    bar_counts(
-        e1_passengers_by_sex(df),
-        x_col="Sex",
-        y_col="count",
-        title="Recuento de pasajeros por sexo",
-        figpath=dirs["figures"] / "e1_07_passengers_by_sex.png",
+    parser.add_argument(
+        "--engine",
+        choices=["in-memory", "streaming"],
+        default="in-memory",
+        help="Motor Polars. streaming: Ejercicio 2 (join + agregaciones) con memoria acotada.",
     )
-    sections.append("- (7) Plot pasajeros por sexo: `outputs/figures/e1_07_passengers_by_sex.png`")
-
-    # 8) sexo por clase
-    save_table(e1_sex_by_class(df), dirs["tables"] / "e1_08_sex_by_class.csv")
-    sections.append("- (8) Nº hombres/mujeres por clase: `outputs/tables/e1_08_sex_by_class.csv`")
-
-    # 9) plot sexo por clase (barras agrupadas)
-    bar_counts_hue(
-        e1_sex_by_class(df),
-        x_col="Pclass",
-        hue_col="Sex",
-        y_col="count",
-        title="Recuento por clase y sexo",
-        figpath=dirs["figures"] / "e1_09_sex_by_class.png",
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Regenerar todas las tablas y figuras sin usar la caché de artefactos.",
     )
-    sections.append("- (9) Plot por sexo y clase: `outputs/figures/e1_09_sex_by_class.png`")
-
-    # 10) SOLO supervivientes por clase/sexo + total por clase (PIVOT)
-    save_table(e1_survived_pivot_by_class_sex(df), dirs["tables"] / "e1_10_survived_by_class_sex_pivot.csv")
-    sections.append("- (10) Supervivientes por clase/sexo (pivot + total): `outputs/tables/e1_10_survived_by_class_sex_pivot.csv`")
-
-    # 11) plot sobrevivieron vs no
-    survived_vs_not(df, dirs["figures"] / "e1_11_survived_vs_not.png")
-    sections.append("- (11) Plot supervivencia (Sí/No): `outputs/figures/e1_11_survived_vs_not.png`")
-
-    # 12) total no sobrevivieron
-    save_table(e1_total_not_survived(df), dirs["tables"] / "e1_12_total_not_survived.csv")
-    sections.append("- (12) Total no sobrevivieron: `outputs/tables/e1_12_total_not_survived.csv`")
-
-    # 13) no sobrevivieron por clase y sexo
-    save_table(e1_not_survived_by_class_sex(df), dirs["tables"] / "e1_13_not_surv_by_class_sex.csv")
-    sections.append("- (13) No sobrevivieron por clase/sexo: `outputs/tables/e1_13_not_surv_by_class_sex.csv`")
-
-    # 14) sobrevivieron y no por clase y sexo (PIVOT)
-    save_table(e1_survived_not_pivot_by_class_sex(df), dirs["tables"] / "e1_14_survived_not_by_class_sex_pivot.csv")
-    sections.append("- (14) Supervivieron y no por clase/sexo (pivot): `outputs/tables/e1_14_survived_not_by_class_sex_pivot.csv`")
-
-    # 15) eliminar registros con edad nula + resumen
-    df_age_clean = e1_dropna_age(df)
-    save_table(
-        pl.DataFrame({"rows_before": [df.height], "rows_after": [df_age_clean.height]}),
-        dirs["tables"] / "e1_15_dropna_age_summary.csv",
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=256,
+        help="Tamaño máximo de la caché de artefactos (MB, expulsión LRU).",
     )
-    sections.append("- (15) Eliminación Age nula (resumen): `outputs/tables/e1_15_dropna_age_summary.csv`")
-
-    # 16) distribución edad hist + densidad (usando df_age_clean)
-    age_hist_with_kde(df_age_clean, dirs["figures"] / "e1_16_age_hist_kde.png")
-    sections.append("- (16) Distribución edad (hist + densidad): `outputs/figures/e1_16_age_hist_kde.png`")
-
-    # 17) hist alternativo (usando df_age_clean)
-    age_hist_alt(df_age_clean, dirs["figures"] / "e1_17_age_hist_alt.png")
-    sections.append("- (17) Histograma edad (alt): `outputs/figures/e1_17_age_hist_alt.png`")
-
-    # 18) columna IsMinor16 (recuento)
-    df_minor = e1_add_is_minor(df)
-    minor_counts = (
-        df_minor.group_by("IsMinor16")
-        .agg(pl.len().alias("count"))
-        .sort("IsMinor16")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Procesos para renderizar las figuras en paralelo (1 = secuencial).",
+    )
+    parser.add_argument(
+        "--no-figures",
+        "--tables-only",
+        dest="figures",
+        action="store_false",
+        help="Solo tablas: no se dibujan figuras (ni se importa matplotlib).",
+    )
+    parser.add_argument(
+        "--figure-format",
+        choices=["png", "svg"],
+        default="png",
+        help="Formato de las figuras: png (raster) o svg (vectorial, sin codificar PNG).",
+    )
+    parser.add_argument("--figure-dpi", type=int, default=160, help="Resolución de las figuras PNG.")
+    parser.add_argument(
+        "--png-compression",
+        type=int,
+        choices=range(10),
+        default=None,
+        metavar="0-9",
+        help="Nivel de compresión PNG (0-9; más bajo = más rápido y ficheros más grandes). Por defecto el de Pillow.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Hilos del planificador: pasos independientes (cálculo de cada ejercicio, escritura de tablas) a la vez.",
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        metavar="PASO",
+        help="Ejecutar solo estos pasos (glob o prefijo: e1_04, e2, 'e1_1*').",
+    )
+    parser.add_argument(
+        "--skip",
+        nargs="+",
+        metavar="PASO",
+        help="Omitir estos pasos (mismos patrones que --only).",
+    )
+    parser.add_argument(
+        "--kde",
+        choices=["exact", "binned"],
+        default="exact",
+        help="Densidad de la figura (16): exact (suma sobre las edades distintas, como gaussian_kde) o binned (binning lineal + FFT).",
+    )
+    parser.add_argument(
+        "--output-format",
+        nargs="+",
+        choices=list(TABLE_FORMATS),
+        default=["csv"],
+        help="Formato(s) de las tablas: csv (personas), parquet, arrow-ipc (máquinas).",
+    )
+    parser.add_argument(
+        "--parquet-compression",
+        default="zstd",
+        help="Códec de compresión Parquet (zstd, snappy, lz4, gzip, uncompressed...).",
+    )
+    parser.add_argument(
+        "--store",
+        action="store_true",
+        help="Leer los datos de data/.store (Arrow IPC mapeado en memoria, convertido una vez desde los CSV).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Ejercicio 2 incremental: solo se procesan las filas añadidas a los CSV desde la última ejecución.",
+    )
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        default=1,
+        help="Repartir los datos en N shards por PassengerId, procesados en paralelo y fusionados (1 = sin particionar).",
+    )
+    parser.add_argument(
+        "--partition-by",
+        choices=["hash", "range"],
+        default="hash",
+        help="Reparto de los shards: hash de PassengerId o rangos equilibrados (índice de data/.index).",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=sorted(EXECUTORS),
+        default="local",
+        help="Dónde se ejecutan los shards: local (un proceso por shard) o serial (en este proceso).",
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Validar los CSV contra el registro de esquemas sin abortar: los valores erróneos se leen como nulos "
+        "y se listan en outputs/tables/validation_errors.csv.",
+    )
+    parser.add_argument(
+        "--approx",
+        action="store_true",
+        help="Recuentos y edad media estimados sobre una muestra estratificada (data/.sample, tiempo constante), "
+        "con intervalos de confianza al 95%%. Se omiten los pasos que necesitan todas las filas.",
+    )
+    parser.add_argument(
+        "--approx-rows",
+        type=int,
+        default=100_000,
+        help="Tamaño aproximado de la muestra por CSV en --approx (con menos filas, resultado exacto).",
+    )
+    parser.add_argument(
+        "--data-profile",
+        action="store_true",
+        help="Añadir el perfil de calidad completo de cada CSV (distintos HLL, cuartiles, top-k): "
+        "e1_00_profile / e2_00_profile. Cuesta tanto como el resto del pipeline.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Además de outputs/profile.json, volcar una traza cProfile en outputs/profile.pstats.",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Pico de RSS también por etapa (un hilo de muestreo por etapa; con --threads > 1 es el del proceso "
+        "entero). Sin esta opción se mide una vez para toda la ejecución.",
     )
-    save_table(minor_counts, dirs["tables"] / "e1_18_minor16_counts.csv")
-    sections.append("- (18) Menores de 16 (recuento): `outputs/tables/e1_18_minor16_counts.csv`")
-
-    return sections
-
-
-def run_ejercicio2(data_dir: Path, dirs: dict[str, Path]) -> list[str]:
-    sections: list[str] = []
-    sections.append("\n## Ejercicio 2 — Pasajeros + Supervivientes (inner join)\n")
-
-    df_p = load_pasajeros(data_dir)
-    df_s = load_supervivientes(data_dir)
-
-    df_joined = build_df(data_dir)
-    df = add_puerto(df_joined)
-
-    # Diagnóstico join
-    save_table(join_quality(df_p, df_s, df_joined), dirs["tables"] / "e2_00_join_quality.csv")
-    sections.append("- Join quality: `outputs/tables/e2_00_join_quality.csv`")
-
-    # (1) puerto
-    save_table(df.select(["PassengerId", "Embarked", "puerto"]).head(20), dirs["tables"] / "e2_01_puerto_sample.csv")
-    sections.append("- (1) Columna puerto (sample): `outputs/tables/e2_01_puerto_sample.csv`")
-
-    # (2)
-    save_table(passengers_by_puerto(df), dirs["tables"] / "e2_02_passengers_by_puerto.csv")
-    sections.append("- (2) Nº pasajeros por puerto: `outputs/tables/e2_02_passengers_by_puerto.csv`")
-
-    # (3)
-    save_table(e2_passengers_by_sex(df), dirs["tables"] / "e2_03_passengers_by_sex.csv")
-    sections.append("- (3) Nº hombres y mujeres: `outputs/tables/e2_03_passengers_by_sex.csv`")
-
-    # (4)
-    save_table(mean_age_by_sex_survived(df), dirs["tables"] / "e2_04_mean_age_by_sex_survived.csv")
-    sections.append("- (4) Edad media por sexo y supervivencia: `outputs/tables/e2_04_mean_age_by_sex_survived.csv`")
-
-    # (5)
-    save_table(deaths_by_age_range(df), dirs["tables"] / "e2_05_deaths_by_age_range.csv")
-    sections.append("- (5) Muertos por rango de edad: `outputs/tables/e2_05_deaths_by_age_range.csv`")
-
-    # (6)
-    save_table(deaths_by_class_gender(df), dirs["tables"] / "e2_06_deaths_by_class_gender.csv")
-    sections.append("- (6) Muertos por clase y género: `outputs/tables/e2_06_deaths_by_class_gender.csv`")
-
-    # (7)
-    save_table(survived_and_deaths_by_puerto(df), dirs["tables"] / "e2_07_survived_and_deaths_by_puerto.csv")
-    sections.append("- (7) Muertos y supervivientes por puerto: `outputs/tables/e2_07_survived_and_deaths_by_puerto.csv`")
-
-    return sections
-
-
-def main() -> int:
-    parser = argparse.ArgumentParser(description="Práctica Titanic sin pandas (Polars).")
-    parser.add_argument("--data-dir", type=str, default="data", help="Carpeta donde están los CSV.")
     args = parser.parse_args()
 
     base = Path(__file__).resolve().parents[1]
     data_dir = base / args.data_dir
 
     dirs = ensure_dirs(base)
-
-    sections: list[str] = []
-    sections.extend(run_ejercicio1(data_dir, dirs))
-    sections.extend(run_ejercicio2(data_dir, dirs))
-
-    write_report_stub(base, dirs, sections)
+    formats = tuple(dict.fromkeys(args.output_format))
+
+    # Tiempos por etapa siempre; RSS por etapa solo con --profile-memory; cProfile solo con --profile
+    profiler = Profiler(stage_memory=args.profile_memory)
+    set_profiler(profiler)
+    cprof = cProfile.Profile() if args.profile else None
+    if cprof is not None:
+        cprof.enable()
+
+    cache = None if args.no_cache else ArtifactCache(base / ".cache" / "artifacts", args.cache_max_mb * 1024 * 1024)
+
+    opts = RunOptions(
+        lazy=args.lazy,
+        engine=args.engine,
+        kde=args.kde,
+        formats=formats,
+        compression=args.parquet_compression,
+        store=args.store,
+        incremental=args.incremental,
+        partitions=max(1, args.partitions),
+        partition_by=args.partition_by,
+        executor=args.executor,
+        figure_format=args.figure_format,
+        figure_dpi=args.figure_dpi,
+        png_compression=args.png_compression,
+        validate=args.validate,
+        approx=args.approx,
+        approx_rows=args.approx_rows,
+        data_profile=args.data_profile,
+    )
+    steps = select_steps(STEPS, opts, only=args.only, skip=args.skip, figures=args.figures)
+    if not steps:
+        parser.error("--only/--skip no dejan ningún paso que ejecutar")
+
+    set_tolerant(opts.validate)
+    checks = validation_section(data_dir, dirs) if opts.validate else []
+
+    with profiler.run_memory(), stage("pipeline"):
+        Pipeline(DATASETS, data_dir, dirs, opts, cache).run(steps, threads=args.threads, jobs=args.jobs)
+
+    sections = report_sections(steps, GROUPS, opts.figure_format)
+    sections.extend(checks)
+    sections.extend(cache_section(cache))
+    if cache is not None:
+        cache.flush()
+
+    if cprof is not None:
+        cprof.disable()
+        # .pstats: snakeviz, flameprof, gprof2dot...
+        cprof.dump_stats(dirs["outputs"] / "profile.pstats")
+    set_profiler(None)
+    profiler.write_json(dirs["outputs"] / "profile.json")
+
+    write_report_stub(base, dirs, sections, profiler)
 
     print("OK: Pipeline Completo (Ej1 + Ej2) ejecutado; outputs(tables + figures) e INFORME_FINAL.md generados.")
     return 0
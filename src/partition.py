@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Protocol, Sequence
+
+import polars as pl
+
+from src.ejercicio1 import e1_merge, e1_partial, scan_titanic
+from src.ejercicio2 import e2_merge, e2_partial, scan_pasajeros, scan_supervivientes
+from src.keyindex import KEY, key_index
+from src.profiling import profiled
+from src.readers import is_tolerant
+from src.store import STORE_DIR, is_fresh, write_meta
+
+SHARDS_DIR = "shards"
+
+
+# =========================================================
+# Ejecución particionada (scale-out)
+# =========================================================
+#
+# Los datos se reparten en N shards por PassengerId (hash o rangos
+# equilibrados a partir del índice de src.keyindex). Cada shard se
+# procesa en un worker (e1_partial / e2_partial) y el coordinador fusiona
+# los parciales (e1_merge / e2_merge): recuentos, recuentos de edad y
+# filas de muestra con su nº de fila original. El resultado es el mismo
+# que en un solo proceso.
+#
+# El executor es intercambiable: cualquier objeto con map(fn, items)
+# (p.ej. un cliente de un clúster) se puede registrar en EXECUTORS.
+# El coordinador reparte cada fichero una sola vez, en una pasada, en
+# data/.store/shards/ (un Arrow IPC por shard, con su nº de fila
+# original en _row) y cada worker lee solo el suyo. Los shards se
+# reutilizan mientras no cambie ningún CSV del ejercicio ni la versión
+# de Polars (mismo control que src.store).
+
+
+@dataclass(frozen=True)
+class Shard:
+    index: int
+    count: int
+    by: str = "hash"  # hash | range
+    bounds: tuple[int, ...] = ()  # range: primer PassengerId de los shards 1..count-1
+
+    def assign(self) -> pl.Expr:
+        # Nº de shard de cada fila (el mismo reparto para todos los shards de la lista)
+        key = pl.col(KEY).cast(pl.Int64)
+        if self.by == "hash":
+            return (key.hash(seed=0) % self.count).cast(pl.UInt32)
+        # Rangos: nº de límites <= PassengerId; PassengerId nulo al primer shard (no empareja en el join)
+        index = pl.sum_horizontal([(key >= b).cast(pl.UInt32) for b in self.bounds]) if self.bounds else pl.lit(0)
+        return index.fill_null(0).cast(pl.UInt32)
+
+
+def make_shards(data_dir: Path, name: str, count: int, by: str = "hash") -> list[Shard]:
+    if by == "hash":
+        return [Shard(i, count) for i in range(count)]
+    # Rangos con el mismo nº de ids distintos: cuantiles del índice ordenado
+    ids = key_index(data_dir, name)[KEY].drop_nulls()
+    bounds = tuple(ids[len(ids) * k // count] for k in range(1, count)) if len(ids) else (0,) * (count - 1)
+    return [Shard(i, count, "range", bounds) for i in range(count)]
+
+
+def shard_store(data_dir: Path, inputs: dict[str, pl.LazyFrame], shards: list[Shard]) -> dict[str, list[Path]]:
+    """
+    Reparte cada lf de inputs (el contenido de data_dir/<nombre>) en los
+    ficheros de data/.store/shards/<nombre>/<reparto>/, uno por shard, en
+    una sola pasada por fichero (sink particionado). Devuelve, por
+    nombre, la ruta de cada shard. Los ficheros que se reparten juntos
+    comparten versión (esquemas, reparto y versión de Polars) y se
+    invalidan juntos: si alguno de los CSV ha cambiado se rehacen todos;
+    si no, se reutilizan los de la ejecución anterior.
+    """
+    first = shards[0]
+    roots = {name: data_dir / STORE_DIR / SHARDS_DIR / Path(name).stem / f"{first.by}-{first.count}" for name in inputs}
+    schemas = {name: lf.collect_schema() for name, lf in inputs.items()}
+    version = (
+        f"polars={pl.__version__}|{sorted((n, repr(s)) for n, s in schemas.items())!r}"
+        f"|{first.by}|{first.bounds}|tolerant={is_tolerant()}"
+    )
+    paths = {name: [root / f"_shard={s.index}" for s in shards] for name, root in roots.items()}
+    if all(is_fresh(data_dir / name, root, root.with_suffix(".json"), version) for name, root in roots.items()):
+        return paths
+
+    for root in roots.values():
+        root.with_suffix(".json").unlink(missing_ok=True)
+    for name, root in roots.items():
+        tmp = root.with_name(root.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        inputs[name].with_columns(_shard=first.assign()).sink_ipc(
+            pl.PartitionBy(tmp, key="_shard", include_key=False, approximate_bytes_per_file=None),
+            compression="uncompressed",
+            mkdir=True,
+        )
+        # Shards sin filas: un fichero vacío con el esquema, para que el worker lo lea igual
+        for s in shards:
+            part = tmp / f"_shard={s.index}"
+            if not part.exists():
+                part.mkdir(parents=True)
+                pl.DataFrame(schema=schemas[name]).write_ipc(part / "00000000.ipc")
+        shutil.rmtree(root, ignore_errors=True)
+        os.replace(tmp, root)
+    # Metadatos al final: si algo falla a medias, la siguiente ejecución los rehace todos
+    for name, root in roots.items():
+        write_meta(data_dir / name, root.with_suffix(".json"), version)
+    return paths
+
+
+def scan_shard(path: Path) -> pl.LazyFrame:
+    return pl.scan_ipc(path / "*.ipc", hive_partitioning=False)
+
+
+# =========================================================
+# Executors
+# =========================================================
+
+class Executor(Protocol):
+    def map(self, fn: Callable, items: Sequence) -> list: ...
+
+
+class SerialExecutor:
+    """Todos los shards en el propio proceso (depuración, referencia)."""
+
+    def __init__(self, workers: int = 1) -> None:
+        self.workers = workers
+
+    def map(self, fn: Callable, items: Sequence) -> list:
+        return [fn(item) for item in items]
+
+
+class LocalExecutor:
+    """Pool de procesos local (spawn: sin fork con los hilos de Polars activos)."""
+
+    def __init__(self, workers: int = 1) -> None:
+        self.workers = workers
+
+    def map(self, fn: Callable, items: Sequence) -> list:
+        if self.workers <= 1 or len(items) <= 1:
+            return [fn(item) for item in items]
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(items)), mp_context=ctx) as ex:
+            return list(ex.map(fn, items))
+
+
+EXECUTORS: dict[str, Callable[[int], Executor]] = {
+    "local": LocalExecutor,
+    "serial": SerialExecutor,
+}
+
+
+# =========================================================
+# Workers (funciones de módulo: se envían por pickle)
+# =========================================================
+
+
+def _e1_worker(task: tuple[Path, bool]) -> dict[str, pl.DataFrame]:
+    path, profile = task
+    return e1_partial(scan_shard(path), profile=profile)
+
+
+def _e2_worker(task: tuple[Path, Path, bool]) -> dict[str, pl.DataFrame]:
+    path_p, path_s, profile = task
+    return e2_partial(scan_shard(path_p), scan_shard(path_s), profile=profile)
+
+
+@profiled
+def e1_partitioned(
+    data_dir: Path,
+    partitions: int,
+    by: str = "hash",
+    executor: str = "local",
+    store: bool = False,
+    profile: bool = False,
+) -> dict[str, pl.DataFrame | list[str]]:
+    # Mismos resultados que e1_compute_all, con un worker por shard
+    # El coordinador prepara los shards (y el índice si hay rangos) antes de lanzar los workers
+    lf = scan_titanic(data_dir, store)
+    schema = lf.collect_schema()
+    shards = make_shards(data_dir, "titanic.csv", partitions, by)
+    paths = shard_store(data_dir, {"titanic.csv": lf.with_row_index("_row")}, shards)["titanic.csv"]
+    partials = EXECUTORS[executor](partitions).map(_e1_worker, [(p, profile) for p in paths])
+    return e1_merge(partials, schema)
+
+
+@profiled
+def e2_partitioned(
+    data_dir: Path,
+    partitions: int,
+    by: str = "hash",
+    executor: str = "local",
+    store: bool = False,
+    profile: bool = False,
+) -> dict[str, pl.DataFrame]:
+    # Mismos resultados que e2_compute_all; los dos CSV con los mismos shards
+    lf_p = scan_pasajeros(data_dir, store)
+    lf_s = scan_supervivientes(data_dir, store)
+    schema_p, schema_s = lf_p.collect_schema(), lf_s.collect_schema()
+    shards = make_shards(data_dir, "pasajeros.csv", partitions, by)
+    # Los dos ficheros se reparten (y se invalidan) juntos
+    paths = shard_store(data_dir, {"pasajeros.csv": lf_p.with_row_index("_row"), "supervivientes.csv": lf_s}, shards)
+    tasks = [(p, s, profile) for p, s in zip(paths["pasajeros.csv"], paths["supervivientes.csv"])]
+    partials = EXECUTORS[executor](partitions).map(_e2_worker, tasks)
+    return e2_merge(partials, schema_p, schema_s)
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import fnmatch
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable
+
+from src.io_utils import ArtifactCache, artifact_key, save_table, save_text, table_path
+from src.plots import FigureJob, FigureStyle, render_figures
+from src.profiling import stage
+
+
+# =========================================================
+# Registro declarativo: datasets y pasos
+# =========================================================
+
+@dataclass(frozen=True)
+class RunOptions:
+    """Opciones de la línea de comandos que cambian cómo se calculan los datos."""
+
+    lazy: bool = False
+    engine: str = "in-memory"
+    kde: str = "exact"
+    formats: tuple[str, ...] = ("csv",)
+    compression: str = "zstd"
+    store: bool = False
+    incremental: bool = False
+    partitions: int = 1
+    partition_by: str = "hash"
+    executor: str = "local"
+    figure_format: str = "png"
+    figure_dpi: int = 160
+    png_compression: int | None = None
+    validate: bool = False
+    approx: bool = False
+    approx_rows: int = 100_000
+    data_profile: bool = False
+
+    @property
+    def figure_style(self) -> FigureStyle:
+        return FigureStyle(self.figure_dpi, self.png_compression)
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """
+    Nodo de datos del grafo (p.ej. titanic, df_age_clean, e1_cube):
+    build(data_dir, opts, deps) devuelve un dict de resultados a partir
+    de los nodos de inputs(opts) (deps: nombre -> su dict).
+    files: CSV de data_dir de los que depende (clave de caché).
+    variant: opciones que cambian el contenido de los artefactos.
+    """
+
+    name: str
+    files: tuple[str, ...]
+    build: Callable[[Path, RunOptions, dict[str, dict]], dict]
+    variant: Callable[[RunOptions], str] = lambda opts: ""
+    inputs: Callable[[RunOptions], tuple[str, ...]] = lambda opts: ()
+
+
+@dataclass(frozen=True)
+class Step:
+    """
+    Un paso del informe: lee result[key] del dataset `source`, escribe
+    el artefacto `output` (tabla, .txt o figura si hay plot) y aporta
+    una línea al informe. producers: funciones cuyo código entra en
+    la clave de caché.
+    """
+
+    group: str
+    source: str
+    output: str
+    key: str
+    report: str
+    producers: tuple[Callable, ...] = ()
+    plot: Callable | None = None
+    plot_kwargs: tuple[tuple[str, object], ...] = ()
+    when: Callable[[RunOptions], bool] | None = None
+
+    @property
+    def name(self) -> str:
+        return Path(self.output).stem
+
+    @property
+    def inputs(self) -> tuple[str, ...]:
+        return (self.source,)
+
+    @property
+    def subdir(self) -> str:
+        return "figures" if self.plot is not None else "tables"
+
+    def filename(self, figure_format: str = "png") -> str:
+        # Las figuras llevan la extensión del formato pedido (--figure-format)
+        if self.plot is None:
+            return self.output
+        return Path(self.output).with_suffix(f".{figure_format}").name
+
+
+def select_steps(
+    steps: Iterable[Step],
+    opts: RunOptions,
+    only: list[str] | None = None,
+    skip: list[str] | None = None,
+    figures: bool = True,
+) -> list[Step]:
+    """
+    Pasos activos con estas opciones, filtrados con --only / --skip.
+    Los patrones son de tipo glob sobre el nombre del paso; "e1_04"
+    o "e2" valen como prefijo (e1_04_by_class, e2_*).
+    figures=False (--no-figures): solo tablas, sin importar matplotlib.
+    """
+
+    def matches(step: Step, patterns: list[str]) -> bool:
+        return any(fnmatch.fnmatch(step.name, p) or fnmatch.fnmatch(step.name, p + "_*") for p in patterns)
+
+    selected = [s for s in steps if (s.when is None or s.when(opts)) and (figures or s.plot is None)]
+    if only:
+        selected = [s for s in selected if matches(s, only)]
+    if skip:
+        selected = [s for s in selected if not matches(s, skip)]
+    names = [s.name for s in selected]
+    dup = {n for n in names if names.count(n) > 1}
+    if dup:
+        raise ValueError(f"Pasos duplicados en el registro: {sorted(dup)}")
+    return selected
+
+
+def report_sections(steps: list[Step], titles: dict[str, str], figure_format: str = "png") -> list[str]:
+    # Una cabecera por grupo (en el orden de titles) y una línea por paso
+    sections: list[str] = []
+    for group, title in titles.items():
+        members = [s for s in steps if s.group == group]
+        if not members:
+            continue
+        sections.append(title)
+        sections.extend(f"- {s.report}: `outputs/{s.subdir}/{s.filename(figure_format)}`" for s in members)
+    return sections
+
+
+# =========================================================
+# Planificador: DAG datasets -> pasos sobre un pool de hilos
+# =========================================================
+
+def run_dag(
+    tasks: dict[str, Callable[[], object]],
+    deps: dict[str, set[str]],
+    threads: int = 1,
+) -> dict[str, object]:
+    """
+    Ejecuta tasks respetando deps (nodo -> nodos de los que depende):
+    cada nodo se lanza en cuanto terminan sus dependencias, y los
+    independientes corren a la vez (Polars suelta el GIL).
+    Devuelve el resultado de cada nodo.
+    """
+    remaining = {name: set(deps.get(name, ())) for name in tasks}
+    unknown = {d for ds in remaining.values() for d in ds} - set(tasks)
+    if unknown:
+        raise ValueError(f"Dependencias desconocidas: {sorted(unknown)}")
+
+    results: dict[str, object] = {}
+    with ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="step") as pool:
+        running = {}
+        while remaining or running:
+            for name in [n for n, ds in remaining.items() if not ds]:
+                del remaining[name]
+                running[pool.submit(tasks[name])] = name
+            if not running:
+                raise ValueError(f"Ciclo en el grafo de pasos: {sorted(remaining)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                results[name] = fut.result()  # re-lanza el error del paso
+                for ds in remaining.values():
+                    ds.discard(name)
+    return results
+
+
+class Pipeline:
+    """
+    Ejecuta los pasos seleccionados. Cada artefacto pasa por la caché;
+    solo se construyen los nodos de datos que necesita algún paso con
+    artefactos pendientes (y los nodos de los que dependen), y los
+    independientes corren a la vez. Las figuras se encolan y se
+    renderizan al final (en --jobs procesos).
+    """
+
+    def __init__(
+        self,
+        datasets: dict[str, Dataset],
+        data_dir: Path,
+        dirs: dict[str, Path],
+        opts: RunOptions,
+        cache: ArtifactCache | None = None,
+    ) -> None:
+        self.datasets = datasets
+        self.data_dir = data_dir
+        self.dirs = dirs
+        self.opts = opts
+        self.cache = cache
+        self._lock = threading.Lock()
+        self.pending: list[tuple[str, FigureJob]] = []
+
+    def _key(self, step: Step, producers: tuple[Callable, ...], extra: str) -> str:
+        if self.cache is None:
+            return ""
+        ds = self.datasets[step.source]
+        inputs = [self.data_dir / f for f in ds.files]
+        # variant: opciones que cambian el contenido (p.ej. tipos del almacén Arrow)
+        return artifact_key(inputs, producers, extra=f"{extra}|{ds.variant(self.opts)}")
+
+    def _artifacts(self, step: Step) -> list[tuple[str, Path, str]]:
+        # (clave, ruta, formato) de cada fichero que produce el paso
+        path = self.dirs[step.subdir] / step.filename(self.opts.figure_format)
+        if step.plot is not None:
+            kwargs = dict(step.plot_kwargs)
+            extra = path.name + repr(sorted(kwargs.items())) + repr(self.opts.figure_style)
+            return [(self._key(step, (*step.producers, step.plot), extra), path, "")]
+        if step.output.endswith(".txt"):
+            return [(self._key(step, (*step.producers, save_text), step.output), path, "")]
+        # Una copia por formato pedido (--output-format csv parquet ...)
+        out = []
+        for fmt in self.opts.formats:
+            fpath = table_path(path, fmt)
+            key = self._key(step, (*step.producers, save_table), f"{fpath.name}:{self.opts.compression}")
+            out.append((key, fpath, fmt))
+        return out
+
+    def _missing(self, step: Step) -> list[tuple[str, Path, str]]:
+        if self.cache is None:
+            return self._artifacts(step)
+        with self._lock:
+            return [a for a in self._artifacts(step) if not self.cache.restore(a[0], a[1])]
+
+    def _write(self, step: Step, value: object, missing: list[tuple[str, Path, str]]) -> None:
+        for key, path, fmt in missing:
+            if step.plot is not None:
+                # Las figuras no se dibujan aquí: se encolan y se renderizan juntas en render()
+                with self._lock:
+                    job = FigureJob(step.plot, value, path, dict(step.plot_kwargs), self.opts.figure_style)
+                    self.pending.append((key, job))
+                continue
+            if fmt:
+                label = f"save_table:{path.name}"
+                write = lambda: save_table(value, path, fmt=fmt, compression=self.opts.compression)
+            else:
+                label = f"save_text:{path.name}"
+                write = lambda: save_text(value, path)
+            with stage(label, output=path):
+                write()
+            if self.cache is not None:
+                with self._lock:
+                    self.cache.store(key, path)
+
+    def run(self, steps: list[Step], threads: int = 1, jobs: int = 1) -> dict[str, dict]:
+        # Devuelve los datasets construidos (los que solo tenían aciertos de caché no están)
+        # 1) Aciertos de caché: esos pasos ya están hechos y no entran en el grafo
+        todo = {s.name: (s, m) for s in steps if (m := self._missing(s))}
+        needed = self.closure({src for s, _ in todo.values() for src in s.inputs})
+
+        # 2) Grafo: dataset:<entrada> -> dataset:<nombre> -> <paso>
+        data: dict[str, dict] = {}
+        tasks, deps = self._dataset_tasks(needed, data)
+
+        def write(step: Step, missing: list) -> Callable[[], None]:
+            return lambda: self._write(step, data[step.source][step.key], missing)
+
+        for name, (step, missing) in todo.items():
+            tasks[name] = write(step, missing)
+            deps[name] = {f"dataset:{src}" for src in step.inputs}
+        run_dag(tasks, deps, threads=threads)
+
+        # 3) Figuras pendientes: en paralelo con --jobs N
+        self.render(workers=jobs)
+        return data
+
+    def closure(self, names: set[str]) -> set[str]:
+        # Nodos pedidos y, transitivamente, los nodos de los que dependen (con estas opciones)
+        needed: set[str] = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.datasets[name].inputs(self.opts))
+        return needed
+
+    def build(self, names: set[str], threads: int = 1) -> dict[str, dict]:
+        # Solo los nodos pedidos y sus dependencias, sin pasos (p.ej. agregados para un resumen)
+        data: dict[str, dict] = {}
+        tasks, deps = self._dataset_tasks(self.closure(names), data)
+        run_dag(tasks, deps, threads=threads)
+        return data
+
+    def _dataset_tasks(
+        self, needed: set[str], data: dict[str, dict]
+    ) -> tuple[dict[str, Callable[[], object]], dict[str, set[str]]]:
+        # Una tarea dataset:<nombre> por nodo; cada una deja su dict en data
+        def build(name: str, inputs: tuple[str, ...]) -> Callable[[], None]:
+            def task() -> None:
+                with stage(f"dataset:{name}"):
+                    deps = {i: data[i] for i in inputs}
+                    data[name] = self.datasets[name].build(self.data_dir, self.opts, deps)
+
+            return task
+
+        tasks: dict[str, Callable[[], object]] = {}
+        deps: dict[str, set[str]] = {}
+        for n in needed:
+            inputs = self.datasets[n].inputs(self.opts)
+            tasks[f"dataset:{n}"] = build(n, inputs)
+            deps[f"dataset:{n}"] = {f"dataset:{i}" for i in inputs}
+        return tasks, deps
+
+    def render(self, workers: int = 1) -> None:
+        # Orden del registro, no de finalización de los hilos
+        self.pending.sort(key=lambda kj: kj[1].figpath.name)
+        # Segunda oportunidad en la caché: clave según los datos agregados
+        # (si cambia el CSV pero no los recuentos, la figura no se redibuja)
+        todo = []
+        for key, job in self.pending:
+            data_key = job.key() if self.cache is not None else ""
+            if self.cache is not None:
+                with self._lock:
+                    if self.cache.restore(data_key, job.figpath):
+                        self.cache.store(key, job.figpath)
+                        continue
+            todo.append((key, data_key, job))
+        render_figures([job for _, _, job in todo], workers=workers)
+        if self.cache is not None:
+            with self._lock:
+                for key, data_key, job in todo:
+                    self.cache.store(key, job.figpath)
+                    self.cache.store(data_key, job.figpath)
+        self.pending.clear()
@@ -1,9 +1,26 @@
 from __future__ import annotations
 
+import hashlib
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-import numpy as np
+from typing import TYPE_CHECKING, Callable
+
 import polars as pl
-import matplotlib.pyplot as plt
+
+from src.density import age_bin_values, age_histogram, binned_kde, weighted_kde
+from src.io_utils import code_fingerprint, function_sources
+from src.profiling import profiled, stage
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+# API orientada a objetos (Figure) en lugar del estado global de pyplot:
+# cada figura es independiente y se puede renderizar en paralelo.
+# matplotlib y numpy se importan al dibujar la primera figura, no al
+# importar este módulo: una ejecución solo de tablas no paga su arranque.
 
 
 def annotate_bars(ax, fmt: str = "{:.0f}", padding: int = 3) -> None:
@@ -14,18 +31,55 @@ def annotate_bars(ax, fmt: str = "{:.0f}", padding: int = 3) -> None:
         ax.bar_label(container, fmt=fmt, padding=padding)
 
 
-def _save(figpath: Path) -> None:
+def _new_axes():
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    return fig, fig.subplots()
+
+
+@dataclass(frozen=True)
+class FigureStyle:
+    """
+    Cómo se guarda una figura: dpi y nivel de compresión PNG (0-9,
+    None: el de Pillow por defecto). El formato (png / svg) es el
+    sufijo de figpath.
+    """
+
+    dpi: int = 160
+    png_compression: int | None = None
+
+
+DEFAULT_STYLE = FigureStyle()
+
+
+def _save(fig: Figure, figpath: Path, style: FigureStyle = DEFAULT_STYLE) -> None:
     figpath.parent.mkdir(parents=True, exist_ok=True)
-    plt.tight_layout()
-    plt.savefig(figpath, dpi=160)
-    plt.close()
+    fig.tight_layout()
+    if figpath.suffix == ".svg":
+        import matplotlib as mpl
 
+        # Sin fecha ni ids aleatorios: mismo contenido -> mismo fichero
+        with mpl.rc_context({"svg.hashsalt": "titanic"}):
+            fig.savefig(figpath, format="svg", metadata={"Date": None})
+        return
+    extra = {} if style.png_compression is None else {"pil_kwargs": {"compress_level": style.png_compression}}
+    fig.savefig(figpath, dpi=style.dpi, **extra)
 
-def bar_counts(df_counts: pl.DataFrame, x_col: str, y_col: str, title: str, figpath: Path) -> None:
+
+@profiled
+def bar_counts(
+    df_counts: pl.DataFrame,
+    x_col: str,
+    y_col: str,
+    title: str,
+    figpath: Path,
+    style: FigureStyle = DEFAULT_STYLE,
+) -> None:
     x = df_counts[x_col].to_list()
     y = df_counts[y_col].to_list()
 
-    fig, ax = plt.subplots()
+    fig, ax = _new_axes()
     ax.bar(x, y)
     ax.set_title(title)
     ax.set_xlabel(x_col)
@@ -33,9 +87,10 @@ def bar_counts(df_counts: pl.DataFrame, x_col: str, y_col: str, title: str, figp
 
     annotate_bars(ax, fmt="{:.0f}", padding=3)
 
-    _save(figpath)
+    _save(fig, figpath, style)
 
 
+@profiled
 def bar_counts_hue(
     df_counts: pl.DataFrame,
     x_col: str,
@@ -43,7 +98,10 @@ def bar_counts_hue(
     y_col: str,
     title: str,
     figpath: Path,
+    style: FigureStyle = DEFAULT_STYLE,
 ) -> None:
+    import numpy as np
+
     xs = df_counts[x_col].unique().to_list()
     hues = df_counts[hue_col].unique().to_list()
 
@@ -54,7 +112,7 @@ def bar_counts_hue(
     hues = sorted(hues, key=str)
 
     pivot = (
-        df_counts.pivot(index=x_col, columns=hue_col, values=y_col, aggregate_function="first")
+        df_counts.pivot(index=x_col, on=hue_col, values=y_col, aggregate_function="first")
         .sort(x_col)
     )
 
@@ -62,7 +120,7 @@ def bar_counts_hue(
     width = 0.8 / max(1, len(hues))
     base = np.arange(len(x_vals))
 
-    fig, ax = plt.subplots()
+    fig, ax = _new_axes()
 
     for i, h in enumerate(hues):
         if h in pivot.columns:
@@ -81,15 +139,16 @@ def bar_counts_hue(
 
     annotate_bars(ax, fmt="{:.0f}", padding=3)
 
-    _save(figpath)
+    _save(fig, figpath, style)
 
 
-def survived_vs_not(df: pl.DataFrame, figpath: Path) -> None:
-    counts = df.group_by("Survived").agg(pl.len().alias("count")).sort("Survived")
+@profiled
+def survived_vs_not(counts: pl.DataFrame, figpath: Path, style: FigureStyle = DEFAULT_STYLE) -> None:
+    # counts: recuento por Survived ya agregado (e1_survived_counts)
     x = [("No" if v == 0 else "Sí") for v in counts["Survived"].to_list()]
     y = counts["count"].to_list()
 
-    fig, ax = plt.subplots()
+    fig, ax = _new_axes()
     ax.bar(x, y)
     ax.set_title("¿ Sobrevivieron ?")
     ax.set_xlabel("Survived")
@@ -97,40 +156,126 @@ def survived_vs_not(df: pl.DataFrame, figpath: Path) -> None:
 
     annotate_bars(ax, fmt="{:.0f}", padding=3)
 
-    _save(figpath)
+    _save(fig, figpath, style)
 
 
-def age_hist_with_kde(df: pl.DataFrame, figpath: Path) -> None:
-    # Q15 pide eliminar nulos en Age para distribuciones
-    ages = df.select(pl.col("Age").drop_nulls()).to_series().to_numpy()
-    ages = ages[~np.isnan(ages)]
+def _age_axes(age_bins: pl.DataFrame, bins: int, density: bool, title: str, ylabel: str):
+    """
+    Histograma de edad a partir de density.age_bins (rejilla fija de
+    edades): los intervalos se cuentan en Polars (density.age_histogram)
+    y se dibujan con ax.stairs. Solo pasan a NumPy bins + 1 bordes y
+    recuentos, nunca la columna Age.
+    """
+    hist = age_histogram(age_bins, bins)
+    edges = hist["edge"].to_numpy()
+    heights = hist["count"].to_numpy()[:-1].astype(float)
+    if density and heights.sum() > 0:
+        heights /= heights.sum() * (edges[1] - edges[0])
+
+    fig, ax = _new_axes()
+    if len(edges):
+        ax.stairs(heights, edges, fill=True)
+    ax.set_title(title)
+    ax.set_xlabel("Age")
+    ax.set_ylabel(ylabel)
+    return fig, ax
 
-    plt.figure()
-    plt.hist(ages, bins=30, density=True)
-    plt.title("Distribución de edad (histograma + densidad)")
-    plt.xlabel("Age")
-    plt.ylabel("density")
 
-    # KDE simple con scipy si está
-    try:
-        from scipy.stats import gaussian_kde
+def _kde_grid(age_bins: pl.DataFrame):
+    # (edad de cada celda, recuentos, 200 puntos entre min y max) o None si no hay densidad que dibujar
+    import numpy as np
 
-        kde = gaussian_kde(ages)
-        xs = np.linspace(ages.min(), ages.max(), 200)
-        plt.plot(xs, kde(xs))
-    except Exception:
-        pass
+    values = age_bin_values(age_bins).to_numpy()
+    weights = age_bins["count"].to_numpy()
+    if weights.sum() <= 1 or values.min() >= values.max():
+        return None
+    return values, weights, np.linspace(values.min(), values.max(), 200)
+
+
+@profiled
+def age_hist_with_kde(age_bins: pl.DataFrame, figpath: Path, style: FigureStyle = DEFAULT_STYLE) -> None:
+    # Q15 pide eliminar nulos en Age para distribuciones (age_bins ya no los tiene)
+    fig, ax = _age_axes(age_bins, 30, True, "Distribución de edad (histograma + densidad)", "density")
+
+    # KDE exacta sobre las celdas (misma curva que gaussian_kde si cada celda tiene un solo valor)
+    grid = _kde_grid(age_bins)
+    if grid is not None:
+        values, weights, xs = grid
+        ax.plot(xs, weighted_kde(values, weights, xs))
+
+    _save(fig, figpath, style)
 
-    _save(figpath)
+
+@profiled
+def age_hist_with_kde_binned(age_bins: pl.DataFrame, figpath: Path, style: FigureStyle = DEFAULT_STYLE) -> None:
+    """
+    Misma figura que age_hist_with_kde pero con KDE por binning lineal
+    + FFT: coste que no depende del nº de edades distintas.
+    """
+    fig, ax = _age_axes(age_bins, 30, True, "Distribución de edad (histograma + densidad)", "density")
+
+    grid = _kde_grid(age_bins)
+    if grid is not None:
+        values, weights, xs = grid
+        ax.plot(xs, binned_kde(values, weights, xs))
+
+    _save(fig, figpath, style)
 
 
-def age_hist_alt(df: pl.DataFrame, figpath: Path) -> None:
-    ages = df.select(pl.col("Age").drop_nulls()).to_series().to_numpy()
-    ages = ages[~np.isnan(ages)]
+@profiled
+def age_hist_alt(age_bins: pl.DataFrame, figpath: Path, style: FigureStyle = DEFAULT_STYLE) -> None:
+    fig, _ = _age_axes(age_bins, 20, False, "Histograma de edades (alternativo)", "count")
+    _save(fig, figpath, style)
+
+
+# =========================================================
+# Renderizado en paralelo
+# =========================================================
+
+@dataclass(frozen=True)
+class FigureJob:
+    """
+    Una figura pendiente: función de plot + datos ya agregados (pequeños).
+    Es serializable (pickle) para enviarla a un proceso worker.
+    """
 
-    plt.figure()
-    plt.hist(ages, bins=20)
-    plt.title("Histograma de edades (alternativo)")
-    plt.xlabel("Age")
-    plt.ylabel("count")
-    _save(figpath)
+    plot: Callable[..., None]
+    data: pl.DataFrame
+    figpath: Path
+    kwargs: dict = field(default_factory=dict)
+    style: FigureStyle = DEFAULT_STYLE
+
+    def key(self) -> str:
+        """
+        Clave de caché de la figura según lo que se dibuja: código de
+        src/ y del plot + datos agregados + parámetros (título...) +
+        estilo y formato. Si los recuentos no cambian, la figura tampoco.
+        """
+        h = hashlib.sha256()
+        h.update(code_fingerprint().encode())
+        for src in function_sources(self.plot):
+            h.update(src.encode())
+        buf = io.BytesIO()
+        self.data.write_ipc(buf)
+        h.update(buf.getvalue())
+        h.update(repr((sorted(self.kwargs.items()), self.style, self.figpath.suffix)).encode())
+        return h.hexdigest()
+
+    def run(self) -> Path:
+        self.plot(self.data, figpath=self.figpath, style=self.style, **self.kwargs)
+        return self.figpath
+
+
+def render_figures(jobs: list[FigureJob], workers: int = 1) -> None:
+    # workers <= 1: en el propio proceso, una detrás de otra
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            with stage(f"figure:{job.figpath.name}", output=job.figpath):
+                job.run()
+        return
+
+    # spawn: no hacer fork de un proceso con los hilos de Polars activos
+    ctx = multiprocessing.get_context("spawn")
+    with stage(f"render_figures[{len(jobs)} figuras, {workers} procesos]"):
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=ctx) as ex:
+            list(ex.map(FigureJob.run, jobs))
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Callable, Iterator
+
+
+# =========================================================
+# Memoria: pico de RSS
+# =========================================================
+
+class PeakRss:
+    """
+    Pico de memoria residente (RSS) mientras dura el bloque with,
+    muestreando /proc/self/statm en un hilo (Polars reserva memoria
+    fuera de Python, así que tracemalloc no la ve). Cuenta resident -
+    shared: las páginas de ficheros mapeados (los CSV y Arrow que lee
+    Polars) son caché de páginas del sistema, no memoria del proceso.
+    Solo Linux; en otros sistemas peak_mb queda a None.
+    """
+
+    def __init__(self, interval: float = 0.002) -> None:
+        self.interval = interval
+        self.peak_mb: float | None = None
+        self._stop = threading.Event()
+        self._page = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _rss(self) -> int | None:
+        try:
+            with open("/proc/self/statm", "rb") as fp:
+                fields = fp.read().split()
+            return (int(fields[1]) - int(fields[2])) * self._page
+        except OSError:
+            return None
+
+    def _sample(self) -> None:
+        # wait() en lugar de sleep(): al salir del bloque el hilo termina en el acto
+        while not self._stop.wait(self.interval):
+            rss = self._rss()
+            if rss is not None:
+                self._peak = max(self._peak, rss)
+
+    def __enter__(self) -> PeakRss:
+        self._start = self._rss()
+        self._peak = self._start or 0
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._stop.set()
+        self._thread.join()
+        if self._start is not None:
+            self._peak = max(self._peak, self._rss() or 0)
+            self.peak_mb = (self._peak - self._start) / 1e6
+
+
+# =========================================================
+# Perfil por etapas
+# =========================================================
+
+class Profiler:
+    """
+    Registra, para cada etapa (carga, cada e1_* / ejercicio2, cada
+    save_table, cada plot): tiempo real, tiempo de CPU (todos los hilos,
+    incluidos los de Polars) y bytes escritos. Las etapas pueden anidarse
+    (depth, por hilo: los pasos del planificador corren en paralelo). Con
+    varios hilos el tiempo de CPU es el del proceso entero durante la etapa.
+
+    El pico de RSS se mide una vez para toda la ejecución (run_memory, en
+    main). Con stage_memory=True también por etapa (un hilo de muestreo
+    por etapa); si hay etapas en varios hilos a la vez, ese pico es el del
+    proceso entero mientras dura la etapa, y así se indica en la tabla.
+    """
+
+    def __init__(self, stage_memory: bool = False) -> None:
+        self.stage_memory = stage_memory
+        self.records: list[dict] = []
+        self.peak_rss_mb: float | None = None
+        self._local = threading.local()
+
+    @contextmanager
+    def stage(self, name: str, output: Path | None = None) -> Iterator[None]:
+        depth = getattr(self._local, "depth", 0)
+        rec: dict = {"stage": name, "depth": depth, "thread": threading.current_thread().name}
+        self.records.append(rec)  # se añade al empezar: orden de inicio
+        self._local.depth = depth + 1
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        mem = PeakRss() if self.stage_memory else None
+        try:
+            with mem if mem is not None else nullcontext():
+                yield
+        finally:
+            self._local.depth = depth
+            rec["wall_s"] = time.perf_counter() - wall0
+            rec["cpu_s"] = time.process_time() - cpu0
+            rec["peak_rss_delta_mb"] = mem.peak_mb if mem is not None else None
+            rec["output_bytes"] = output.stat().st_size if output is not None and output.exists() else None
+
+    @contextmanager
+    def run_memory(self) -> Iterator[None]:
+        # Pico de RSS de la ejecución completa: un solo hilo de muestreo
+        with PeakRss() as mem:
+            yield
+        self.peak_rss_mb = mem.peak_mb
+
+    def concurrent(self) -> bool:
+        # Etapas en más de un hilo: el pico de RSS por etapa es el del proceso
+        return len({r.get("thread") for r in self.records}) > 1
+
+    def write_json(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        doc = {
+            "peak_rss_mb": self.peak_rss_mb,
+            "stage_rss_scope": ("process" if self.concurrent() else "stage") if self.stage_memory else None,
+            "stages": self.records,
+        }
+        path.write_text(json.dumps(doc, indent=2), encoding="utf-8")
+
+    def markdown(self) -> list[str]:
+        lines = ["\n## Tiempos por etapa\n"]
+        if self.peak_rss_mb is not None:
+            lines.append(f"Pico de RSS de la ejecución completa: {self.peak_rss_mb:.1f} MB.\n")
+        header = ["Etapa", "Real (ms)", "CPU (ms)", "Bytes"]
+        if self.stage_memory:
+            header.insert(3, "Δ pico RSS del proceso (MB)" if self.concurrent() else "Δ pico RSS (MB)")
+        lines += ["| " + " | ".join(header) + " |", "|---" + "|---:" * (len(header) - 1) + "|"]
+        # Agrupadas por hilo (en orden de aparición) para que el anidamiento se lea bien
+        threads = list(dict.fromkeys(r.get("thread") for r in self.records))
+        for r in sorted(self.records, key=lambda r: threads.index(r.get("thread"))):
+            cells = ["&nbsp;&nbsp;" * r["depth"] + f"`{r['stage']}`", f"{r['wall_s'] * 1e3:.1f}", f"{r['cpu_s'] * 1e3:.1f}"]
+            if self.stage_memory:
+                cells.append("" if r.get("peak_rss_delta_mb") is None else f"{r['peak_rss_delta_mb']:.1f}")
+            cells.append("" if r.get("output_bytes") is None else str(r["output_bytes"]))
+            lines.append("| " + " | ".join(cells) + " |")
+        return lines
+
+
+# Perfilador activo del proceso (None: sin instrumentación, coste cero)
+_ACTIVE: Profiler | None = None
+
+
+def set_profiler(profiler: Profiler | None) -> None:
+    global _ACTIVE
+    _ACTIVE = profiler
+
+
+def stage(name: str, output: Path | None = None):
+    # Context manager: etapa del perfilador activo, o no-op si no hay ninguno
+    if _ACTIVE is None:
+        return nullcontext()
+    return _ACTIVE.stage(name, output)
+
+
+def profiled(fn: Callable) -> Callable:
+    # Decorador: cada llamada a fn es una etapa (nombre = nombre de la función)
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _ACTIVE is None:
+            return fn(*args, **kwargs)
+        with _ACTIVE.stage(fn.__name__):
+            return fn(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import polars as pl
+
+from src.schemas import CSV_SCHEMAS, NULL_VALUES
+
+
+# =========================================================
+# Lectura de los CSV de entrada con el esquema del registro
+# =========================================================
+#
+# read_input / scan_input leen con el esquema de src.schemas.CSV_SCHEMAS
+# (sin inferencia). Por defecto un valor que no encaja con su tipo es un
+# error. Con --validate (set_tolerant) se leen las columnas como texto y
+# se convierten con cast(strict=False): el valor erróneo queda como null
+# y validate_inputs lo lista (fichero, línea, columna, valor) sin abortar.
+
+VALIDATION_BATCH_ROWS = 500_000
+MAX_REPORTED = 1_000  # filas listadas por fichero (el recuento es completo)
+
+_TOLERANT = False
+
+ERRORS_SCHEMA = {"file": pl.String, "line": pl.Int64, "column": pl.String, "value": pl.String, "expected": pl.String}
+
+
+def set_tolerant(tolerant: bool) -> None:
+    global _TOLERANT
+    _TOLERANT = tolerant
+
+
+def is_tolerant() -> bool:
+    return _TOLERANT
+
+
+def _typed(lf: pl.LazyFrame, schema: dict[str, pl.DataType]) -> pl.LazyFrame:
+    # Texto -> tipo del registro; lo que no se puede convertir queda null
+    return lf.with_columns(pl.col(c).cast(dt, strict=False) for c, dt in schema.items() if dt != pl.String)
+
+
+def scan_input(data_dir: Path, name: str, skip_rows: int = 0) -> pl.LazyFrame:
+    # skip_rows: filas de datos ya leídas (modo incremental)
+    schema = CSV_SCHEMAS[name]
+    path = data_dir / name
+    if not _TOLERANT:
+        return pl.scan_csv(path, schema=schema, null_values=NULL_VALUES, skip_rows_after_header=skip_rows)
+    raw = {c: pl.String for c in schema}
+    return _typed(pl.scan_csv(path, schema=raw, null_values=NULL_VALUES, skip_rows_after_header=skip_rows), schema)
+
+
+def read_input(data_dir: Path, name: str, skip_rows: int = 0) -> pl.DataFrame:
+    if not _TOLERANT:
+        schema = CSV_SCHEMAS[name]
+        return pl.read_csv(data_dir / name, schema=schema, null_values=NULL_VALUES, skip_rows_after_header=skip_rows)
+    return scan_input(data_dir, name, skip_rows).collect()
+
+
+def validate_csv(path: Path, schema: dict[str, pl.DataType], batch_rows: int = VALIDATION_BATCH_ROWS) -> pl.DataFrame:
+    """
+    Valores que no encajan con el esquema, leyendo el CSV por lotes
+    (memoria acotada). Columnas: file, line (línea del fichero, la
+    cabecera es la 1), column, value, expected. Si la cabecera no
+    coincide con el esquema se informa solo de eso (line = 1).
+    """
+    header = pl.read_csv(path, n_rows=0).columns
+    if header != list(schema):
+        return pl.DataFrame(
+            {
+                "file": [path.name],
+                "line": [1],
+                "column": ["<cabecera>"],
+                "value": [",".join(header)],
+                "expected": [",".join(schema)],
+            }
+        )
+
+    typed = [c for c, dt in schema.items() if dt != pl.String]
+    lf = pl.scan_csv(path, schema={c: pl.String for c in schema}, null_values=NULL_VALUES)
+    lf = lf.with_row_index("line", offset=2).select("line", *typed)
+
+    found: list[pl.DataFrame] = []
+    for batch in lf.collect_batches(chunk_size=batch_rows):
+        for col in typed:
+            raw = pl.col(col)
+            bad = batch.filter(raw.is_not_null() & raw.cast(schema[col], strict=False).is_null())
+            if bad.height:
+                found.append(
+                    bad.select(
+                        pl.lit(path.name).alias("file"),
+                        pl.col("line").cast(pl.Int64),
+                        pl.lit(col).alias("column"),
+                        raw.alias("value"),
+                        pl.lit(str(schema[col])).alias("expected"),
+                    )
+                )
+    if not found:
+        return pl.DataFrame(schema=ERRORS_SCHEMA)
+    return pl.concat(found).sort("line", "column")
+
+
+def validate_inputs(data_dir: Path, names: list[str] | None = None) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """
+    Valida los CSV de data_dir contra el registro. Devuelve
+    (resumen: fichero, filas erróneas, valores erróneos;
+    detalle: hasta MAX_REPORTED valores por fichero).
+    """
+    summary, detail = [], []
+    for name in names or list(CSV_SCHEMAS):
+        path = data_dir / name
+        if not path.exists():
+            continue
+        errors = validate_csv(path, CSV_SCHEMAS[name])
+        summary.append({"file": name, "bad_rows": errors["line"].n_unique(), "bad_values": errors.height})
+        detail.append(errors.head(MAX_REPORTED))
+    summary_df = pl.DataFrame(summary, schema={"file": pl.String, "bad_rows": pl.Int64, "bad_values": pl.Int64})
+    return summary_df, pl.concat(detail) if detail else pl.DataFrame(schema=ERRORS_SCHEMA)
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import polars as pl
+
+
+# =========================================================
+# Esquemas explícitos de los CSV de entrada
+# =========================================================
+
+PCLASS = pl.Enum(["1", "2", "3"])
+SEX = pl.Enum(["female", "male"])
+EMBARKED = pl.Enum(["C", "Q", "S"])
+
+# Columnas derivadas del Ejercicio 2 (add_puerto, add_age_range). Categorías
+# en orden alfabético: las tablas salen ordenadas igual que con String.
+PUERTO = pl.Enum(["Cherbourg", "Queenstown", "Southampton"])
+RANGO_EDAD = pl.Enum(["adulto", "anciano", "joven"])
+
+PASAJEROS_SCHEMA = {
+    "PassengerId": pl.Int64,
+    "Pclass": PCLASS,
+    "Name": pl.String,
+    "Sex": SEX,
+    "Age": pl.Float64,
+    "SibSp": pl.Int64,
+    "Parch": pl.Int64,
+    "Ticket": pl.String,
+    "Fare": pl.Float64,
+    "Cabin": pl.String,
+    "Embarked": EMBARKED,
+}
+
+SUPERVIVIENTES_SCHEMA = {
+    "PassengerId": pl.Int64,
+    "Survived": pl.Int64,
+}
+
+TITANIC_SCHEMA = {
+    "PassengerId": pl.Int64,
+    "Survived": pl.Int64,
+    **{k: v for k, v in PASAJEROS_SCHEMA.items() if k != "PassengerId"},
+}
+
+SCHEMAS = {
+    "titanic.csv": TITANIC_SCHEMA,
+    "pasajeros.csv": PASAJEROS_SCHEMA,
+    "supervivientes.csv": SUPERVIVIENTES_SCHEMA,
+}
+
+
+def plain_schema(schema: dict[str, pl.DataType]) -> dict[str, pl.DataType]:
+    """
+    Mismo esquema sin Enum (Pclass -> Int64, resto -> String): los tipos
+    que infiere read_csv, para producir exactamente las mismas tablas.
+    """
+    return {
+        col: (pl.Int64 if col == "Pclass" else pl.String) if isinstance(dt, pl.Enum) else dt
+        for col, dt in schema.items()
+    }
+
+
+def compact_schema(schema: dict[str, pl.DataType]) -> dict[str, pl.DataType]:
+    """
+    Como plain_schema, pero Sex y Embarked se leen ya como Enum: los
+    join / group_by posteriores trabajan con códigos enteros pequeños
+    en lugar de cadenas. Un valor fuera de las categorías es un error.
+    """
+    plain = plain_schema(schema)
+    return {col: schema[col] if col in ("Sex", "Embarked") else dt for col, dt in plain.items()}
+
+
+# =========================================================
+# Registro de lectura de los CSV (sin --store)
+# =========================================================
+#
+# Esquema completo para cada fichero: read_csv / scan_csv no infieren
+# nada (ni muestrean filas), así que el tipo de una columna no depende
+# de en qué fila aparece el primer decimal o el primer valor raro.
+# Ejercicio 1 usa los tipos que infería read_csv (e1_03_info los
+# muestra); Ejercicio 2 lee Sex / Embarked ya como Enum.
+
+NULL_VALUES = [""]
+
+CSV_SCHEMAS = {
+    "titanic.csv": plain_schema(TITANIC_SCHEMA),
+    "pasajeros.csv": compact_schema(PASAJEROS_SCHEMA),
+    "supervivientes.csv": compact_schema(SUPERVIVIENTES_SCHEMA),
+}
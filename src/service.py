@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import functools
+import io
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+from urllib.parse import parse_qs, urlsplit
+
+import polars as pl
+
+from src.cube import CountCube
+from src.ejercicio1 import (
+    load_titanic,
+    e1_cube,
+    e1_head,
+    e1_profile,
+    e1_info,
+    e1_passengers_by_class,
+    e1_passengers_by_sex,
+    e1_sex_by_class,
+    e1_survived_pivot_by_class_sex,
+    e1_survived_counts,
+    e1_total_not_survived,
+    e1_not_survived_by_class_sex,
+    e1_survived_not_pivot_by_class_sex,
+    e1_dropna_age_summary,
+    e1_minor16_counts,
+)
+from src.ejercicio2 import (
+    load_pasajeros,
+    load_supervivientes,
+    join_indexed,
+    add_puerto,
+    e2_cube,
+    passengers_by_puerto,
+    passengers_by_sex,
+    mean_age_by_sex_survived,
+    deaths_by_age_range,
+    deaths_by_class_gender,
+    survived_and_deaths_by_puerto,
+)
+
+
+# =========================================================
+# Servicio HTTP con los datos en memoria
+# =========================================================
+#
+# python -m src.service --port 8765
+#
+# Carga titanic.csv y el join de Ejercicio 2 una sola vez y responde
+# consultas sin volver a arrancar el intérprete ni parsear CSV:
+#
+#   GET /                                   -> lista de endpoints
+#   GET /e1/e1_sex_by_class?Survived=1      -> JSON (lista de filas)
+#   GET /e2/mean_age_by_sex_survived?Pclass=1,2&format=arrow
+#   GET /reload                             -> vuelve a leer los CSV
+#
+# Los filtros son columna=valor[,valor...] (igualdad / pertenencia)
+# sobre columnas discretas; el valor se convierte al tipo de la columna
+# y, si no encaja (o la columna es continua), la respuesta es un 400.
+# Los resultados se guardan en una caché LRU en memoria.
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """
+    fn se aplica a los datos filtrados. cube: fn acepta un CountCube;
+    si todos los filtros son dimensiones del cubo se filtra el cubo
+    (pocas filas) en lugar de los datos. filters=False: tabla fija.
+    """
+
+    source: str  # "e1" (titanic.csv), "e2" (join pasajeros + supervivientes), "join_quality"
+    fn: Callable[[pl.DataFrame | CountCube], pl.DataFrame]
+    cube: bool = False
+    filters: bool = True
+
+
+ENDPOINTS: dict[str, Endpoint] = {
+    "e1/e1_head": Endpoint("e1", e1_head),
+    "e1/e1_profile": Endpoint("e1", e1_profile),
+    "e1/e1_info": Endpoint("e1", e1_info),
+    "e1/e1_passengers_by_class": Endpoint("e1", e1_passengers_by_class, cube=True),
+    "e1/e1_passengers_by_sex": Endpoint("e1", e1_passengers_by_sex, cube=True),
+    "e1/e1_sex_by_class": Endpoint("e1", e1_sex_by_class, cube=True),
+    "e1/e1_survived_pivot_by_class_sex": Endpoint("e1", e1_survived_pivot_by_class_sex, cube=True),
+    "e1/e1_survived_counts": Endpoint("e1", e1_survived_counts, cube=True),
+    "e1/e1_total_not_survived": Endpoint("e1", e1_total_not_survived, cube=True),
+    "e1/e1_not_survived_by_class_sex": Endpoint("e1", e1_not_survived_by_class_sex, cube=True),
+    "e1/e1_survived_not_pivot_by_class_sex": Endpoint("e1", e1_survived_not_pivot_by_class_sex, cube=True),
+    "e1/e1_dropna_age_summary": Endpoint("e1", e1_dropna_age_summary),
+    "e1/e1_minor16_counts": Endpoint("e1", e1_minor16_counts),
+    "e2/passengers_by_puerto": Endpoint("e2", passengers_by_puerto, cube=True),
+    "e2/passengers_by_sex": Endpoint("e2", passengers_by_sex, cube=True),
+    "e2/mean_age_by_sex_survived": Endpoint("e2", mean_age_by_sex_survived),
+    "e2/deaths_by_age_range": Endpoint("e2", deaths_by_age_range, cube=True),
+    "e2/deaths_by_class_gender": Endpoint("e2", deaths_by_class_gender, cube=True),
+    "e2/survived_and_deaths_by_puerto": Endpoint("e2", survived_and_deaths_by_puerto, cube=True),
+    "e2/join_quality": Endpoint("join_quality", lambda df: df, filters=False),  # precalculada
+}
+
+
+class QueryError(ValueError):
+    """Petición inválida (-> 400)."""
+
+
+class WarmData:
+    """Datos de los dos ejercicios (y sus cubos de recuentos) cargados una vez."""
+
+    def __init__(self, data_dir: Path, store: bool = False) -> None:
+        titanic = load_titanic(data_dir, store)
+        df_p = load_pasajeros(data_dir, store)
+        df_s = load_supervivientes(data_dir, store)
+        joined, quality = join_indexed(data_dir, df_p, df_s)
+
+        self.frames = {"e1": titanic, "e2": add_puerto(joined), "join_quality": quality}
+        self.cubes = {"e1": e1_cube(titanic), "e2": e2_cube(self.frames["e2"])}
+
+    def query(self, name: str, filters: tuple[tuple[str, tuple[str, ...]], ...]) -> pl.DataFrame:
+        ep = ENDPOINTS.get(name)
+        if ep is None:
+            raise QueryError(f"endpoint desconocido: /{name}")
+        if filters and not ep.filters:
+            raise QueryError(f"/{name} no admite filtros")
+
+        cols = {c for c, _ in filters}
+        if ep.cube and cols <= set(self.cubes[ep.source].dims):
+            cube = self.cubes[ep.source]
+            return ep.fn(CountCube(_apply_filters(cube.frame, filters), cube.dims))
+
+        df = self.frames[ep.source]
+        unknown = cols - set(df.columns)
+        if unknown:
+            raise QueryError(f"columnas desconocidas: {sorted(unknown)}")
+        return ep.fn(_apply_filters(df, filters))
+
+
+def _apply_filters(df: pl.DataFrame, filters: tuple[tuple[str, tuple[str, ...]], ...]) -> pl.DataFrame:
+    # Los valores se convierten al tipo de la columna: la comparación usa su tipo (y sus índices)
+    for col, values in filters:
+        df = df.filter(pl.col(col).is_in(_filter_values(col, df.schema[col], values).implode()))
+    return df
+
+
+def _filter_values(col: str, dtype: pl.DataType, values: tuple[str, ...]) -> pl.Series:
+    """
+    Valores de un filtro con el tipo de la columna. Solo columnas
+    discretas (enteros, texto, Enum/Categorical, booleanos); un valor
+    que no encaja con el tipo (Pclass=primera, Sex=otro en un Enum) o
+    una columna continua (Age, Fare) es un error de la petición, no un
+    resultado vacío.
+    """
+    if dtype == pl.Boolean:
+        flags = {"true": True, "1": True, "false": False, "0": False}
+        bad = [v for v in values if v.lower() not in flags]
+        if bad:
+            raise QueryError(f"valor no válido para {col} (Boolean): {bad[0]!r}")
+        return pl.Series(col, [flags[v.lower()] for v in values], dtype=pl.Boolean)
+    if not (dtype.is_integer() or dtype == pl.String or isinstance(dtype, (pl.Enum, pl.Categorical))):
+        raise QueryError(f"{col} ({dtype}) no admite filtros de igualdad: solo columnas discretas")
+    try:
+        return pl.Series(col, values, dtype=pl.String).cast(dtype, strict=True)
+    except pl.exceptions.InvalidOperationError:
+        raise QueryError(f"valor no válido para {col} ({dtype}): {','.join(values)}") from None
+
+
+def encode(df: pl.DataFrame, fmt: str) -> bytes:
+    if fmt == "arrow":
+        buf = io.BytesIO()
+        df.write_ipc_stream(buf)
+        return buf.getvalue()
+    return json.dumps(df.to_dicts(), default=str).encode()
+
+
+class Service:
+    """Resultados ya codificados, en una caché LRU por (endpoint, filtros, formato)."""
+
+    def __init__(self, data_dir: Path, store: bool = False, cache_size: int = 1024) -> None:
+        self.data_dir = data_dir
+        self.store = store
+        self.cache_size = cache_size
+        self.reload()
+
+    def reload(self) -> None:
+        self.data = WarmData(self.data_dir, self.store)
+        self.answer = functools.lru_cache(maxsize=self.cache_size)(self._answer)
+
+    def _answer(self, name: str, filters: tuple, fmt: str) -> bytes:
+        return encode(self.data.query(name, filters), fmt)
+
+
+def parse_query(query: str) -> tuple[tuple[tuple[str, tuple[str, ...]], ...], str]:
+    # ?Sex=female&Pclass=1,2&format=arrow -> filtros normalizados (clave de caché) + formato
+    params = parse_qs(query, keep_blank_values=True)
+    fmt = params.pop("format", ["json"])[-1]
+    if fmt not in CONTENT_TYPES:
+        raise QueryError(f"formato desconocido: {fmt} (json, arrow)")
+    filters = tuple(
+        sorted((col, tuple(sorted({v for vs in values for v in vs.split(",")}))) for col, values in params.items())
+    )
+    return filters, fmt
+
+
+async def _respond(writer: asyncio.StreamWriter, status: str, body: bytes, ctype: str, keep_alive: bool) -> None:
+    head = (
+        f"HTTP/1.1 {status}\r\n"
+        f"Content-Type: {ctype}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode() + body)
+    await writer.drain()
+
+
+async def handle(service: Service, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            # HTTP/1.1 mínimo: solo GET, conexión persistente salvo "Connection: close"
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip().lower()
+            keep_alive = headers.get("connection") != "close"
+
+            try:
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            except ValueError:
+                await _respond(writer, "400 Bad Request", b"", "text/plain", False)
+                break
+            url = urlsplit(target)
+            name = url.path.strip("/")
+
+            if method != "GET":
+                status, body, ctype = "405 Method Not Allowed", b"", "text/plain"
+            elif name == "":
+                status, body, ctype = "200 OK", json.dumps(sorted(ENDPOINTS)).encode(), CONTENT_TYPES["json"]
+            elif name == "reload":
+                await asyncio.to_thread(service.reload)
+                status, body, ctype = "200 OK", b'{"reloaded": true}', CONTENT_TYPES["json"]
+            else:
+                try:
+                    filters, fmt = parse_query(url.query)
+                    # Polars suelta el GIL: la consulta no bloquea el bucle de eventos
+                    body = await asyncio.to_thread(service.answer, name, filters, fmt)
+                    status, ctype = "200 OK", CONTENT_TYPES[fmt]
+                except QueryError as e:
+                    status = "404 Not Found" if str(e).startswith("endpoint") else "400 Bad Request"
+                    body, ctype = json.dumps({"error": str(e)}).encode(), CONTENT_TYPES["json"]
+                except pl.exceptions.PolarsError as e:
+                    status, body, ctype = "400 Bad Request", json.dumps({"error": str(e)}).encode(), CONTENT_TYPES["json"]
+
+            await _respond(writer, status, body, ctype, keep_alive)
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service: Service, host: str, port: int) -> None:
+    server = await asyncio.start_server(functools.partial(handle, service), host, port)
+    print(f"Sirviendo en http://{host}:{port}/ ({len(ENDPOINTS)} endpoints)")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Servicio HTTP con los datos Titanic en memoria.")
+    parser.add_argument("--data-dir", type=str, default="data", help="Carpeta donde están los CSV.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--store", action="store_true", help="Cargar desde data/.store (Arrow IPC).")
+    parser.add_argument("--cache-size", type=int, default=1024, help="Nº de respuestas en la caché LRU.")
+    args = parser.parse_args()
+
+    service = Service(Path(args.data_dir), store=args.store, cache_size=args.cache_size)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,417 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable
+
+import polars as pl
+
+from src.ejercicio1 import (
+    load_titanic,
+    scan_titanic,
+    e1_head,
+    e1_columns,
+    e1_profile,                            # (0) perfil de calidad
+    e1_info,
+    info_from_nulls,
+    e1_cube,
+    e1_from_cube,
+    e1_passengers_by_class,
+    e1_passengers_by_sex,
+    e1_sex_by_class,
+    e1_survived_pivot_by_class_sex,        # (10) solo supervivientes pivot
+    e1_survived_counts,                    # (11) recuento sí/no
+    e1_total_not_survived,                 # (12)
+    e1_not_survived_by_class_sex,          # (13)
+    e1_survived_not_pivot_by_class_sex,    # (14) surv/no pivot
+    e1_dropna_age,                         # df_age_clean
+    e1_dropna_age_summary,                 # (15) resumen
+    e1_minor16_counts,                     # (18)
+    e1_compute_all,                        # (1)-(18) eager
+    e1_collect_all,                        # (1)-(18) lazy, un solo collect_all
+)
+
+from src.ejercicio2 import (
+    load_pasajeros,
+    load_supervivientes,
+    build_df,
+    add_puerto,
+    passengers_by_puerto,
+    passengers_by_sex as e2_passengers_by_sex,
+    mean_age_by_sex_survived,
+    deaths_by_age_range,
+    deaths_by_class_gender,
+    survived_and_deaths_by_puerto,
+    join_indexed,
+    join_quality,
+    join_quality_from_profiles,
+    e2_profile,
+    e2_cube,
+    e2_from_cube,
+    e2_compute_all,                        # join + (1)-(7) eager
+    e2_collect_all,                        # join + (1)-(7) lazy/streaming
+)
+
+from src.approx import e1_approx, e2_approx, estimate_counts, estimate_mean, interval_table
+from src.dataprofile import key_queries, profile_data, profile_queries, profile_table
+from src.density import age_bins, age_bins_query, age_histogram, binned_kde, weighted_kde
+from src.incremental import e2_incremental
+from src.partition import e1_partitioned, e2_partitioned
+from src.pipeline import Dataset, RunOptions, Step
+
+from src.plots import (
+    bar_counts,
+    bar_counts_hue,
+    survived_vs_not,
+    age_hist_with_kde,
+    age_hist_with_kde_binned,
+    age_hist_alt,
+)
+
+# Registro de pasos del informe. Cada paso declara de qué dataset lee,
+# qué artefacto escribe y su línea del informe; el orden de la lista es
+# el del informe, no el de ejecución (src.pipeline decide qué corre a la vez).
+
+
+# =========================================================
+# Datasets
+# =========================================================
+#
+# Nodos de datos del grafo. En modo eager cada tabla sale de su propio
+# nodo, que declara sus entradas (titanic -> df_age_clean -> e1_age_bins,
+# titanic -> e1_cube -> e1_counts...): --only/--skip construyen solo lo
+# necesario y los nodos independientes corren a la vez. Los modos de una
+# sola pasada (lazy, streaming, particionado, incremental, approx)
+# calculan todo el ejercicio de una vez (e1_all / e2_all) y cada nodo
+# toma de ahí sus claves.
+
+E1_FILES = ("titanic.csv",)
+E2_FILES = ("pasajeros.csv", "supervivientes.csv")
+
+
+def e1_variant(opts: RunOptions) -> str:
+    return (
+        ("store" if opts.store else "")
+        + ("|validate" if opts.validate else "")
+        + (f"|approx={opts.approx_rows}" if opts.approx else "")
+    )
+
+
+def e2_variant(opts: RunOptions) -> str:
+    # validate: valores erróneos leídos como null (con datos limpios, mismo contenido)
+    return (
+        ("incremental" if opts.incremental else ("store" if opts.store else ""))
+        + ("|validate" if opts.validate else "")
+        + (f"|approx={opts.approx_rows}" if opts.approx else "")
+    )
+
+
+def e1_single_pass(opts: RunOptions) -> bool:
+    return opts.approx or opts.partitions > 1 or opts.lazy
+
+
+def e2_single_pass(opts: RunOptions) -> bool:
+    return opts.approx or opts.incremental or opts.partitions > 1 or opts.engine == "streaming"
+
+
+def build_titanic(data_dir: Path, opts: RunOptions, deps: dict) -> dict:
+    # Todos los agregados de una vez: estimados sobre la muestra de data/.sample,
+    # por shards en varios procesos, eager (read_csv) o lazy (scan_csv + collect_all)
+    if opts.approx:
+        return e1_approx(data_dir, opts.approx_rows)
+    if opts.partitions > 1:
+        return e1_partitioned(
+            data_dir, opts.partitions, opts.partition_by, opts.executor, opts.store, opts.data_profile
+        )
+    if opts.lazy:
+        return e1_collect_all(scan_titanic(data_dir, opts.store), engine=opts.engine, profile=opts.data_profile)
+    return e1_compute_all(load_titanic(data_dir, opts.store), profile=opts.data_profile)
+
+
+def build_joined(data_dir: Path, opts: RunOptions, deps: dict) -> dict:
+    # approx: recuentos y medias estimados (con intervalos) sobre la muestra de data/.sample
+    if opts.approx:
+        return e2_approx(data_dir, opts.approx_rows)
+    # incremental: solo las filas nuevas, fusionadas con el estado de data/.state
+    if opts.incremental:
+        return e2_incremental(data_dir, opts.data_profile)
+    # particionado: un worker por shard de PassengerId, parciales fusionados
+    if opts.partitions > 1:
+        return e2_partitioned(
+            data_dir, opts.partitions, opts.partition_by, opts.executor, opts.store, opts.data_profile
+        )
+    # streaming: join + agregaciones lazy con memoria acotada
+    if opts.engine == "streaming":
+        return e2_collect_all(data_dir, engine=opts.engine, store=opts.store, profile=opts.data_profile)
+    return e2_compute_all(data_dir, opts.store, opts.data_profile)
+
+
+def e1_node(
+    name: str, keys: tuple[str, ...], inputs: tuple[str, ...], compute: Callable[[Path, RunOptions, dict], dict]
+) -> Dataset:
+    # Nodo del Ejercicio 1: compute a partir de inputs en eager; sus keys de e1_all en una sola pasada
+    def build(data_dir: Path, opts: RunOptions, deps: dict) -> dict:
+        if e1_single_pass(opts):
+            return {k: deps["e1_all"][k] for k in keys if k in deps["e1_all"]}
+        return compute(data_dir, opts, deps)
+
+    return Dataset(
+        name, E1_FILES, build, e1_variant,
+        inputs=lambda opts: ("e1_all",) if e1_single_pass(opts) else inputs,
+    )
+
+
+def e2_node(
+    name: str, keys: tuple[str, ...], inputs: tuple[str, ...], compute: Callable[[Path, RunOptions, dict], dict]
+) -> Dataset:
+    # Nodo del Ejercicio 2: compute a partir de inputs en eager; sus keys de e2_all en una sola pasada
+    def build(data_dir: Path, opts: RunOptions, deps: dict) -> dict:
+        if e2_single_pass(opts):
+            return {k: deps["e2_all"][k] for k in keys if k in deps["e2_all"]}
+        return compute(data_dir, opts, deps)
+
+    return Dataset(
+        name, E2_FILES, build, e2_variant,
+        inputs=lambda opts: ("e2_all",) if e2_single_pass(opts) else inputs,
+    )
+
+
+def loaded(loader: Callable[[Path, bool], pl.DataFrame]) -> Callable[[Path, RunOptions, dict], dict]:
+    # Nodo de carga: el CSV (o el almacén Arrow con --store) en memoria
+    def build(data_dir: Path, opts: RunOptions, deps: dict) -> dict:
+        return {"df": loader(data_dir, opts.store)}
+
+    return build
+
+
+def on_frame(
+    source: str, **tables: Callable[[pl.DataFrame], object]
+) -> Callable[[Path, RunOptions, dict], dict]:
+    # compute de un nodo: cada tabla es una función del frame "df" del nodo source
+    def compute(data_dir: Path, opts: RunOptions, deps: dict) -> dict:
+        df = deps[source]["df"]
+        return {key: fn(df) for key, fn in tables.items()}
+
+    return compute
+
+
+def joined(data_dir: Path, opts: RunOptions, deps: dict) -> dict:
+    # merge join con los índices de data/.index; la calidad del join sale del mismo merge
+    df, quality = join_indexed(data_dir, deps["pasajeros"]["df"], deps["supervivientes"]["df"])
+    return {"df": add_puerto(df), "join_quality": quality}
+
+
+def joined_profile(data_dir: Path, opts: RunOptions, deps: dict) -> dict:
+    df_p, df_s = deps["pasajeros"]["df"], deps["supervivientes"]["df"]
+    return {"profile": e2_profile(profile_data(df_p), profile_data(df_s), df_p.schema, df_s.schema)}
+
+
+E1_COUNT_KEYS = (
+    "by_class", "by_sex", "sex_by_class", "survived_pivot", "survived",
+    "total_not_survived", "not_survived_by_class_sex", "survived_not_pivot",
+)
+E2_COUNT_KEYS = ("by_puerto", "by_sex", "deaths_by_age_range", "deaths_by_class_gender", "by_puerto_survived")
+
+
+DATASETS: dict[str, Dataset] = {
+    node.name: node
+    for node in (
+        # Ejercicio 1: titanic -> df_age_clean -> e1_age_bins; titanic -> e1_cube -> e1_counts; ...
+        Dataset("e1_all", E1_FILES, build_titanic, e1_variant),
+        Dataset("titanic", E1_FILES, loaded(load_titanic), e1_variant),
+        e1_node("df_age_clean", (), ("titanic",), on_frame("titanic", df=e1_dropna_age)),
+        e1_node("e1_head", ("head", "columns"), ("titanic",), on_frame("titanic", head=e1_head, columns=e1_columns)),
+        e1_node("e1_info", ("info",), ("titanic",), on_frame("titanic", info=e1_info)),
+        e1_node("e1_profile", ("profile",), ("titanic",), on_frame("titanic", profile=e1_profile)),
+        e1_node("e1_cube", (), ("titanic",), on_frame("titanic", cube=lambda df: e1_cube(df).frame)),
+        e1_node("e1_counts", E1_COUNT_KEYS, ("e1_cube",), lambda data_dir, opts, deps: e1_from_cube(deps["e1_cube"]["cube"])),
+        e1_node("e1_dropna", ("dropna_summary",), ("titanic",), on_frame("titanic", dropna_summary=e1_dropna_age_summary)),
+        e1_node(
+            "e1_age_bins", ("age_bins",), ("df_age_clean",),
+            on_frame("df_age_clean", age_bins=lambda df: age_bins(df, engine="in-memory")),
+        ),
+        e1_node("e1_minor16", ("minor16_counts",), ("titanic",), on_frame("titanic", minor16_counts=e1_minor16_counts)),
+        # Ejercicio 2: pasajeros + supervivientes -> df_joined -> e2_cube -> e2_counts; ...
+        Dataset("e2_all", E2_FILES, build_joined, e2_variant),
+        Dataset("pasajeros", E2_FILES, loaded(load_pasajeros), e2_variant),
+        Dataset("supervivientes", E2_FILES, loaded(load_supervivientes), e2_variant),
+        e2_node("df_joined", ("join_quality",), ("pasajeros", "supervivientes"), joined),
+        e2_node("e2_profile", ("profile",), ("pasajeros", "supervivientes"), joined_profile),
+        e2_node(
+            "e2_sample", ("puerto_sample",), ("df_joined",),
+            on_frame("df_joined", puerto_sample=lambda df: df.select(["PassengerId", "Embarked", "puerto"]).head(20)),
+        ),
+        e2_node("e2_mean_age", ("mean_age",), ("df_joined",), on_frame("df_joined", mean_age=mean_age_by_sex_survived)),
+        e2_node("e2_cube", (), ("df_joined",), on_frame("df_joined", cube=lambda df: e2_cube(df).frame)),
+        e2_node("e2_counts", E2_COUNT_KEYS, ("e2_cube",), lambda data_dir, opts, deps: e2_from_cube(deps["e2_cube"]["cube"])),
+    )
+}
+
+
+# --approx: solo los recuentos y medias que se pueden estimar sobre la muestra
+def exact_only(opts: RunOptions) -> bool:
+    return not opts.approx
+
+
+def approx_only(opts: RunOptions) -> bool:
+    return opts.approx
+
+
+# --data-profile: perfil completo (HLL, cuartiles, top-k), opcional por su coste
+def profile_only(opts: RunOptions) -> bool:
+    return opts.data_profile and not opts.approx
+
+
+GROUPS: dict[str, str] = {
+    "ejercicio1": "## Ejercicio 1 — Titanic\n",
+    "ejercicio2": "\n## Ejercicio 2 — Pasajeros + Supervivientes (inner join)\n",
+}
+
+
+# =========================================================
+# Ejercicio 1 — Titanic
+# =========================================================
+
+E1_STEPS: list[Step] = [
+    Step(
+        "ejercicio1", "e1_profile", "e1_00_profile.csv", "profile",
+        "(0) Perfil de calidad (nulos, distintos, min/max, cuartiles, top-k)",
+        (e1_profile, profile_queries, profile_table),
+        when=profile_only,
+    ),
+    Step("ejercicio1", "e1_head", "e1_01_head.csv", "head", "(1) Primeras 5 filas", (e1_head,)),
+    Step("ejercicio1", "e1_head", "e1_02_columns.txt", "columns", "(2) Columnas", (e1_columns,)),
+    Step(
+        "ejercicio1", "e1_info", "e1_03_info.csv", "info", "(3) Info (dtype + nulos)",
+        (e1_info, info_from_nulls),
+        when=exact_only,
+    ),
+    Step("ejercicio1", "e1_counts", "e1_04_by_class.csv", "by_class", "(4) Nº pasajeros por clase", (e1_passengers_by_class,)),
+    Step(
+        "ejercicio1", "e1_counts", "e1_05_passengers_by_class.png", "by_class", "(5) Plot pasajeros por clase",
+        (e1_passengers_by_class,),
+        plot=bar_counts,
+        plot_kwargs=(("x_col", "Pclass"), ("y_col", "count"), ("title", "Recuento de pasajeros por clase")),
+    ),
+    Step("ejercicio1", "e1_counts", "e1_06_by_sex.csv", "by_sex", "(6) Nº pasajeros por sexo", (e1_passengers_by_sex,)),
+    Step(
+        "ejercicio1", "e1_counts", "e1_07_passengers_by_sex.png", "by_sex", "(7) Plot pasajeros por sexo",
+        (e1_passengers_by_sex,),
+        plot=bar_counts,
+        plot_kwargs=(("x_col", "Sex"), ("y_col", "count"), ("title", "Recuento de pasajeros por sexo")),
+    ),
+    Step("ejercicio1", "e1_counts", "e1_08_sex_by_class.csv", "sex_by_class", "(8) Nº hombres/mujeres por clase", (e1_sex_by_class,)),
+    Step(
+        "ejercicio1", "e1_counts", "e1_09_sex_by_class.png", "sex_by_class", "(9) Plot por sexo y clase",
+        (e1_sex_by_class,),
+        plot=bar_counts_hue,
+        plot_kwargs=(("x_col", "Pclass"), ("hue_col", "Sex"), ("y_col", "count"), ("title", "Recuento por clase y sexo")),
+    ),
+    Step(
+        "ejercicio1", "e1_counts", "e1_10_survived_by_class_sex_pivot.csv", "survived_pivot",
+        "(10) Supervivientes por clase/sexo (pivot + total)", (e1_survived_pivot_by_class_sex,),
+    ),
+    Step(
+        "ejercicio1", "e1_counts", "e1_11_survived_vs_not.png", "survived", "(11) Plot supervivencia (Sí/No)",
+        (e1_survived_counts,),
+        plot=survived_vs_not,
+    ),
+    Step(
+        "ejercicio1", "e1_counts", "e1_12_total_not_survived.csv", "total_not_survived",
+        "(12) Total no sobrevivieron", (e1_total_not_survived,),
+    ),
+    Step(
+        "ejercicio1", "e1_counts", "e1_13_not_surv_by_class_sex.csv", "not_survived_by_class_sex",
+        "(13) No sobrevivieron por clase/sexo", (e1_not_survived_by_class_sex,),
+    ),
+    Step(
+        "ejercicio1", "e1_counts", "e1_14_survived_not_by_class_sex_pivot.csv", "survived_not_pivot",
+        "(14) Supervivieron y no por clase/sexo (pivot)", (e1_survived_not_pivot_by_class_sex,),
+    ),
+    Step(
+        "ejercicio1", "e1_dropna", "e1_15_dropna_age_summary.csv", "dropna_summary",
+        "(15) Eliminación Age nula (resumen)", (e1_dropna_age_summary,),
+        when=exact_only,
+    ),
+    # (16) y (17): histogramas a partir de las edades en rejilla fija (compartidas);
+    # KDE exact: suma sobre las celdas; binned: binning lineal + FFT
+    Step(
+        "ejercicio1", "e1_age_bins", "e1_16_age_hist_kde.png", "age_bins", "(16) Distribución edad (hist + densidad)",
+        (age_bins_query, age_histogram, weighted_kde),
+        plot=age_hist_with_kde,
+        when=lambda opts: opts.kde != "binned" and not opts.approx,
+    ),
+    Step(
+        "ejercicio1", "e1_age_bins", "e1_16_age_hist_kde.png", "age_bins", "(16) Distribución edad (hist + densidad)",
+        (age_bins_query, age_histogram, binned_kde),
+        plot=age_hist_with_kde_binned,
+        when=lambda opts: opts.kde == "binned" and not opts.approx,
+    ),
+    Step(
+        "ejercicio1", "e1_age_bins", "e1_17_age_hist_alt.png", "age_bins", "(17) Histograma edad (alt)",
+        (age_bins_query, age_histogram), plot=age_hist_alt, when=exact_only,
+    ),
+    Step(
+        "ejercicio1", "e1_minor16", "e1_18_minor16_counts.csv", "minor16_counts",
+        "(18) Menores de 16 (recuento)", (e1_minor16_counts,), when=exact_only,
+    ),
+    Step(
+        "ejercicio1", "e1_all", "e1_19_approx_intervals.csv", "approx",
+        "(--approx) Recuentos estimados con intervalo de confianza al 95%",
+        (e1_approx, estimate_counts, interval_table), when=approx_only,
+    ),
+]
+
+
+# =========================================================
+# Ejercicio 2 — Pasajeros + Supervivientes
+# =========================================================
+
+E2_STEPS: list[Step] = [
+    Step(
+        "ejercicio2", "e2_profile", "e2_00_profile.csv", "profile",
+        "Perfil de calidad de pasajeros.csv y supervivientes.csv",
+        (e2_profile, profile_queries, profile_table),
+        when=profile_only,
+    ),
+    Step(
+        "ejercicio2", "df_joined", "e2_00_join_quality.csv", "join_quality", "Join quality",
+        (join_indexed, join_quality, join_quality_from_profiles, key_queries),
+        when=exact_only,
+    ),
+    Step(
+        "ejercicio2", "e2_sample", "e2_01_puerto_sample.csv", "puerto_sample",
+        "(1) Columna puerto (sample)", (build_df, add_puerto), when=exact_only,
+    ),
+    Step(
+        "ejercicio2", "e2_counts", "e2_02_passengers_by_puerto.csv", "by_puerto",
+        "(2) Nº pasajeros por puerto", (build_df, add_puerto, passengers_by_puerto),
+    ),
+    Step(
+        "ejercicio2", "e2_counts", "e2_03_passengers_by_sex.csv", "by_sex",
+        "(3) Nº hombres y mujeres", (build_df, e2_passengers_by_sex),
+    ),
+    Step(
+        "ejercicio2", "e2_mean_age", "e2_04_mean_age_by_sex_survived.csv", "mean_age",
+        "(4) Edad media por sexo y supervivencia", (build_df, mean_age_by_sex_survived),
+    ),
+    Step(
+        "ejercicio2", "e2_counts", "e2_05_deaths_by_age_range.csv", "deaths_by_age_range",
+        "(5) Muertos por rango de edad", (build_df, deaths_by_age_range),
+    ),
+    Step(
+        "ejercicio2", "e2_counts", "e2_06_deaths_by_class_gender.csv", "deaths_by_class_gender",
+        "(6) Muertos por clase y género", (build_df, deaths_by_class_gender),
+    ),
+    Step(
+        "ejercicio2", "e2_counts", "e2_07_survived_and_deaths_by_puerto.csv", "by_puerto_survived",
+        "(7) Muertos y supervivientes por puerto", (build_df, add_puerto, survived_and_deaths_by_puerto),
+    ),
+    Step(
+        "ejercicio2", "e2_all", "e2_08_approx_intervals.csv", "approx",
+        "(--approx) Recuentos y edad media estimados con intervalo de confianza al 95%",
+        (e2_approx, estimate_counts, estimate_mean, interval_table), when=approx_only,
+    ),
+]
+
+
+STEPS: list[Step] = E1_STEPS + E2_STEPS
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import polars as pl
+
+from src.io_utils import file_digest
+from src.schemas import SCHEMAS
+
+
+# =========================================================
+# Almacén Arrow IPC de los CSV de entrada
+# =========================================================
+#
+# Cada CSV de data/ se convierte una vez a data/.store/<nombre>.arrow
+# (IPC sin comprimir, con el esquema explícito de src/schemas.py) y se
+# guarda al lado un .json con mtime, tamaño y sha256 del CSV. Las
+# siguientes ejecuciones mapean el .arrow en memoria (sin copia ni
+# parseo) y solo se vuelve a convertir si el CSV ha cambiado.
+
+STORE_DIR = ".store"
+
+
+def store_paths(data_dir: Path, name: str) -> tuple[Path, Path]:
+    stem = Path(name).stem
+    store = data_dir / STORE_DIR
+    return store / f"{stem}.arrow", store / f"{stem}.json"
+
+
+def is_fresh(csv_path: Path, arrow_path: Path, meta_path: Path, schema_repr: str) -> bool:
+    if not arrow_path.exists() or not meta_path.exists():
+        return False
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    if meta.get("schema") != schema_repr:
+        return False
+
+    st = csv_path.stat()
+    if meta["csv_mtime_ns"] == st.st_mtime_ns and meta["csv_size"] == st.st_size:
+        return True
+
+    # mtime distinto (p.ej. checkout nuevo): si el contenido es el mismo no se reconvierte
+    if meta["csv_sha256"] == file_digest(csv_path):
+        meta["csv_mtime_ns"] = st.st_mtime_ns
+        meta_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        return True
+    return False
+
+
+def ingest(data_dir: Path, name: str) -> Path:
+    """
+    Devuelve la ruta del .arrow de data_dir/name, convirtiendo el CSV
+    (en streaming, por lotes) solo si no existe o está desactualizado.
+    """
+    csv_path = data_dir / name
+    arrow_path, meta_path = store_paths(data_dir, name)
+    schema = SCHEMAS[name]
+    schema_repr = repr(schema)
+
+    if is_fresh(csv_path, arrow_path, meta_path, schema_repr):
+        return arrow_path
+
+    arrow_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = arrow_path.with_suffix(".arrow.tmp")
+    pl.scan_csv(csv_path, schema=schema).sink_ipc(tmp, compression="uncompressed")
+    os.replace(tmp, arrow_path)
+    write_meta(csv_path, meta_path, schema_repr)
+    return arrow_path
+
+
+def write_meta(csv_path: Path, meta_path: Path, schema_repr: str) -> None:
+    # Huella del CSV del que se ha derivado un fichero (lo que comprueba is_fresh)
+    st = csv_path.stat()
+    meta = {
+        "csv": csv_path.name,
+        "csv_mtime_ns": st.st_mtime_ns,
+        "csv_size": st.st_size,
+        "csv_sha256": file_digest(csv_path),
+        "schema": schema_repr,
+    }
+    meta_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+
+def load_store(data_dir: Path, name: str) -> pl.DataFrame:
+    # read_ipc mapea el fichero en memoria por defecto: los buffers Arrow se leen sin copia
+    return pl.read_ipc(ingest(data_dir, name))
+
+
+def scan_store(data_dir: Path, name: str) -> pl.LazyFrame:
+    return pl.scan_ipc(ingest(data_dir, name))
+
+
+def main() -> int:
+    # Paso de ingesta explícito: python -m src.store --data-dir data
+    parser = argparse.ArgumentParser(description="Convierte data/*.csv a Arrow IPC (data/.store).")
+    parser.add_argument("--data-dir", type=str, default="data", help="Carpeta donde están los CSV.")
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    for name in SCHEMAS:
+        if (data_dir / name).exists():
+            print(f"{name} -> {ingest(data_dir, name).as_posix()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
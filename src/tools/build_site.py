@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from src.tools.csv_pages import csv_to_pages
+from src.tools.csv_to_html import csv_to_html
+from src.tools.make_figures_index import make_figures_index
+from src.tools.make_tables_index import make_tables_index
+
+
+# =========================================================
+# Web de GitHub Pages en un solo proceso
+# =========================================================
+#
+# python -m src.tools.build_site --out site
+# Copia la portada, los outputs y los informes, genera la vista previa
+# HTML de cada CSV (en paralelo) y los índices de figuras y tablas.
+# Sustituye al bucle de shell que lanzaba un intérprete por CSV.
+# --preview auto: las tablas de hasta --max-rows filas se incrustan en
+# la página (csv_to_html); las más grandes se paginan en JSON con una
+# tabla virtualizada (csv_pages). static / paged fuerzan uno de los dos.
+
+REPORTS = ("INFORME_FINAL.md", "Practica_Titanic_Informe_Final.txt")
+
+
+def copy_inputs(root: Path, outputs: Path, site: Path) -> None:
+    # Misma estructura que antes: site/index.html, site/figures, site/tables e informes
+    for sub in ("figures", "tables"):
+        src = outputs / sub
+        if src.is_dir():
+            shutil.copytree(src, site / sub, dirs_exist_ok=True)
+    shutil.copyfile(root / "docs" / "index.html", site / "index.html")
+    for name in REPORTS:
+        if (root / name).exists():
+            shutil.copyfile(root / name, site / name)
+
+
+def _fits(csv_path: Path, max_rows: int) -> bool:
+    # ¿Cabe entera en la vista estática? (cabecera + datos <= max_rows)
+    with csv_path.open("r", encoding="utf-8", newline="") as fp:
+        return sum(1 for _ in islice(csv.reader(fp), max_rows + 1)) <= max_rows
+
+
+def render_preview(csv_path: Path, preview: str, max_rows: int, max_cols: int, page_rows: int) -> None:
+    html_path = csv_path.with_suffix(".html")
+    if preview == "static" or (preview == "auto" and _fits(csv_path, max_rows)):
+        csv_to_html(csv_path, html_path, max_rows=max_rows, max_cols=max_cols)
+    else:
+        csv_to_pages(csv_path, html_path, page_rows=page_rows, max_cols=max_cols)
+
+
+def render_previews(
+    tables_dir: Path,
+    max_rows: int,
+    max_cols: int,
+    jobs: int,
+    preview: str = "auto",
+    page_rows: int = 500,
+) -> int:
+    csvs = sorted(tables_dir.glob("*.csv"))
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = [pool.submit(render_preview, p, preview, max_rows, max_cols, page_rows) for p in csvs]
+        for fut in futures:
+            fut.result()
+    return len(csvs)
+
+
+def build_site(
+    site: Path,
+    root: Path,
+    outputs: Path,
+    max_rows: int = 200,
+    max_cols: int = 50,
+    jobs: int = 1,
+    preview: str = "auto",
+    page_rows: int = 500,
+) -> int:
+    if site.exists():
+        shutil.rmtree(site)
+    (site / "figures").mkdir(parents=True)
+    (site / "tables").mkdir(parents=True)
+
+    copy_inputs(root, outputs, site)
+    n = render_previews(site / "tables", max_rows, max_cols, jobs, preview, page_rows)
+    make_figures_index(site / "figures", site / "figures" / "index.html")
+    make_tables_index(site / "tables", site / "tables" / "index.html")
+    return n
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Genera la carpeta de GitHub Pages (site/).")
+    parser.add_argument("--out", type=str, default="site", help="Carpeta de salida (se vacía antes).")
+    parser.add_argument("--outputs", type=str, default="outputs", help="Carpeta con figures/ y tables/.")
+    parser.add_argument("--max-rows", type=int, default=int(os.environ.get("MAX_ROWS", "200")))
+    parser.add_argument("--max-cols", type=int, default=int(os.environ.get("MAX_COLS", "50")))
+    parser.add_argument(
+        "--preview",
+        choices=["auto", "static", "paged"],
+        default="auto",
+        help="Vista de los CSV: incrustada (static), paginada y virtualizada (paged) o según su tamaño (auto).",
+    )
+    parser.add_argument("--page-rows", type=int, default=500, help="Filas por página JSON en la vista paginada.")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Vistas previas en paralelo.")
+    args = parser.parse_args()
+
+    root = Path.cwd()
+    n = build_site(
+        Path(args.out),
+        root,
+        Path(args.outputs),
+        args.max_rows,
+        args.max_cols,
+        args.jobs,
+        args.preview,
+        args.page_rows,
+    )
+    print(f"OK: {args.out}/ generado ({n} vistas previas).")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
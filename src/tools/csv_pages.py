@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import csv
+import html
+import json
+import os
+from pathlib import Path
+
+
+# =========================================================
+# Vista previa paginada de CSV grandes
+# =========================================================
+#
+# csv_to_html incrusta todas las filas en la página, así que solo vale
+# para las primeras 200. Para tablas grandes, csv_to_pages recorre el CSV
+# una vez y escribe junto al HTML una carpeta <nombre>.pages/ con:
+#   - meta.json: columnas, nº de filas, filas por página y estadísticas
+#     por columna (no vacíos, vacíos, min/max/media si es numérica,
+#     nº de valores distintos y el más frecuente si es texto)
+#   - 00000.json, 00001.json...: páginas de page_rows filas (listas JSON)
+# El HTML es una tabla virtualizada: solo pinta las filas visibles y pide
+# al servidor las páginas que necesita a medida que se hace scroll.
+
+PAGES_SUFFIX = ".pages"
+MAX_DISTINCT = 10_000
+
+
+class ColumnStats:
+    """Estadísticas de una columna calculadas en la misma pasada que las páginas."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.empty = 0
+        self.numeric = True
+        self.min: float | None = None
+        self.max: float | None = None
+        self.total = 0.0
+        self.values: dict[str, int] = {}
+        self.overflow = False
+
+    def add(self, cell: str) -> None:
+        if cell == "":
+            self.empty += 1
+            return
+        self.count += 1
+        if not self.overflow:
+            self.values[cell] = self.values.get(cell, 0) + 1
+            self.overflow = len(self.values) > MAX_DISTINCT
+        if self.numeric:
+            try:
+                x = float(cell)
+            except ValueError:
+                self.numeric = False
+                return
+            self.min = x if self.min is None else min(self.min, x)
+            self.max = x if self.max is None else max(self.max, x)
+            self.total += x
+
+    def to_dict(self) -> dict:
+        out: dict = {"count": self.count, "empty": self.empty}
+        if self.numeric and self.count:
+            out |= {"min": self.min, "max": self.max, "mean": self.total / self.count}
+        else:
+            out["distinct"] = f">{MAX_DISTINCT}" if self.overflow else len(self.values)
+            if self.values and not self.overflow:
+                top, n = max(self.values.items(), key=lambda kv: kv[1])
+                out["top"] = f"{top} ({n})"
+        return out
+
+
+def csv_to_pages(
+    csv_path: Path,
+    html_path: Path,
+    page_rows: int = 500,
+    max_cols: int = 50,
+) -> int:
+    """Escribe la vista paginada de csv_path. Devuelve el nº de filas (sin cabecera)."""
+    pages_dir = html_path.with_suffix(PAGES_SUFFIX)
+    pages_dir.mkdir(parents=True, exist_ok=True)
+    for old in pages_dir.glob("*.json"):
+        old.unlink()
+
+    with csv_path.open("r", encoding="utf-8", newline="") as fp:
+        reader = csv.reader(fp)
+        columns = next(reader, [])[:max_cols]
+        stats = [ColumnStats() for _ in columns]
+        page: list[list[str]] = []
+        rows = pages = 0
+        for r in reader:
+            r = r[:max_cols]
+            for st, cell in zip(stats, r):
+                st.add(cell)
+            page.append(r)
+            rows += 1
+            if len(page) == page_rows:
+                _write_page(pages_dir, pages, page)
+                pages, page = pages + 1, []
+        if page:
+            _write_page(pages_dir, pages, page)
+            pages += 1
+
+    meta = {
+        "name": csv_path.name,
+        "columns": columns,
+        "rows": rows,
+        "page_rows": page_rows,
+        "pages": pages,
+        "stats": {c: st.to_dict() for c, st in zip(columns, stats)},
+    }
+    (pages_dir / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    html_path.write_text(_page_html(csv_path.name, pages_dir.name), encoding="utf-8")
+    return rows
+
+
+def _write_page(pages_dir: Path, index: int, rows: list[list[str]]) -> None:
+    text = json.dumps(rows, ensure_ascii=False, separators=(",", ":"))
+    (pages_dir / f"{index:05d}.json").write_text(text, encoding="utf-8")
+
+
+_TEMPLATE = """<!doctype html>
+<html lang="es">
+<head>
+  <meta charset="utf-8" />
+  <meta name="viewport" content="width=device-width,initial-scale=1" />
+  <title>__TITLE__</title>
+  <style>
+    body{font-family:system-ui,Segoe UI,Arial,sans-serif;max-width:1100px;margin:40px auto;padding:0 16px;line-height:1.5}
+    a{color:#0969da;text-decoration:none} a:hover{text-decoration:underline}
+    table{border-collapse:collapse;width:100%;font-size:14px}
+    th,td{border:1px solid #e5e7eb;padding:6px 8px;vertical-align:top;white-space:nowrap}
+    th{background:#f6f8fa;position:sticky;top:0}
+    .topbar{display:flex;gap:12px;align-items:center;margin-bottom:12px;flex-wrap:wrap}
+    .hint{color:#555}
+    #viewport{height:70vh;overflow:auto;border:1px solid #e5e7eb}
+    #viewport td{line-height:21px;height:21px}
+    #stats td{font-size:12px}
+  </style>
+</head>
+<body>
+  <div class="topbar">
+    <a href="./index.html">← Volver a Tablas</a>
+    <a href="./__TITLE__" download>Descargar CSV</a>
+    <span class="hint" id="hint">Cargando…</span>
+  </div>
+  <h1>__TITLE__</h1>
+  <details><summary>Estadísticas por columna</summary><table id="stats"></table></details>
+  <div id="viewport"><table><thead id="head"></thead><tbody id="body"></tbody></table></div>
+  <script>
+  (async () => {
+    const base = "./__PAGES__/";
+    const ROW = 34, EXTRA = 20;  // alto de fila: 21 + padding + borde
+    const meta = await (await fetch(base + "meta.json")).json();
+    const esc = s => String(s).replace(/[&<>"]/g, c => ({"&":"&amp;","<":"&lt;",">":"&gt;","\\"":"&quot;"}[c]));
+    const fmt = v => typeof v === "number" ? (Number.isInteger(v) ? v : v.toPrecision(6)) : v;
+    document.getElementById("hint").textContent =
+      meta.rows.toLocaleString("es") + " filas · páginas de " + meta.page_rows;
+    const keys = ["count", "empty", "min", "max", "mean", "distinct", "top"];
+    document.getElementById("stats").innerHTML =
+      "<tr><th></th>" + keys.map(k => "<th>" + k + "</th>").join("") + "</tr>" +
+      meta.columns.map(c => "<tr><th>" + esc(c) + "</th>" +
+        keys.map(k => "<td>" + (k in meta.stats[c] ? esc(fmt(meta.stats[c][k])) : "") + "</td>").join("") + "</tr>").join("");
+    document.getElementById("head").innerHTML =
+      "<tr><th>#</th>" + meta.columns.map(c => "<th>" + esc(c) + "</th>").join("") + "</tr>";
+
+    // Caché de páginas: cada página se pide una sola vez
+    const pages = new Map();
+    const page = i => {
+      if (!pages.has(i)) {
+        const name = String(i).padStart(5, "0") + ".json";
+        pages.set(i, fetch(base + name).then(r => r.json()));
+      }
+      return pages.get(i);
+    };
+
+    // Solo se pintan las filas visibles (+ margen); el resto es un hueco de altura fija
+    const view = document.getElementById("viewport"), body = document.getElementById("body");
+    const ncols = meta.columns.length + 1;
+    let ticket = 0;
+    async function render() {
+      const mine = ++ticket;
+      const first = Math.max(0, Math.floor(view.scrollTop / ROW) - EXTRA);
+      const last = Math.min(meta.rows, Math.ceil((view.scrollTop + view.clientHeight) / ROW) + EXTRA);
+      const p0 = Math.floor(first / meta.page_rows), p1 = Math.floor(Math.max(first, last - 1) / meta.page_rows);
+      const loaded = [];
+      for (let p = p0; p <= p1 && p < meta.pages; p++) loaded.push(await page(p));
+      if (mine !== ticket) return;
+      const spacer = h => '<tr style="height:' + h + 'px"><td colspan="' + ncols + '" style="border:0;padding:0"></td></tr>';
+      let out = spacer(first * ROW);
+      for (let i = first; i < last; i++) {
+        const row = loaded[Math.floor(i / meta.page_rows) - p0][i % meta.page_rows];
+        out += '<tr style="height:' + ROW + 'px"><td class="hint">' + (i + 1) + "</td>" +
+          row.map(c => "<td>" + esc(c) + "</td>").join("") + "</tr>";
+      }
+      body.innerHTML = out + spacer((meta.rows - last) * ROW);
+    }
+    view.addEventListener("scroll", () => requestAnimationFrame(render));
+    render();
+  })();
+  </script>
+</body>
+</html>
+"""
+
+
+def _page_html(title: str, pages_name: str) -> str:
+    return _TEMPLATE.replace("__TITLE__", html.escape(title)).replace("__PAGES__", html.escape(pages_name))
+
+
+def main() -> int:
+    csv_path = Path(os.environ["CSV_PATH"])
+    html_path = Path(os.environ["HTML_PATH"])
+    page_rows = int(os.environ.get("PAGE_ROWS", "500"))
+    max_cols = int(os.environ.get("MAX_COLS", "50"))
+    csv_to_pages(csv_path, html_path, page_rows=page_rows, max_cols=max_cols)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,16 +3,14 @@ from __future__ import annotations
 import csv
 import html
 import os
+from itertools import islice
 from pathlib import Path
 
 
 def csv_to_html(csv_path: Path, html_path: Path, max_rows: int = 200, max_cols: int = 50) -> None:
+    # Solo se leen las primeras max_rows filas (la cabecera incluida), no el fichero entero
     with csv_path.open("r", encoding="utf-8", newline="") as fp:
-        reader = csv.reader(fp)
-        rows = list(reader)
-
-    rows = rows[:max_rows]
-    rows = [r[:max_cols] for r in rows]
+        rows = [r[:max_cols] for r in islice(csv.reader(fp), max_rows)]
 
     def td(cell: str, th: bool = False) -> str:
         tag = "th" if th else "td"
@@ -6,12 +6,9 @@ import os
 from pathlib import Path
 
 
-def main() -> int:
-    figures_dir = Path(os.environ.get("FIGURES_DIR", "site/figures"))
-    out_path = Path(os.environ.get("OUT_PATH", str(figures_dir / "index.html")))
-
+def make_figures_index(figures_dir: Path, out_path: Path) -> None:
     figures_dir.mkdir(parents=True, exist_ok=True)
-    files = sorted(glob.glob(str(figures_dir / "*.png")))
+    files = sorted(glob.glob(str(figures_dir / "*.png")) + glob.glob(str(figures_dir / "*.svg")))
 
     items = "\n".join(
         f'<li><a href="./{html.escape(Path(p).name)}">{html.escape(Path(p).name)}</a></li>'
@@ -27,7 +24,7 @@ li{{margin:6px 0}}
 a{{color:#0969da;text-decoration:none}} a:hover{{text-decoration:underline}}
 </style></head>
 <body>
-<h1>Figuras (PNG)</h1>
+<h1>Figuras (PNG/SVG)</h1>
 <p><a href="../index.html">← Volver</a></p>
 <ul>
 {items}
@@ -35,6 +32,12 @@ a{{color:#0969da;text-decoration:none}} a:hover{{text-decoration:underline}}
 </body></html>
 """
     out_path.write_text(page, encoding="utf-8")
+
+
+def main() -> int:
+    figures_dir = Path(os.environ.get("FIGURES_DIR", "site/figures"))
+    out_path = Path(os.environ.get("OUT_PATH", str(figures_dir / "index.html")))
+    make_figures_index(figures_dir, out_path)
     return 0
 
 
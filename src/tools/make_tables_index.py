@@ -6,10 +6,7 @@ import os
 from pathlib import Path
 
 
-def main() -> int:
-    tables_dir = Path(os.environ.get("TABLES_DIR", "site/tables"))
-    out_path = Path(os.environ.get("OUT_PATH", str(tables_dir / "index.html")))
-
+def make_tables_index(tables_dir: Path, out_path: Path) -> None:
     tables_dir.mkdir(parents=True, exist_ok=True)
     files = sorted(glob.glob(str(tables_dir / "*")))
 
@@ -18,8 +15,8 @@ def main() -> int:
         bn = Path(p).name
         if bn == "index.html":
             continue
-        if bn.endswith(".html"):
-            # previews individuales no se listan
+        if bn.endswith(".html") or bn.endswith(".pages"):
+            # previews individuales (y sus páginas JSON) no se listan
             continue
         if bn.endswith(".csv"):
             view = bn[:-4] + ".html"
@@ -49,6 +46,12 @@ a{color:#0969da;text-decoration:none} a:hover{text-decoration:underline}
 </body></html>
 """
     out_path.write_text(page, encoding="utf-8")
+
+
+def main() -> int:
+    tables_dir = Path(os.environ.get("TABLES_DIR", "site/tables"))
+    out_path = Path(os.environ.get("OUT_PATH", str(tables_dir / "index.html")))
+    make_tables_index(tables_dir, out_path)
     return 0
 
 
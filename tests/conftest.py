@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from benchmarks.generate import generate
+
+
+# =========================================================
+# Datos de las pruebas
+# =========================================================
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+# Sintéticos: pocas filas (rápido) pero con nulos y PassengerId sin pareja
+SYNTHETIC_ROWS = 20_000
+
+
+@pytest.fixture(scope="session")
+def data_dir() -> Path:
+    return DATA_DIR
+
+
+@pytest.fixture(scope="session")
+def synthetic_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    return generate(tmp_path_factory.mktemp("synthetic"), SYNTHETIC_ROWS)
+
+
+@pytest.fixture(scope="session", params=["data", "synthetic"])
+def any_data_dir(request: pytest.FixtureRequest) -> Path:
+    # Las pruebas de equivalencia corren sobre los CSV reales y los sintéticos
+    return request.getfixturevalue(f"{request.param}_dir")
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import polars as pl
+import pytest
+
+from benchmarks.generate import generate
+from src.approx import (
+    check_intervals,
+    e1_approx,
+    e2_approx,
+    exact_values,
+    relative_error_bound,
+    sample_threshold,
+)
+
+
+# Población 10 veces mayor que la muestra: f ~ 0.1
+POPULATION_ROWS = 200_000
+SAMPLE_ROWS = 20_000
+
+
+@pytest.fixture(scope="module")
+def data_dir(tmp_path_factory: pytest.TempPathFactory):
+    return generate(tmp_path_factory.mktemp("approx"), POPULATION_ROWS)
+
+
+@pytest.fixture(scope="module")
+def results(data_dir) -> dict[str, dict]:
+    return {"e1": e1_approx(data_dir, SAMPLE_ROWS), "e2": e2_approx(data_dir, SAMPLE_ROWS)}
+
+
+@pytest.fixture(scope="module")
+def checked(data_dir, results) -> pl.DataFrame:
+    approx = pl.concat(
+        [res["approx"].with_columns(pl.format(f"{ex}:{{}}", "table").alias("table")) for ex, res in results.items()]
+    )
+    return check_intervals(approx, exact_values(data_dir))
+
+
+def test_sample_is_smaller_than_population():
+    assert sample_threshold(POPULATION_ROWS, SAMPLE_ROWS) is not None
+
+
+def test_exact_value_inside_interval(checked):
+    assert checked.filter(pl.col("estimate").is_null() | pl.col("exact").is_null()).is_empty()
+    assert checked.filter(~pl.col("covered")).is_empty()
+
+
+def test_count_error_below_bound(checked):
+    fraction = SAMPLE_ROWS / POPULATION_ROWS
+    counts = checked.filter(pl.col("table") != "e2:mean_age", pl.col("exact") > 0)
+    for table, group, exact, error in counts.select("table", "group", "exact", "rel_error").iter_rows():
+        assert error <= relative_error_bound(exact, fraction), f"{table} {group}"
+
+
+def test_strata_counts_are_exact(checked):
+    # Post-estratificación: los recuentos por (Pclass, Sex) salen exactos, con intervalo de ancho cero
+    strata = checked.filter(pl.col("table").is_in(["e1:by_class", "e1:by_sex", "e1:sex_by_class"]))
+    assert (strata["estimate"] == strata["exact"]).all()
+    assert (strata["ci_low"] == strata["ci_high"]).all()
+
+
+@pytest.mark.parametrize(
+    "ex, table",
+    [("e1", "survived"), ("e1", "not_survived_by_class_sex"), ("e2", "by_puerto"), ("e2", "deaths_by_class_gender"),
+     ("e2", "by_puerto_survived")],
+)
+def test_rollups_match_interval_estimates(results, ex, table):
+    # Rollup de las celdas sin redondear y un solo redondeo: el total de cada grupo es su fila approx
+    approx = results[ex]["approx"].filter(pl.col("table") == table)
+    expected = approx["estimate"].round().cast(pl.get_index_type()).sort()
+    assert results[ex][table]["count"].sort().to_list() == expected.to_list()
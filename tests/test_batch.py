@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from polars.testing import assert_frame_equal
+
+from src.batch import run_batch
+from src.pipeline import Pipeline, RunOptions
+
+
+# =========================================================
+# Resumen a partir de los agregados en caché
+# =========================================================
+
+def test_summary_from_cached_aggregates(data_dir, synthetic_dir, tmp_path, monkeypatch):
+    opts = RunOptions()
+    first = run_batch([data_dir, synthetic_dir], tmp_path, opts, executor="serial", figures=False)
+    for name in (data_dir.name, synthetic_dir.name):
+        assert (tmp_path / name / "outputs" / "aggregates" / "by_class.parquet").exists()
+
+    # Segunda pasada: todo son aciertos de caché y ningún dataset se vuelve a construir
+    def no_build(self, needed, data):
+        assert not needed, f"nodos reconstruidos con la caché caliente: {sorted(needed)}"
+        return {}, {}
+
+    monkeypatch.setattr(Pipeline, "_dataset_tasks", no_build)
+    second = run_batch([data_dir, synthetic_dir], tmp_path, opts, executor="serial", figures=False)
+    assert_frame_equal(second, first)
+
+
+def test_summary_approx_without_join_quality(synthetic_dir, tmp_path):
+    # --approx no calcula join_quality: sin columnas e2_* y sin construir el join
+    summary = run_batch([synthetic_dir], tmp_path, RunOptions(approx=True), executor="serial", figures=False)
+    assert not [c for c in summary.columns if c.startswith("e2_")]
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from src import ejercicio1 as e1
+from src import ejercicio2 as e2
+
+
+# =========================================================
+# Referencias: filter + group_by + len + sort sobre los datos
+# =========================================================
+
+def _grouped(df: pl.DataFrame, by: list[str], **where: object) -> pl.DataFrame:
+    for col, value in where.items():
+        df = df.filter(pl.col(col) == value)
+    if not by:
+        return df.select(pl.len().alias("count"))
+    return df.group_by(by).agg(pl.len().alias("count")).sort(by)
+
+
+E1_CASES = {
+    "e1_passengers_by_class": (["Pclass"], {}),
+    "e1_passengers_by_sex": (["Sex"], {}),
+    "e1_sex_by_class": (["Pclass", "Sex"], {}),
+    "e1_survived_counts": (["Survived"], {}),
+    "e1_not_survived_by_class_sex": (["Pclass", "Sex"], {"Survived": 0}),
+}
+
+E2_CASES = {
+    "passengers_by_puerto": (["puerto"], {}),
+    "passengers_by_sex": (["Sex"], {}),
+    "deaths_by_age_range": (["rango_edad"], {"Survived": 0}),
+    "deaths_by_class_gender": (["Pclass", "Sex"], {"Survived": 0}),
+    "survived_and_deaths_by_puerto": (["puerto", "Survived"], {}),
+}
+
+
+@pytest.fixture(scope="module")
+def titanic(any_data_dir) -> pl.DataFrame:
+    return e1.load_titanic(any_data_dir)
+
+
+@pytest.fixture(scope="module")
+def joined(any_data_dir) -> pl.DataFrame:
+    return e2.add_puerto(e2.build_df(any_data_dir))
+
+
+# =========================================================
+# Ejercicio 1
+# =========================================================
+
+@pytest.mark.parametrize("name", E1_CASES)
+def test_e1_rollup_matches_group_by(titanic, name):
+    by, where = E1_CASES[name]
+    assert_frame_equal(getattr(e1, name)(titanic), _grouped(titanic, by, **where))
+
+
+def test_e1_total_not_survived(titanic):
+    expected = _grouped(titanic, [], Survived=0).rename({"count": "not_survived_total"})
+    assert_frame_equal(e1.e1_total_not_survived(titanic), expected)
+
+
+def test_e1_survived_pivot(titanic):
+    counts = _grouped(titanic, ["Pclass", "Sex"], Survived=1)
+    assert_frame_equal(e1.e1_survived_pivot_by_class_sex(titanic), e1._survived_pivot(counts))
+
+
+def test_e1_survived_not_pivot(titanic):
+    base = _grouped(titanic, ["Pclass", "Sex", "Survived"]).with_columns(pl.col("Survived").cast(pl.Utf8))
+    assert_frame_equal(e1.e1_survived_not_pivot_by_class_sex(titanic), e1._survived_not_pivot(base))
+
+
+def test_e1_from_cube_matches_direct(titanic):
+    # Las tablas de e1_compute_all salen de un solo cubo: mismas que con los datos
+    tables = e1.e1_from_cube(e1.e1_cube(titanic).frame)
+    assert_frame_equal(tables["by_class"], _grouped(titanic, ["Pclass"]))
+    assert_frame_equal(tables["sex_by_class"], _grouped(titanic, ["Pclass", "Sex"]))
+
+
+# =========================================================
+# Ejercicio 2
+# =========================================================
+
+@pytest.mark.parametrize("name", E2_CASES)
+def test_e2_rollup_matches_group_by(joined, name):
+    by, where = E2_CASES[name]
+    expected = _grouped(e2.add_age_range(joined), by, **where)
+    assert_frame_equal(getattr(e2, name)(joined), expected)
+
+
+def test_e2_from_cube_matches_direct(joined):
+    tables = e2.e2_from_cube(e2.e2_cube(joined).frame)
+    ranged = e2.add_age_range(joined)
+    for key, name in [
+        ("by_puerto", "passengers_by_puerto"),
+        ("by_sex", "passengers_by_sex"),
+        ("deaths_by_age_range", "deaths_by_age_range"),
+        ("deaths_by_class_gender", "deaths_by_class_gender"),
+        ("by_puerto_survived", "survived_and_deaths_by_puerto"),
+    ]:
+        by, where = E2_CASES[name]
+        assert_frame_equal(tables[key], _grouped(ranged, by, **where))
+
+
+def test_e2_lazy_cube_matches_eager(any_data_dir):
+    # Cubo en streaming (e2_collect_all) == cubo en memoria (e2_compute_all)
+    eager = e2.e2_compute_all(any_data_dir)
+    lazy = e2.e2_collect_all(any_data_dir, engine="streaming")
+    for key in ["by_puerto", "by_sex", "deaths_by_age_range", "deaths_by_class_gender", "by_puerto_survived"]:
+        assert_frame_equal(lazy[key], eager[key])
+
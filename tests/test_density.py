@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import numpy as np
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from src.density import (
+    AGE_GRID_CELLS,
+    age_bin_values,
+    age_bins,
+    age_histogram,
+    binned_kde,
+    merge_age_bins,
+    weighted_kde,
+)
+from src.ejercicio1 import load_titanic
+
+
+def _ages(df: pl.DataFrame) -> np.ndarray:
+    return df["Age"].drop_nulls().cast(pl.Float64).to_numpy()
+
+
+@pytest.fixture(scope="module")
+def continuous() -> pl.DataFrame:
+    # Edades continuas: (casi) todas distintas, varias por celda
+    rng = np.random.default_rng(0)
+    return pl.DataFrame({"Age": rng.gamma(4.0, 7.5, size=200_000)})
+
+
+# =========================================================
+# Rejilla fija de edades
+# =========================================================
+
+@pytest.mark.parametrize("n_bins", [20, 30])
+def test_histogram_matches_numpy(any_data_dir, n_bins):
+    # Un valor por celda (edades enteras, x.5, 0.42...): mismos recuentos y bordes que np.histogram
+    ages = _ages(load_titanic(any_data_dir))
+    hist = age_histogram(age_bins(load_titanic(any_data_dir), engine="in-memory"), n_bins)
+    counts, edges = np.histogram(ages, bins=n_bins)
+    np.testing.assert_array_equal(hist["count"].to_numpy()[:-1], counts)
+    np.testing.assert_allclose(hist["edge"].to_numpy(), edges, rtol=0, atol=1e-12)
+
+
+def test_bins_bounded_for_continuous_ages(continuous):
+    bins = age_bins(continuous, engine="in-memory")
+    assert bins.height <= AGE_GRID_CELLS
+    assert bins["count"].sum() == continuous.height
+    assert bins["lo"].min() == continuous["Age"].min()
+    assert bins["hi"].max() == continuous["Age"].max()
+
+
+def test_merge_is_exact(continuous):
+    parts = [age_bins(continuous.slice(i, 50_000), engine="in-memory") for i in range(0, continuous.height, 50_000)]
+    assert_frame_equal(merge_age_bins(parts), age_bins(continuous, engine="in-memory"))
+
+
+def test_kde_from_bins_close_to_gaussian_kde(continuous):
+    from scipy.stats import gaussian_kde
+
+    ages = continuous["Age"].to_numpy()
+    bins = age_bins(continuous, engine="in-memory")
+    xs = np.linspace(ages.min(), ages.max(), 200)
+    dens = weighted_kde(age_bin_values(bins).to_numpy(), bins["count"].to_numpy(), xs)
+    # Cada edad se mueve como mucho media celda: error muy por debajo del 1 % del pico
+    assert np.max(np.abs(dens - gaussian_kde(ages)(xs))) < 1e-3 * dens.max()
+
+
+def test_binned_kde_close_to_gaussian_kde():
+    from scipy.stats import gaussian_kde
+
+    # Muestra fija de 5k edades y sus celdas (valor, recuento); xs = rejilla de la figura
+    rng = np.random.default_rng(0)
+    sample = pl.DataFrame({"Age": rng.gamma(4.0, 7.5, size=5_000)})
+    ages = sample["Age"].to_numpy()
+    bins = age_bins(sample, engine="in-memory")
+    xs = np.linspace(ages.min(), ages.max(), 200)
+    dens = binned_kde(age_bin_values(bins).to_numpy(), bins["count"].to_numpy(), xs)
+    # Binning lineal a 512 nodos + celdas de age_bins: error por debajo del 0.1 % del pico
+    exact = gaussian_kde(ages)(xs)
+    assert np.max(np.abs(dens - exact)) < 1e-3 * exact.max()
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import shutil
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from src.ejercicio1 import e1_compute_all, load_titanic
+from src.ejercicio2 import e2_compute_all, scan_pasajeros
+from src.partition import e1_partitioned, e2_partitioned, make_shards, scan_shard, shard_store
+
+
+def _assert_same(res: dict, ref: dict) -> None:
+    assert res.keys() == ref.keys()
+    for key, expected in ref.items():
+        if isinstance(expected, list):
+            assert res[key] == expected
+        else:
+            assert_frame_equal(res[key], expected)
+
+
+# =========================================================
+# Particionado == una sola ejecución
+# =========================================================
+
+@pytest.mark.parametrize("by", ["hash", "range"])
+@pytest.mark.parametrize("partitions", [1, 2, 4])
+def test_e1_partitioned_matches_compute_all(any_data_dir, by, partitions):
+    res = e1_partitioned(any_data_dir, partitions, by, executor="serial")
+    _assert_same(res, e1_compute_all(load_titanic(any_data_dir)))
+
+
+@pytest.mark.parametrize("by", ["hash", "range"])
+@pytest.mark.parametrize("partitions", [1, 2, 4])
+def test_e2_partitioned_matches_compute_all(any_data_dir, by, partitions):
+    res = e2_partitioned(any_data_dir, partitions, by, executor="serial")
+    _assert_same(res, e2_compute_all(any_data_dir))
+
+
+def test_each_shard_holds_only_its_rows(synthetic_dir):
+    # Cada worker lee solo su fichero: los shards son disjuntos y cubren todas las filas
+    lf = scan_pasajeros(synthetic_dir).with_row_index("_row")
+    shards = make_shards(synthetic_dir, "pasajeros.csv", 4, "range")
+    paths = shard_store(synthetic_dir, {"pasajeros.csv": lf}, shards)["pasajeros.csv"]
+    rows = [scan_shard(p).select("_row").collect()["_row"] for p in paths]
+    assert sum(len(r) for r in rows) == lf.select("_row").collect().height
+    assert len(set().union(*(r.to_list() for r in rows))) == sum(len(r) for r in rows)
+
+
+def test_shards_of_both_files_invalidated_together(synthetic_dir, tmp_path):
+    # Cambia solo supervivientes.csv: los shards de pasajeros también se rehacen
+    for name in ("pasajeros.csv", "supervivientes.csv"):
+        shutil.copy(synthetic_dir / name, tmp_path / name)
+    e2_partitioned(tmp_path, 2, "hash", executor="serial")
+    files = sorted((tmp_path / ".store").rglob("pasajeros/**/*.ipc"))
+    before = [f.stat().st_mtime_ns for f in files]
+
+    e2_partitioned(tmp_path, 2, "hash", executor="serial")
+    assert [f.stat().st_mtime_ns for f in files] == before
+
+    pl.read_csv(tmp_path / "supervivientes.csv").head(-1).write_csv(tmp_path / "supervivientes.csv")
+    res = e2_partitioned(tmp_path, 2, "hash", executor="serial")
+    assert [f.stat().st_mtime_ns for f in files] != before
+    _assert_same(res, e2_compute_all(tmp_path))
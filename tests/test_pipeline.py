@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from polars.testing import assert_frame_equal
+
+from src.ejercicio1 import e1_compute_all, load_titanic
+from src.ejercicio2 import e2_compute_all
+from src.pipeline import Pipeline, RunOptions, select_steps
+from src.steps import DATASETS, STEPS
+
+
+def _pipeline(data_dir: Path) -> Pipeline:
+    return Pipeline(DATASETS, data_dir, {}, RunOptions())
+
+
+# =========================================================
+# Grafo de nodos en modo eager
+# =========================================================
+
+def test_only_builds_needed_nodes(data_dir):
+    steps = select_steps(STEPS, RunOptions(), only=["e1_04"], figures=False)
+    needed = _pipeline(data_dir).closure({s.source for s in steps})
+    assert needed == {"titanic", "e1_cube", "e1_counts"}
+
+
+def test_nodes_match_compute_all(any_data_dir):
+    # Cada paso lee de su nodo lo mismo que daba el cálculo de todo el ejercicio
+    steps = select_steps(STEPS, RunOptions(), figures=False)
+    data = _pipeline(any_data_dir).build({s.source for s in steps}, threads=4)
+    ref = {
+        "ejercicio1": e1_compute_all(load_titanic(any_data_dir)),
+        "ejercicio2": e2_compute_all(any_data_dir),
+    }
+    for step in steps:
+        value, expected = data[step.source][step.key], ref[step.group][step.key]
+        if isinstance(expected, list):
+            assert value == expected
+        else:
+            assert_frame_equal(value, expected)
+
+
+@pytest.mark.parametrize(
+    "opts, node, single_pass",
+    [(RunOptions(lazy=True), "e1_counts", "e1_all"), (RunOptions(engine="streaming"), "e2_counts", "e2_all")],
+)
+def test_single_pass_nodes_read_from_all(data_dir, opts, node, single_pass):
+    # lazy / streaming: una sola pasada por ejercicio, sin cargar los CSV en eager
+    assert Pipeline(DATASETS, data_dir, {}, opts).closure({node}) == {node, single_pass}
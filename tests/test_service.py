@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import pytest
+from polars.testing import assert_frame_equal
+
+from src.ejercicio1 import e1_passengers_by_sex, e1_dropna_age_summary
+from src.service import QueryError, WarmData
+
+
+@pytest.fixture(scope="module")
+def warm(data_dir) -> WarmData:
+    return WarmData(data_dir)
+
+
+# =========================================================
+# Filtros con el tipo de cada columna
+# =========================================================
+
+def test_int_filter_matches_direct(warm):
+    df = warm.frames["e1"]
+    expected = e1_dropna_age_summary(df.filter(df["Pclass"].is_in([1, 2])))
+    assert_frame_equal(warm.query("e1/e1_dropna_age_summary", (("Pclass", ("1", "2")),)), expected)
+
+
+def test_cube_filter_matches_frame_filter(warm):
+    # Filtro sobre el cubo (dimensión) == filtro sobre las filas
+    df = warm.frames["e1"]
+    expected = e1_passengers_by_sex(df.filter(df["Survived"] == 1))
+    assert_frame_equal(warm.query("e1/e1_passengers_by_sex", (("Survived", ("1",)),)), expected)
+
+
+def test_enum_filter(warm):
+    res = warm.query("e2/passengers_by_puerto", (("Sex", ("female",)),))
+    assert res.height > 0
+
+
+@pytest.mark.parametrize(
+    "name, filters",
+    [
+        ("e1/e1_dropna_age_summary", (("Pclass", ("primera",)),)),  # no es un entero
+        ("e2/passengers_by_puerto", (("Sex", ("otro",)),)),  # fuera de las categorías del Enum
+        ("e1/e1_dropna_age_summary", (("Age", ("22",)),)),  # columna continua
+        ("e2/mean_age_by_sex_survived", (("Fare", ("7.25",)),)),
+    ],
+)
+def test_invalid_filters_are_rejected(warm, name, filters):
+    with pytest.raises(QueryError):
+        warm.query(name, filters)
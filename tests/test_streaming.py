@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from benchmarks.generate import generate
+from src import ejercicio2 as e2
+from src.profiling import PeakRss
+
+
+E2_KEYS = [
+    "by_puerto",
+    "by_sex",
+    "deaths_by_age_range",
+    "deaths_by_class_gender",
+    "by_puerto_survived",
+    "join_quality",
+    "puerto_sample",
+    "mean_age",
+]
+
+# Lotes pequeños: varios lotes por fichero también con los CSV reales
+BATCH_ROWS = 97
+
+
+def _scans(data_dir: Path) -> tuple[pl.LazyFrame, pl.LazyFrame]:
+    return e2.scan_pasajeros(data_dir), e2.scan_supervivientes(data_dir)
+
+
+def _assert_same(res: dict, ref: dict) -> None:
+    for key in E2_KEYS:
+        assert_frame_equal(res[key], ref[key])
+
+
+# =========================================================
+# Claves desordenadas o repetidas (benchmarks.generate no las produce)
+# =========================================================
+
+@pytest.fixture(scope="module", params=["unsorted", "duplicated"])
+def messy_dir(request: pytest.FixtureRequest, synthetic_dir: Path, tmp_path_factory: pytest.TempPathFactory) -> Path:
+    out = tmp_path_factory.mktemp(request.param)
+    df_p = pl.read_csv(synthetic_dir / "pasajeros.csv")
+    df_s = pl.read_csv(synthetic_dir / "supervivientes.csv")
+    if request.param == "unsorted":
+        df_s = df_s.sample(fraction=1.0, shuffle=True, seed=0)
+    else:
+        # Ids repetidos (en orden, pero no estrictamente creciente) en los dos lados
+        df_p = pl.concat([df_p, df_p.slice(100, 5)]).sort("PassengerId", maintain_order=True)
+        df_s = pl.concat([df_s, df_s.slice(200, 3)]).sort("PassengerId", maintain_order=True)
+    df_p.write_csv(out / "pasajeros.csv")
+    df_s.write_csv(out / "supervivientes.csv")
+    return out
+
+
+# =========================================================
+# Streaming: merge join por lotes o, si no sirve, join hash
+# =========================================================
+
+def test_e2_streaming_matches_eager(any_data_dir):
+    # data/supervivientes.csv no está ordenado: join hash; sintéticos: merge join
+    _assert_same(e2.e2_collect_all(any_data_dir, engine="streaming"), e2.e2_compute_all(any_data_dir))
+
+
+def test_e2_merge_join_rejects_unsorted_data(data_dir):
+    with pytest.raises(e2.UnsortedKeys):
+        e2.e2_merge_join(*_scans(data_dir), batch_rows=BATCH_ROWS)
+
+
+def test_e2_merge_join_matches_eager(synthetic_dir):
+    _assert_same(e2.e2_merge_join(*_scans(synthetic_dir), batch_rows=BATCH_ROWS), e2.e2_compute_all(synthetic_dir))
+
+
+def test_e2_merge_join_rejects_messy_keys(messy_dir):
+    with pytest.raises(e2.UnsortedKeys):
+        e2.e2_merge_join(*_scans(messy_dir), batch_rows=BATCH_ROWS)
+
+
+def test_e2_streaming_falls_back_on_messy_keys(messy_dir, recwarn):
+    eager = e2.e2_compute_all(messy_dir)
+    _assert_same(e2.e2_collect_all(messy_dir, engine="streaming"), eager)
+    # Desordenadas: se ordenan en disco sin aviso; repetidas: join hash con aviso
+    assert [str(w.message) for w in recwarn if w.category is UserWarning] == (
+        [] if "unsorted" in messy_dir.name else [f"{e2.KEY} repetido: join hash en memoria (la memoria ya no está acotada por el lote)"]
+    )
+    if "duplicated" in messy_dir.name:
+        assert eager["join_quality"]["pasajeros_dup_ids"].item() == 5
+        assert eager["join_quality"]["supervivientes_dup_ids"].item() == 3
+
+
+# =========================================================
+# Memoria acotada: el pico no crece con el tamaño de los CSV
+# =========================================================
+#
+# Se mide en un subproceso nuevo (sin memoria ya reservada que reutilizar)
+# con un solo hilo de Polars: la lectura anticipada del motor streaming
+# crece con el nº de hilos (no con el de filas) y, por debajo de ~1e6
+# filas, aún no ha llegado a su tope. Con las claves desordenadas se mide
+# también el merge join tras ordenar en disco (spill_dir).
+
+MEMORY_SCALES = (1_000_000, 3_000_000)
+MEMORY_BATCH_ROWS = 50_000
+
+_MEASURE = """
+import sys
+from pathlib import Path
+from src import ejercicio2 as e2
+from src.profiling import PeakRss
+
+def run(data_dir):
+    lf_p, lf_s = e2.scan_pasajeros(data_dir), e2.scan_supervivientes(data_dir)
+    spill_dir = Path(sys.argv[3]) if len(sys.argv) > 3 else None
+    e2.e2_merge_join(lf_p, lf_s, batch_rows=int(sys.argv[2]), spill_dir=spill_dir)
+
+with PeakRss() as mem:
+    run(Path(sys.argv[1]))
+print(mem.peak_mb)
+"""
+
+
+def _merge_join_peak_mb(data_dir: Path, spill_dir: Path | None = None) -> float | None:
+    root = Path(__file__).resolve().parents[1]
+    env = os.environ | {"POLARS_MAX_THREADS": "1", "PYTHONPATH": str(root)}
+    spill = [str(spill_dir)] if spill_dir is not None else []
+    out = subprocess.run(
+        [sys.executable, "-c", _MEASURE, str(data_dir), str(MEMORY_BATCH_ROWS), *spill],
+        cwd=root, env=env, capture_output=True, text=True, check=True,
+    )
+    value = out.stdout.strip().splitlines()[-1]
+    return None if value == "None" else float(value)
+
+
+@pytest.fixture(scope="module")
+def memory_dirs(tmp_path_factory: pytest.TempPathFactory) -> list[Path]:
+    return [generate(tmp_path_factory.mktemp(f"rows{n}"), n) for n in MEMORY_SCALES]
+
+
+def _shuffled(data_dir: Path, out: Path) -> Path:
+    (out / "pasajeros.csv").symlink_to(data_dir / "pasajeros.csv")
+    df_s = pl.read_csv(data_dir / "supervivientes.csv")
+    df_s.sample(fraction=1.0, shuffle=True, seed=0).write_csv(out / "supervivientes.csv")
+    return out
+
+
+@pytest.mark.parametrize("keys", ["sorted", "unsorted"])
+def test_e2_merge_join_peak_rss_is_bounded(memory_dirs, keys, tmp_path_factory):
+    dirs = memory_dirs
+    spill_dirs: list[Path | None] = [None] * len(dirs)
+    if keys == "unsorted":
+        dirs = [_shuffled(d, tmp_path_factory.mktemp(f"{d.name}_unsorted")) for d in dirs]
+        spill_dirs = [tmp_path_factory.mktemp(f"{d.name}_spill") for d in dirs]
+    peaks = [_merge_join_peak_mb(d, spill) for d, spill in zip(dirs, spill_dirs)]
+    if None in peaks:
+        pytest.skip("PeakRss necesita /proc (Linux)")
+
+    # 3x filas (~140 MB más de CSV): el join hash crece ~50 MB, el merge join ~10 MB
+    # (ordenando antes en disco, ~15 MB)
+    csv_growth_mb = sum(
+        (dirs[1] / name).stat().st_size - (dirs[0] / name).stat().st_size
+        for name in ("pasajeros.csv", "supervivientes.csv")
+    ) / 1e6
+    assert peaks[1] - peaks[0] < csv_growth_mb / 4